@@ -0,0 +1,136 @@
+"""
+Autenticação JWT com o usuário em cache.
+
+`CachedJWTAuthentication` resolve o usuário do token pelo cache (chave por
+id, TTL curto) em vez de consultar `users` a cada requisição. O token leva
+a versão de credenciais do usuário (`ver`); trocar a senha ou desativar a
+conta incrementa a versão e invalida os tokens já emitidos. Qualquer
+alteração no usuário remove a entrada do cache (ver `signals`).
+
+Views com `claims_only_reads = True` podem, com `JWT_CLAIMS_ONLY_READS`
+ativo, atender requisições de leitura só com os claims do token: o usuário
+é montado a partir de id, e-mail, moeda e fuso, sem cache nem banco. Tokens
+emitidos antes da última alteração do usuário seguem pelo caminho normal.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import F
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.core import sharding
+
+TOKEN_VERSION_CLAIM = 'ver'
+CLAIM_FIELDS = ('email', 'currency', 'timezone')
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def _changed_key(user_id):
+    return f'auth:changed:{user_id}'
+
+
+def add_user_claims(token, user):
+    """Inclui no token a versão de credenciais e os dados usados no modo só-claims."""
+    token[TOKEN_VERSION_CLAIM] = user.token_version
+    for field in CLAIM_FIELDS:
+        token[field] = getattr(user, field)
+    return token
+
+
+def tokens_for_user(user):
+    refresh = add_user_claims(RefreshToken.for_user(user), user)
+    return {'refresh': str(refresh), 'access': str(refresh.access_token)}
+
+
+def invalidate_user(user_id):
+    """Remove o usuário do cache e marca os claims emitidos até agora como desatualizados."""
+    cache.delete(user_cache_key(user_id))
+    cache.set(
+        _changed_key(user_id),
+        int(time.time()),
+        timeout=int(api_settings.ACCESS_TOKEN_LIFETIME.total_seconds()),
+    )
+
+
+def revoke_tokens(user):
+    """Invalida todos os tokens emitidos para o usuário."""
+    get_user_model().objects.filter(pk=user.pk).update(token_version=F('token_version') + 1)
+    user.refresh_from_db(fields=['token_version'])
+    invalidate_user(user.pk)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+
+    def authenticate(self, request):
+        result = self._authenticate(request)
+        if result is not None:
+            # O restante da requisição lê e grava no shard do usuário
+            sharding.route_to_user(result[0].pk)
+        return result
+
+    def _authenticate(self, request):
+        if not self._claims_only(request):
+            return super().authenticate(request)
+
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return self.get_claims_user(validated_token) or self.get_user(validated_token), validated_token
+
+    def _claims_only(self, request):
+        view = (getattr(request, 'parser_context', None) or {}).get('view')
+        return (
+            settings.JWT_CLAIMS_ONLY_READS
+            and request.method in SAFE_METHODS
+            and getattr(view, 'claims_only_reads', False)
+        )
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Token sem identificação do usuário.')
+
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            cache.set(key, user, timeout=settings.AUTH_USER_CACHE_TTL)
+
+        if not user.is_active:
+            raise AuthenticationFailed('Usuário inativo.', code='user_inactive')
+        if validated_token.get(TOKEN_VERSION_CLAIM, 0) != user.token_version:
+            raise AuthenticationFailed('Token revogado.', code='token_revoked')
+        return user
+
+    def get_claims_user(self, validated_token):
+        """Usuário montado apenas com os claims, ou None se o token não permitir."""
+        if any(field not in validated_token for field in CLAIM_FIELDS):
+            return None
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        changed = cache.get(_changed_key(user_id))
+        if user_id is None or (changed is not None and validated_token.get('iat', 0) <= changed):
+            return None
+
+        # Instância só para leitura: nunca deve ser salva
+        user = get_user_model()(
+            id=user_id,
+            is_active=True,
+            token_version=validated_token.get(TOKEN_VERSION_CLAIM, 0),
+            **{field: validated_token[field] for field in CLAIM_FIELDS},
+        )
+        user._state.adding = False
+        return user
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from apps.accounts.purge import purge_candidates, purge_user
+
+
+class Command(BaseCommand):
+    help = (
+        'Remove, em lotes, os dados dos usuários desativados há mais de ACCOUNT_PURGE_GRACE_DAYS dias. '
+        'Remoções interrompidas continuam de onde pararam.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users',
+                            help='Remove apenas o usuário informado (pode ser repetido).')
+        parser.add_argument('--batch-size', type=int,
+                            help='Linhas removidas por lote (padrão: ACCOUNT_PURGE_BATCH_SIZE).')
+        parser.add_argument('--pause', type=float,
+                            help='Pausa em segundos entre lotes (padrão: ACCOUNT_PURGE_PAUSE).')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Apenas lista os usuários que seriam removidos.')
+
+    def handle(self, *args, **options):
+        candidates = purge_candidates()
+        if options['users']:
+            candidates = candidates.filter(pk__in=options['users'])
+
+        for user_id, email in candidates.values_list('pk', 'email').order_by('pk'):
+            if options['dry_run']:
+                self.stdout.write(f'{user_id} {email}')
+                continue
+            result = purge_user(user_id, batch_size=options['batch_size'], pause=options['pause'])
+            if result is None:
+                self.stdout.write(f'Usuário {user_id}: conta reativada, nada removido.')
+                continue
+            total = sum(result.deleted.values())
+            self.stdout.write(self.style.SUCCESS(f'Usuário {user_id}: {total} linhas removidas.'))
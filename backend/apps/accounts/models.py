@@ -15,6 +15,11 @@ class User(AbstractUser):
     currency = models.CharField(max_length=3, default='BRL')
     timezone = models.CharField(max_length=50, default='America/Sao_Paulo')
     
+    # Incrementada ao trocar a senha ou desativar a conta; invalida os tokens emitidos
+    token_version = models.PositiveIntegerField(default=0)
+    # Momento da desativação; os dados são removidos após o período de carência
+    deactivated_at = models.DateTimeField(null=True, blank=True)
+    
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
 
@@ -56,3 +61,86 @@ class UserProfile(models.Model):
 
     def __str__(self):
         return f"Profile of {self.user.full_name}"
+
+
+class DataExport(models.Model):
+    """Exportação completa dos dados do usuário (portabilidade, LGPD)."""
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pendente'),
+        ('running', 'Em andamento'),
+        ('completed', 'Concluída'),
+        ('failed', 'Falhou'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='data_exports')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    
+    # Caminho do arquivo relativo a MEDIA_ROOT
+    file = models.CharField(max_length=255, blank=True)
+    size = models.BigIntegerField(default=0)
+    
+    # Linhas previstas e exportadas, no total e por tabela
+    total_rows = models.BigIntegerField(default=0)
+    exported_rows = models.BigIntegerField(default=0)
+    progress = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'data_exports'
+        verbose_name = 'Data Export'
+        verbose_name_plural = 'Data Exports'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='data_exports_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"Export {self.pk} of {self.user_id} ({self.status})"
+
+    @property
+    def percentage(self):
+        if self.status == 'completed':
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(99, int(self.exported_rows * 100 / self.total_rows))
+
+
+class UserPurge(models.Model):
+    """
+    Andamento da remoção dos dados de um usuário desativado.
+    
+    Guarda o id do usuário (e não uma FK) para sobreviver à exclusão dele.
+    """
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pendente'),
+        ('running', 'Em andamento'),
+        ('completed', 'Concluída'),
+    ]
+    
+    user_id = models.BigIntegerField(unique=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    
+    # Etapa atual e último id removido nela; permitem retomar de onde parou
+    step = models.CharField(max_length=50, blank=True)
+    last_pk = models.BigIntegerField(default=0)
+    deleted = models.JSONField(default=dict, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'user_purges'
+        verbose_name = 'User Purge'
+        verbose_name_plural = 'User Purges'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Purge of {self.user_id} ({self.status})"
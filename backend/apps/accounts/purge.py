@@ -0,0 +1,117 @@
+"""
+Remoção em lotes dos dados de usuários desativados.
+
+`delete_account` apenas desativa a conta. Passado o período de carência
+(ACCOUNT_PURGE_GRACE_DAYS), os dados são removidos tabela a tabela, em
+lotes pequenos por faixa de id, cada lote em sua própria transação curta e
+com uma pausa entre lotes, para não disputar locks com os demais usuários.
+A ordem das etapas respeita os `on_delete=PROTECT` (transações antes de
+categorias e contas). O andamento fica em `UserPurge`, então uma remoção
+interrompida continua de onde parou.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import router, transaction as db_transaction
+from django.utils import timezone
+
+from apps.analytics.models import AnalyticsCache, AnomalyDetection, Forecast
+from apps.core import sharding
+from apps.core.sharding import use_user_shard
+from apps.transactions.models import (
+    Account, BalanceAdjustment, BalanceCheckpoint, BalanceSnapshot, BudgetUsage, Category, CategoryBudget,
+    CategoryClosure, CategoryTokenCount, CategoryTokenIndex, RecurringTransaction, Tag, Transaction,
+    TransactionArchive, TransactionSplit, TransactionTag,
+)
+
+from . import exports
+from .models import DataExport, User, UserPurge, UserProfile
+
+# (etapa, modelo, campo que liga a linha ao usuário), na ordem de remoção
+PURGE_STEPS = [
+    ('transaction_tags', TransactionTag, 'transaction__user_id'),
+    ('transaction_splits', TransactionSplit, 'transaction__user_id'),
+    ('transactions', Transaction, 'user_id'),
+    ('recurring_transactions', RecurringTransaction, 'user_id'),
+    ('transaction_archives', TransactionArchive, 'user_id'),
+    ('balance_snapshots', BalanceSnapshot, 'account__user_id'),
+    ('balance_checkpoints', BalanceCheckpoint, 'account__user_id'),
+    ('balance_adjustments', BalanceAdjustment, 'account__user_id'),
+    ('budget_usages', BudgetUsage, 'user_id'),
+    ('category_budgets', CategoryBudget, 'user_id'),
+    ('anomalies', AnomalyDetection, 'user_id'),
+    ('forecasts', Forecast, 'user_id'),
+    ('analytics_cache', AnalyticsCache, 'user_id'),
+    ('data_exports', DataExport, 'user_id'),
+    ('category_token_counts', CategoryTokenCount, 'user_id'),
+    ('category_index', CategoryTokenIndex, 'user_id'),
+    ('tags', Tag, 'user_id'),
+    ('category_closure', CategoryClosure, 'descendant__user_id'),
+    ('categories', Category, 'user_id'),
+    ('accounts', Account, 'user_id'),
+    ('profile', UserProfile, 'user_id'),
+]
+
+
+def purge_candidates(now=None):
+    """Usuários desativados há mais que o período de carência."""
+    limit = (now or timezone.now()) - timedelta(days=settings.ACCOUNT_PURGE_GRACE_DAYS)
+    return User.objects.filter(is_active=False, deactivated_at__lte=limit)
+
+
+def _delete_batch(purge, name, model, ids):
+    with db_transaction.atomic(using=router.db_for_write(model)):
+        if model is DataExport:
+            for export in DataExport.objects.filter(pk__in=ids):
+                exports.delete_file(export)
+        model.objects.filter(pk__in=ids).delete()
+        purge.last_pk = ids[-1]
+        purge.deleted[name] = purge.deleted.get(name, 0) + len(ids)
+        purge.save(update_fields=['step', 'last_pk', 'deleted', 'status', 'updated_at'])
+
+
+def purge_user(user_id, batch_size=None, pause=None, max_seconds=None):
+    """
+    Remove os dados do usuário, retomando o andamento salvo. Com
+    `max_seconds`, para ao fim do lote em que o tempo se esgotar.
+
+    Retorna o `UserPurge`; `status == 'completed'` indica que terminou.
+    """
+    batch_size = batch_size or settings.ACCOUNT_PURGE_BATCH_SIZE
+    pause = settings.ACCOUNT_PURGE_PAUSE if pause is None else pause
+    deadline = time.monotonic() + max_seconds if max_seconds else None
+
+    purge, _ = UserPurge.objects.get_or_create(user_id=user_id)
+    if purge.status == 'completed':
+        return purge
+    user = User.objects.filter(pk=user_id).first()
+    if user is not None and user.is_active:
+        # Conta reativada durante a carência
+        purge.delete()
+        return None
+
+    steps = [step[0] for step in PURGE_STEPS]
+    start = steps.index(purge.step) if purge.step in steps else 0
+    purge.status = 'running'
+    with use_user_shard(user_id):
+        for name, model, user_field in PURGE_STEPS[start:]:
+            if purge.step != name:
+                purge.step, purge.last_pk = name, 0
+            queryset = model.objects.filter(**{user_field: user_id}).order_by('pk')
+            while True:
+                ids = list(queryset.filter(pk__gt=purge.last_pk).values_list('pk', flat=True)[:batch_size])
+                if not ids:
+                    break
+                _delete_batch(purge, name, model, ids)
+                if deadline and time.monotonic() >= deadline:
+                    return purge
+                if pause:
+                    time.sleep(pause)
+
+    # Restam apenas a linha do usuário (e sua cópia no shard) e o que depende dela em cascata
+    sharding.forget_user(user_id)
+    User.objects.filter(pk=user_id).delete()
+    purge.status, purge.step, purge.last_pk, purge.finished_at = 'completed', '', 0, timezone.now()
+    purge.save()
+    return purge
@@ -2,7 +2,8 @@ from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.contrib.auth.password_validation import validate_password
 from django.contrib.auth import get_user_model
-from .models import UserProfile
+from .models import DataExport, UserProfile
+from .authentication import add_user_claims
 
 User = get_user_model()
 
@@ -79,7 +80,7 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         token['email'] = user.email
         token['full_name'] = user.full_name
         
-        return token
+        return add_user_claims(token, user)
     
     def validate(self, attrs):
         data = super().validate(attrs)
@@ -178,3 +179,17 @@ class UpdateProfileSerializer(serializers.ModelSerializer):
             profile.save()
         
         return instance
+
+
+class DataExportSerializer(serializers.ModelSerializer):
+    """Serializer para exportações de dados."""
+    
+    percentage = serializers.IntegerField(read_only=True)
+    
+    class Meta:
+        model = DataExport
+        fields = [
+            'id', 'status', 'percentage', 'total_rows', 'exported_rows', 'progress',
+            'size', 'error', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
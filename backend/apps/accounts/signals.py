@@ -0,0 +1,28 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.contrib.auth import get_user_model
+
+from apps.core import sharding
+
+from .authentication import invalidate_user
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+def assign_user_shard(sender, instance, created, update_fields=None, **kwargs):
+    """Escolhe o shard do usuário novo (antes que os dados padrão sejam criados) e atualiza sua cópia no shard."""
+    if created:
+        sharding.assign_new_user(instance)
+    elif update_fields is None or set(update_fields) != {'last_login'}:
+        sharding.sync_user(instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, update_fields=None, **kwargs):
+    """Remove o usuário do cache de autenticação após qualquer alteração."""
+    # O registro do último login (UPDATE_LAST_LOGIN) não altera nada usado na autenticação
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    invalidate_user(instance.pk)
@@ -0,0 +1,70 @@
+"""Tarefas do Celery do app de contas."""
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from apps.core.db_routers import replica_allowed, use_replica
+from apps.core.sharding import use_user_shard
+
+from . import exports, purge
+from .models import DataExport
+
+
+@shared_task
+def run_data_export(export_id):
+    """Gera o arquivo de uma exportação pendente."""
+    export = DataExport.objects.select_related('user').filter(pk=export_id, status='pending').first()
+    if export is None:
+        return
+    try:
+        with use_user_shard(export.user_id), use_replica(replica_allowed(export.user)):
+            exports.write_export(export)
+    except Exception as exc:
+        DataExport.objects.filter(pk=export.pk).update(
+            status='failed', error=str(exc)[:1000], finished_at=timezone.now()
+        )
+        raise
+
+
+@shared_task
+def purge_expired_exports():
+    """Remove exportações (e seus arquivos) mais antigas que DATA_EXPORT_TTL_DAYS."""
+    limit = timezone.now() - timedelta(days=settings.DATA_EXPORT_TTL_DAYS)
+    expired = DataExport.objects.filter(created_at__lt=limit)
+    for export in expired.iterator():
+        exports.delete_file(export)
+    deleted, _ = expired.delete()
+    return deleted
+
+
+def _purge_lock(user_id):
+    return f'accounts:purge:{user_id}'
+
+
+@shared_task
+def purge_user_data(user_id):
+    """
+    Remove os dados de um usuário desativado por até ACCOUNT_PURGE_TASK_SECONDS
+    e, se não terminar, agenda a continuação.
+    """
+    lock = _purge_lock(user_id)
+    if not cache.add(lock, True, timeout=settings.ACCOUNT_PURGE_TASK_SECONDS * 2):
+        return
+    try:
+        result = purge.purge_user(user_id, max_seconds=settings.ACCOUNT_PURGE_TASK_SECONDS)
+    finally:
+        cache.delete(lock)
+    if result is not None and result.status != 'completed':
+        purge_user_data.apply_async(args=[user_id], countdown=5)
+
+
+@shared_task
+def purge_deactivated_users():
+    """Agenda a remoção dos dados dos usuários cuja carência terminou."""
+    user_ids = list(purge.purge_candidates().values_list('pk', flat=True))
+    for user_id in user_ids:
+        purge_user_data.delay(user_id)
+    return len(user_ids)
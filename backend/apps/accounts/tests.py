@@ -0,0 +1,260 @@
+import io
+import json
+import tempfile
+import time
+import zipfile
+from contextlib import ExitStack, contextmanager
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.core import throttling
+from apps.core.testing import FreshThrottleMixin, UserDataTestCase
+from apps.transactions.models import Category, Transaction
+
+from . import authentication, purge, tasks
+from .authentication import tokens_for_user
+from .models import DataExport, User, UserPurge
+
+
+@override_settings(ACCOUNT_PURGE_GRACE_DAYS=30)
+class PurgeTests(UserDataTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='bye', email='bye@example.com', password='pw12345!')
+        account = self.user.accounts.get(name='Conta Corrente')
+        category = self.user.categories.get(name='Alimentação')
+        for day in range(1, 6):
+            Transaction.objects.create(
+                user=self.user, title=f'Compra {day}', amount=Decimal('10.00'), transaction_type='expense',
+                category=category, account=account, date=date(2026, 3, day),
+            )
+        self.user.is_active = False
+        self.user.deactivated_at = timezone.now() - timedelta(days=31)
+        self.user.save()
+
+    def test_candidates_wait_for_the_grace_period(self):
+        self.assertEqual(list(purge.purge_candidates()), [self.user])
+        self.assertEqual(list(purge.purge_candidates(now=timezone.now() - timedelta(days=2))), [])
+
+    def test_interrupted_purge_resumes_where_it_stopped(self):
+        delete_batch, calls = purge._delete_batch, []
+
+        def crash_on_third_batch(*args):
+            calls.append(args[1])
+            if len(calls) == 3:
+                raise RuntimeError('worker encerrado')
+            delete_batch(*args)
+
+        with mock.patch.object(purge, '_delete_batch', side_effect=crash_on_third_batch):
+            with self.assertRaises(RuntimeError):
+                purge.purge_user(self.user.pk, batch_size=2, pause=0)
+
+        progress = UserPurge.objects.get(user_id=self.user.pk)
+        self.assertEqual((progress.step, progress.deleted), ('transactions', {'transactions': 4}))
+        self.assertEqual(Transaction.objects.filter(user_id=self.user.pk).count(), 1)
+
+        result = purge.purge_user(self.user.pk, batch_size=2, pause=0)
+
+        self.assertEqual(result.status, 'completed')
+        self.assertEqual(result.deleted['transactions'], 5)
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(Category.objects.filter(user_id=self.user.pk).exists())
+
+    def test_time_budget_stops_after_a_batch(self):
+        with mock.patch.object(purge.time, 'monotonic', side_effect=[0, 0, 100]):
+            result = purge.purge_user(self.user.pk, batch_size=2, pause=0, max_seconds=10)
+
+        self.assertEqual((result.status, result.deleted), ('running', {'transactions': 4}))
+        self.assertEqual(purge.purge_user(self.user.pk, pause=0).status, 'completed')
+
+    def test_reactivated_account_is_kept(self):
+        purge.purge_user(self.user.pk, batch_size=2, pause=0, max_seconds=0.000001)
+        self.user.is_active = True
+        self.user.save()
+
+        self.assertIsNone(purge.purge_user(self.user.pk, pause=0))
+        self.assertFalse(UserPurge.objects.filter(user_id=self.user.pk).exists())
+        self.assertEqual(Transaction.objects.filter(user_id=self.user.pk).count(), 3)
+
+
+class CachedJWTAuthenticationTests(FreshThrottleMixin, UserDataTestCase):
+    categories = '/api/transactions/categories/'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='jwt', email='jwt@example.com', password='pw12345!')
+        self.client = APIClient()
+        self.token = self.login(self.client, self.user)
+
+    def login(self, client, user):
+        access = tokens_for_user(user)['access']
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        return access
+
+    @contextmanager
+    def user_queries(self):
+        """Consultas à tabela users em qualquer banco durante o bloco."""
+        with ExitStack() as stack:
+            contexts = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in settings.DATABASES]
+            queries = []
+            yield queries
+        queries.extend(
+            query['sql'] for context in contexts for query in context.captured_queries
+            if 'FROM "users"' in query['sql']
+        )
+
+    def test_cached_user_skips_the_users_table(self):
+        self.assertEqual(self.client.get(self.categories).status_code, 200)
+
+        with self.user_queries() as queries:
+            self.assertEqual(self.client.get(self.categories).status_code, 200)
+
+        self.assertEqual(queries, [])
+
+    def test_profile_save_invalidates_the_cached_user(self):
+        self.client.get(self.categories)
+
+        response = self.client.patch('/api/auth/profile/', {'currency': 'USD'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        with self.user_queries() as queries:
+            response = self.client.get('/api/auth/profile/')
+        self.assertEqual(response.data['currency'], 'USD')
+        self.assertEqual(len(queries), 1)
+
+    def test_password_change_revokes_previous_tokens(self):
+        old = APIClient()
+        self.login(old, self.user)
+        old.get(self.categories)
+
+        response = self.client.post('/api/auth/change-password/', {
+            'old_password': 'pw12345!', 'new_password': 'Nova-senha-2026', 'new_password_confirm': 'Nova-senha-2026',
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(old.get(self.categories).status_code, 401)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["tokens"]["access"]}')
+        self.assertEqual(self.client.get(self.categories).status_code, 200)
+
+    def test_delete_account_revokes_tokens(self):
+        self.client.get(self.categories)
+
+        response = self.client.delete('/api/auth/delete-account/', {'password': 'pw12345!'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(self.categories).status_code, 401)
+
+    def age_changes(self):
+        """Recua a última alteração do usuário para antes dos próximos tokens (iat tem resolução de segundos)."""
+        cache.set(authentication._changed_key(self.user.pk), int(time.time()) - 5)
+
+    @override_settings(JWT_CLAIMS_ONLY_READS=True)
+    def test_claims_only_reads_until_the_user_changes(self):
+        self.age_changes()
+        self.login(self.client, self.user)
+        with self.user_queries() as queries:
+            response = self.client.get(self.categories)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries, [])
+        # Escritas e views sem claims_only_reads seguem pelo usuário do cache/banco
+        with self.user_queries() as queries:
+            self.client.get('/api/auth/profile/')
+        self.assertEqual(len(queries), 1)
+
+        self.client.patch('/api/auth/profile/', {'currency': 'USD'}, format='json')
+
+        with self.user_queries() as queries:
+            self.assertEqual(self.client.get(self.categories).status_code, 200)
+        self.assertEqual(len(queries), 1)
+        self.age_changes()
+        self.login(self.client, User.objects.get(pk=self.user.pk))
+        with self.user_queries() as queries:
+            self.client.get(self.categories)
+        self.assertEqual(queries, [])
+
+
+class DataExportTests(UserDataTestCase):
+    url = '/api/auth/exports/'
+
+    def setUp(self):
+        # Pedir uma exportação custa 50 tokens: buckets novos a cada teste
+        patcher = mock.patch.object(throttling, '_store', throttling.InMemoryTokenBucket())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name, DATA_EXPORT_CHUNK_SIZE=2))
+        self.user = User.objects.create_user(username='export', email='export@example.com', password='pw12345!')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        account = self.user.accounts.get(name='Conta Corrente')
+        category = self.user.categories.get(name='Alimentação')
+        for day in range(1, 4):
+            Transaction.objects.create(
+                user=self.user, title=f'Compra {day}', amount=Decimal('10.00'), transaction_type='expense',
+                category=category, account=account, date=date(2026, 3, day),
+            )
+
+    def request_export(self):
+        with mock.patch('apps.accounts.views.run_data_export') as task:
+            response = self.client.post(self.url)
+        self.assertEqual(response.status_code, 202)
+        task.delay.assert_called_once_with(response.data['id'])
+        return DataExport.objects.get(pk=response.data['id'])
+
+    def test_one_export_at_a_time(self):
+        export = self.request_export()
+
+        self.assertEqual((export.user, export.status), (self.user, 'pending'))
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['export']['id'], export.pk)
+
+    def test_task_writes_every_table_and_reports_progress(self):
+        export = self.request_export()
+        self.assertEqual(self.client.get(f'{self.url}{export.pk}/download/').status_code, 404)
+
+        tasks.run_data_export(export.pk)
+
+        response = self.client.get(f'{self.url}{export.pk}/')
+        self.assertEqual(response.data['status'], 'completed')
+        self.assertEqual(response.data['percentage'], 100)
+        self.assertEqual(response.data['exported_rows'], response.data['total_rows'])
+        self.assertEqual(response.data['progress']['transactions'], 3)
+
+        response = self.client.get(f'{self.url}{export.pk}/download/')
+        self.assertEqual(response.status_code, 200)
+        with zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content))) as archive:
+            rows = archive.read('transactions.ndjson').decode().splitlines()
+            manifest = json.loads(archive.read('manifest.json'))
+        self.assertEqual(sorted(json.loads(row)['title'] for row in rows), ['Compra 1', 'Compra 2', 'Compra 3'])
+        self.assertEqual(manifest['tables']['user'], 1)
+
+    def test_failed_task_is_recorded(self):
+        export = self.request_export()
+
+        with mock.patch.object(tasks.exports, 'write_export', side_effect=OSError('disco cheio')):
+            with self.assertRaises(OSError):
+                tasks.run_data_export(export.pk)
+
+        response = self.client.get(f'{self.url}{export.pk}/')
+        self.assertEqual((response.data['status'], response.data['error']), ('failed', 'disco cheio'))
+
+    def test_exports_of_other_users_are_hidden(self):
+        export = self.request_export()
+        tasks.run_data_export(export.pk)
+        other = User.objects.create_user(username='other', email='other@example.com', password='pw12345!')
+        client = APIClient()
+        client.force_authenticate(other)
+
+        self.assertEqual(client.get(f'{self.url}{export.pk}/').status_code, 404)
+        self.assertEqual(client.get(f'{self.url}{export.pk}/download/').status_code, 404)
+        self.assertEqual(client.get(self.url).data['count'], 0)
@@ -6,6 +6,9 @@ from .views import (
     LogoutView,
     ProfileView,
     ChangePasswordView,
+    DataExportListView,
+    DataExportDetailView,
+    DataExportDownloadView,
     user_stats,
     delete_account
 )
@@ -22,4 +25,9 @@ urlpatterns = [
     path('change-password/', ChangePasswordView.as_view(), name='change_password'),
     path('stats/', user_stats, name='user_stats'),
     path('delete-account/', delete_account, name='delete_account'),
+    
+    # Exportação de dados
+    path('exports/', DataExportListView.as_view(), name='data_export_list'),
+    path('exports/<int:pk>/', DataExportDetailView.as_view(), name='data_export_detail'),
+    path('exports/<int:pk>/download/', DataExportDownloadView.as_view(), name='data_export_download'),
 ]
@@ -5,11 +5,18 @@ from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model
-from .models import UserProfile
+from django.conf import settings
+from django.http import FileResponse
+from django.utils import timezone
+from datetime import timedelta
+import os
+from .models import DataExport, UserProfile
+from .authentication import revoke_tokens, tokens_for_user
 from .serializers import (
     UserSerializer, RegisterSerializer, CustomTokenObtainPairSerializer,
-    ChangePasswordSerializer, UpdateProfileSerializer
+    ChangePasswordSerializer, UpdateProfileSerializer, DataExportSerializer
 )
+from .tasks import run_data_export
 
 User = get_user_model()
 
@@ -26,15 +33,9 @@ class RegisterView(generics.CreateAPIView):
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
         
-        # Gerar tokens JWT
-        refresh = RefreshToken.for_user(user)
-        
         return Response({
             'user': UserSerializer(user).data,
-            'tokens': {
-                'refresh': str(refresh),
-                'access': str(refresh.access_token),
-            }
+            'tokens': tokens_for_user(user),
         }, status=status.HTTP_201_CREATED)
 
 
@@ -86,14 +87,79 @@ class ChangePasswordView(APIView):
             user = request.user
             user.set_password(serializer.validated_data['new_password'])
             user.save()
+            # Tokens emitidos com a senha anterior deixam de valer
+            revoke_tokens(user)
             
             return Response({
-                "message": "Senha alterada com sucesso."
+                "message": "Senha alterada com sucesso.",
+                "tokens": tokens_for_user(user),
             }, status=status.HTTP_200_OK)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class DataExportListView(generics.ListCreateAPIView):
+    """
+    Exportações de dados do usuário.
+    
+    POST agenda a exportação completa (uma por vez) e responde 202; o
+    andamento é acompanhado pelo detalhe e o arquivo pelo download.
+    """
+    
+    serializer_class = DataExportSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    # Custo no throttling (apps.core.throttling)
+    throttle_costs = {'post': 50}
+    
+    def get_queryset(self):
+        return DataExport.objects.filter(user=self.request.user)
+    
+    def create(self, request, *args, **kwargs):
+        running = self.get_queryset().filter(status__in=['pending', 'running']).first()
+        if running:
+            return Response({
+                'error': 'Já existe uma exportação em andamento.',
+                'export': DataExportSerializer(running).data,
+            }, status=status.HTTP_409_CONFLICT)
+        
+        export = DataExport.objects.create(user=request.user)
+        run_data_export.delay(export.pk)
+        export.refresh_from_db()
+        return Response(DataExportSerializer(export).data, status=status.HTTP_202_ACCEPTED)
+
+
+class DataExportDetailView(generics.RetrieveAPIView):
+    """Andamento de uma exportação."""
+    
+    serializer_class = DataExportSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        return DataExport.objects.filter(user=self.request.user)
+
+
+class DataExportDownloadView(DataExportDetailView):
+    """Download do arquivo de uma exportação concluída."""
+    
+    throttle_cost = 10
+    
+    def retrieve(self, request, *args, **kwargs):
+        export = self.get_object()
+        path = os.path.join(settings.MEDIA_ROOT, export.file) if export.file else None
+        if export.status != 'completed' or not path or not os.path.exists(path):
+            return Response({
+                'error': 'Arquivo indisponível.',
+                'status': export.status,
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        return FileResponse(
+            open(path, 'rb'),
+            as_attachment=True,
+            filename=f'dados_{export.created_at:%Y%m%d}.zip',
+            content_type='application/zip',
+        )
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def user_stats(request):
@@ -131,10 +197,13 @@ def delete_account(request):
             'error': 'Senha incorreta.'
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    # Soft delete - desativar conta
+    # Soft delete - desativar conta; os dados são removidos após ACCOUNT_PURGE_GRACE_DAYS
     user.is_active = False
+    user.deactivated_at = timezone.now()
     user.save()
+    revoke_tokens(user)
     
     return Response({
-        'message': 'Conta desativada com sucesso.'
+        'message': 'Conta desativada com sucesso.',
+        'purge_after': user.deactivated_at + timedelta(days=settings.ACCOUNT_PURGE_GRACE_DAYS),
     }, status=status.HTTP_200_OK)
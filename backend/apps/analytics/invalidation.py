@@ -0,0 +1,31 @@
+"""
+Invalidação dos resultados de analytics por usuário.
+
+Os resultados em `AnalyticsCache` são guardados sob uma chave que inclui a
+versão dos dados do usuário (`data_version`). Qualquer escrita em
+transações ou contas troca a versão (`invalidate_results`, chamada pelos
+signals e pelas cargas em massa), e as análises seguintes deixam de
+encontrar os resultados antigos, que expiram sozinhos.
+"""
+import uuid
+
+from django.core.cache import cache
+
+
+def _version_key(user_id):
+    return f'analytics:version:{user_id}'
+
+
+def _new_version():
+    return uuid.uuid4().hex[:12]
+
+
+def data_version(user_id):
+    """Versão atual dos dados do usuário."""
+    # Aleatória: se a chave sair do cache, resultados antigos não voltam a valer
+    return cache.get_or_set(_version_key(user_id), _new_version, timeout=None)
+
+
+def invalidate_results(user_id):
+    """Torna obsoletos os resultados de analytics já calculados para o usuário."""
+    cache.set(_version_key(user_id), _new_version(), timeout=None)
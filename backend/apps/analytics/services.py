@@ -0,0 +1,333 @@
+"""
+Cálculos de analytics executados pelas tarefas do Celery.
+
+Cada função recebe o usuário e parâmetros simples (serializáveis em JSON) e
+retorna um dicionário pronto para ser guardado em `AnalyticsCache`. Os
+valores são convertidos para a moeda do usuário na própria agregação.
+"""
+import csv
+import math
+import os
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from apps.transactions import fx, splits
+from apps.transactions.models import Account, Transaction
+from apps.transactions.timeseries import month_start
+
+from .models import AnomalyDetection, Forecast
+
+ZERO = Decimal('0.00')
+
+
+def _completed(user, start=None, end=None):
+    queryset = Transaction.objects.filter(user=user, status='completed')
+    if start:
+        queryset = queryset.filter(date__gte=start)
+    if end:
+        queryset = queryset.filter(date__lte=end)
+    return queryset
+
+
+def _amount(user):
+    return fx.converted_amount('amount', 'account__currency', 'date', user.currency)
+
+
+def _monthly_totals(user, start, end=None):
+    """{mês: {'income': total, 'expense': total}} das transações concluídas."""
+    rows = _completed(user, start, end).filter(
+        transaction_type__in=['income', 'expense']
+    ).annotate(month=TruncMonth('date')).values('month', 'transaction_type').annotate(
+        total=Sum(_amount(user))
+    ).order_by()
+
+    months = {}
+    for row in rows:
+        month = row['month']
+        if hasattr(month, 'date'):
+            month = month.date()
+        months.setdefault(month, {'income': ZERO, 'expense': ZERO})
+        months[month][row['transaction_type']] = row['total'] or ZERO
+    return months
+
+
+def summary(user, start, end):
+    """Totais do período, maiores categorias de despesa e saldo das contas."""
+    amount = _amount(user)
+    totals = _completed(user, start, end).aggregate(
+        income=Sum(amount, filter=Q(transaction_type='income')),
+        expense=Sum(amount, filter=Q(transaction_type='expense')),
+        count=Count('id'),
+    )
+    income, expense = totals['income'] or ZERO, totals['expense'] or ZERO
+
+    # Por categoria, transações divididas contam em cada item (apps.transactions.splits)
+    top_categories = splits.line_items(
+        _completed(user, start, end).filter(transaction_type='expense'), 'name', 'color'
+    ).values(
+        'line_category_id', 'line_category_name', 'line_category_color'
+    ).annotate(total=Sum(splits.line_amount(user.currency))).order_by('-total')[:5]
+
+    balance = Account.objects.filter(user=user, is_active=True).aggregate(
+        total=Sum(fx.converted_amount('balance', 'currency', timezone.localdate(), user.currency))
+    )['total'] or ZERO
+
+    return {
+        'period': {'start': start, 'end': end},
+        'currency': user.currency,
+        'total_income': income,
+        'total_expense': expense,
+        'net_amount': income - expense,
+        'transaction_count': totals['count'],
+        'unconverted_count': fx.count_unconverted(_completed(user, start, end), user.currency),
+        'total_balance': balance,
+        'top_categories': [
+            {
+                'category_id': row['line_category_id'],
+                'category_name': row['line_category_name'],
+                'category_color': row['line_category_color'],
+                'total': row['total'] or ZERO,
+            }
+            for row in top_categories
+        ],
+    }
+
+
+def trends(user, months):
+    """Receitas, despesas e saldo líquido dos últimos `months` meses, com variação mensal."""
+    first = month_start(timezone.localdate(), -(months - 1))
+    totals = _monthly_totals(user, first)
+
+    series = []
+    previous = None
+    for offset in range(months):
+        month = month_start(first, offset)
+        values = totals.get(month, {'income': ZERO, 'expense': ZERO})
+        expense_change = None
+        if previous is not None and previous['expense']:
+            expense_change = round((values['expense'] - previous['expense']) / previous['expense'] * 100, 2)
+        series.append({
+            'month': month,
+            'income': values['income'],
+            'expense': values['expense'],
+            'net': values['income'] - values['expense'],
+            'expense_change': expense_change,
+        })
+        previous = values
+    return {'currency': user.currency, 'months': series}
+
+
+def category_analysis(user, start, end):
+    """Gastos e receitas por categoria no período, com participação no total."""
+    rows = list(splits.line_items(
+        _completed(user, start, end).filter(transaction_type__in=['income', 'expense']), 'name', 'color'
+    ).values(
+        'transaction_type', 'line_category_id', 'line_category_name', 'line_category_color'
+    ).annotate(
+        total=Sum(splits.line_amount(user.currency)), count=Count('id', distinct=True)
+    ).order_by('-total'))
+
+    totals = {'income': ZERO, 'expense': ZERO}
+    for row in rows:
+        totals[row['transaction_type']] += row['total'] or ZERO
+
+    result = {'period': {'start': start, 'end': end}, 'currency': user.currency, 'income': [], 'expense': []}
+    for row in rows:
+        kind, total = row['transaction_type'], row['total'] or ZERO
+        result[kind].append({
+            'category_id': row['line_category_id'],
+            'category_name': row['line_category_name'],
+            'category_color': row['line_category_color'],
+            'total': total,
+            'count': row['count'],
+            'percentage': round(total / totals[kind] * 100, 2) if totals[kind] else 0,
+        })
+    return result
+
+
+def _mean_std(values):
+    mean = sum(values) / len(values)
+    variance = sum((value - mean) ** 2 for value in values) / len(values)
+    return mean, math.sqrt(variance)
+
+
+def detect_anomalies(user, months, threshold=2.0):
+    """
+    Compara os gastos do mês atual, por categoria e no total, com a média e o
+    desvio padrão dos `months` meses anteriores.
+
+    Cada anomalia é registrada uma única vez por mês e categoria.
+    """
+    current = month_start(timezone.localdate())
+    first = month_start(current, -months)
+    rows = splits.line_items(_completed(user, first).filter(transaction_type='expense'), 'name').annotate(
+        month=TruncMonth('date')
+    ).values('month', 'line_category_id', 'line_category_name').annotate(
+        total=Sum(splits.line_amount(user.currency))
+    ).order_by()
+
+    history, names = {}, {}
+    for row in rows:
+        month = row['month'].date() if hasattr(row['month'], 'date') else row['month']
+        total = float(row['total'] or 0)
+        for key in (row['line_category_id'], None):
+            history.setdefault(key, {}).setdefault(month, 0.0)
+            history[key][month] += total
+        names[row['line_category_id']] = row['line_category_name']
+
+    existing = {
+        (anomaly.data.get('category_id'), anomaly.data.get('month'))
+        for anomaly in AnomalyDetection.objects.filter(
+            user=user, anomaly_type__in=['category_anomaly', 'spending_spike'], data__month=current.isoformat()
+        )
+    }
+
+    detected = []
+    for category_id, by_month in history.items():
+        past = [by_month.get(month_start(first, offset), 0.0) for offset in range(months)]
+        spent = by_month.get(current, 0.0)
+        if not any(past) or (category_id, current.isoformat()) in existing:
+            continue
+        mean, std = _mean_std(past)
+        limit = mean + threshold * std
+        if spent <= limit or spent <= mean:
+            continue
+
+        ratio = spent / mean if mean else float('inf')
+        label = f'na categoria {names[category_id]}' if category_id else 'no mês'
+        detected.append(AnomalyDetection.objects.create(
+            user=user,
+            anomaly_type='category_anomaly' if category_id else 'spending_spike',
+            severity='high' if ratio >= 2 else 'medium',
+            title=f'Gasto acima do normal {label}',
+            description=(
+                f'Gasto de {spent:.2f} em {current:%m/%Y}, acima da média de {mean:.2f} '
+                f'dos últimos {months} meses.'
+            ),
+            data={
+                'category_id': category_id,
+                'month': current.isoformat(),
+                'spent': round(spent, 2),
+                'mean': round(mean, 2),
+                'std': round(std, 2),
+            },
+        ))
+
+    return {
+        'detected': len(detected),
+        'anomalies': [
+            {
+                'id': anomaly.id,
+                'anomaly_type': anomaly.anomaly_type,
+                'severity': anomaly.severity,
+                'title': anomaly.title,
+                'description': anomaly.description,
+                'data': anomaly.data,
+            }
+            for anomaly in detected
+        ],
+    }
+
+
+def forecast(user, months, history=12):
+    """
+    Projeta receitas, despesas e saldo líquido dos próximos `months` meses por
+    regressão linear sobre o histórico mensal, com intervalo de 95%.
+
+    As previsões anteriores do usuário para esses tipos são substituídas.
+    """
+    current = month_start(timezone.localdate())
+    first = month_start(current, -history)
+    totals = _monthly_totals(user, first, current - timedelta(days=1))
+    past_months = [month_start(first, offset) for offset in range(history)]
+
+    series = {
+        'income': [float(totals.get(month, {}).get('income', 0)) for month in past_months],
+        'expense': [float(totals.get(month, {}).get('expense', 0)) for month in past_months],
+    }
+    series['balance'] = [income - expense for income, expense in zip(series['income'], series['expense'])]
+
+    forecasts = []
+    xs = list(range(history))
+    x_mean = sum(xs) / history
+    sxx = sum((x - x_mean) ** 2 for x in xs)
+    for forecast_type, ys in series.items():
+        y_mean = sum(ys) / history
+        slope = sum((x - x_mean) * (y - y_mean) for x, y in zip(xs, ys)) / sxx if sxx else 0.0
+        intercept = y_mean - slope * x_mean
+        residuals = [y - (intercept + slope * x) for x, y in zip(xs, ys)]
+        sigma = math.sqrt(sum(r ** 2 for r in residuals) / max(history - 2, 1))
+        for step in range(months):
+            predicted = intercept + slope * (history + step)
+            if forecast_type != 'balance':
+                predicted = max(predicted, 0.0)
+            margin = 1.96 * sigma
+            forecasts.append(Forecast(
+                user=user,
+                forecast_type=forecast_type,
+                target_date=month_start(current, step),
+                predicted_value=Decimal(predicted).quantize(ZERO),
+                confidence_interval_lower=Decimal(predicted - margin).quantize(ZERO),
+                confidence_interval_upper=Decimal(predicted + margin).quantize(ZERO),
+                metadata={'model': 'linear_regression', 'history_months': history, 'slope': round(slope, 4)},
+            ))
+
+    Forecast.objects.filter(user=user, forecast_type__in=series).delete()
+    Forecast.objects.bulk_create(forecasts)
+    return {
+        'currency': user.currency,
+        'forecasts': [
+            {
+                'forecast_type': item.forecast_type,
+                'target_date': item.target_date,
+                'predicted_value': item.predicted_value,
+                'confidence_interval_lower': item.confidence_interval_lower,
+                'confidence_interval_upper': item.confidence_interval_upper,
+            }
+            for item in forecasts
+        ],
+    }
+
+
+EXPORT_COLUMNS = [
+    'date', 'title', 'transaction_type', 'amount', 'account__name', 'account__currency',
+    'category__name', 'status', 'location', 'notes',
+]
+
+
+def export_transactions(user, start, end):
+    """Grava as transações do período em CSV dentro de MEDIA_ROOT e retorna o caminho."""
+    # Nome imprevisível: MEDIA_ROOT pode ser servido sem autenticação
+    relative = os.path.join(
+        'exports', str(user.pk),
+        f'transacoes_{start or "inicio"}_{end or "hoje"}_{timezone.now():%Y%m%d%H%M%S}_{uuid.uuid4().hex}.csv'
+    )
+    path = os.path.join(settings.MEDIA_ROOT, relative)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    rows = Transaction.objects.filter(user=user)
+    if start:
+        rows = rows.filter(date__gte=start)
+    if end:
+        rows = rows.filter(date__lte=end)
+    rows = rows.order_by('date', 'id').values_list(*EXPORT_COLUMNS)
+
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as output:
+        writer = csv.writer(output)
+        writer.writerow(EXPORT_COLUMNS)
+        for row in rows.iterator(chunk_size=2000):
+            writer.writerow(row)
+            count += 1
+
+    return {
+        'file': relative,
+        'url': settings.MEDIA_URL + relative.replace(os.sep, '/'),
+        'transaction_count': count,
+    }
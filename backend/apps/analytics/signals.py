@@ -0,0 +1,16 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.transactions.models import Account, Transaction
+
+from .invalidation import invalidate_results
+
+
+# Itens de transações e ajustes de saldo são gravados junto com a transação ou a conta
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+@receiver(post_save, sender=Account)
+@receiver(post_delete, sender=Account)
+def invalidate_on_user_write(sender, instance, **kwargs):
+    """Descarta os resultados de analytics do dono da transação ou conta alterada."""
+    invalidate_results(instance.user_id)
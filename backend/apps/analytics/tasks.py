@@ -0,0 +1,132 @@
+"""
+Tarefas do Celery para as análises pesadas.
+
+Cada análise é identificada pelo usuário, pelo tipo, pelos parâmetros e
+pela versão dos dados do usuário (`analysis_key`, ver `invalidation`), então
+escritas em transações e contas invalidam os resultados. Requisições idênticas simultâneas compartilham a mesma
+tarefa: a primeira obtém o lock no cache (`cache.add`) e enfileira a tarefa,
+as demais recebem o id da tarefa já em andamento. O resultado fica em
+`AnalyticsCache` até expirar.
+"""
+import hashlib
+import json
+import uuid
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from apps.core.db_routers import replica_allowed, use_replica
+from apps.core.sharding import for_each_shard, use_user_shard
+
+from . import services
+from .invalidation import data_version
+from .models import AnalyticsCache
+
+User = get_user_model()
+
+ANALYSES = {
+    'summary': services.summary,
+    'trends': services.trends,
+    'categories': services.category_analysis,
+    'anomalies': services.detect_anomalies,
+    'forecast': services.forecast,
+    'export': services.export_transactions,
+}
+
+
+def analysis_key(kind, params, version):
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True, cls=DjangoJSONEncoder).encode()).hexdigest()
+    return f'{kind}:{version}:{digest[:20]}'
+
+
+def _lock_key(user_id, key):
+    return f'analytics:task:{user_id}:{key}'
+
+
+def cached_result(user_id, key):
+    """Resultado ainda válido da análise, ou None."""
+    return AnalyticsCache.objects.filter(
+        user_id=user_id, cache_key=key, expires_at__gt=timezone.now()
+    ).values_list('data', flat=True).first()
+
+
+@shared_task
+def run_analysis(user_id, kind, params, key, replica=False):
+    """
+    Executa a análise e guarda o resultado em `AnalyticsCache`.
+
+    Com `replica` as leituras da análise vão para uma réplica.
+    """
+    try:
+        with use_user_shard(user_id):
+            with use_replica(replica):
+                user = User.objects.get(pk=user_id)
+                data = json.loads(json.dumps(ANALYSES[kind](user, **params), cls=DjangoJSONEncoder))
+            AnalyticsCache.objects.update_or_create(
+                user_id=user_id,
+                cache_key=key,
+                defaults={
+                    'data': data,
+                    'expires_at': timezone.now() + timedelta(seconds=settings.ANALYTICS_CACHE_TTL),
+                },
+            )
+    finally:
+        cache.delete(_lock_key(user_id, key))
+
+
+@shared_task
+def purge_expired_results():
+    """Remove resultados expirados de `AnalyticsCache`."""
+    deleted = 0
+    for _ in for_each_shard():
+        deleted += AnalyticsCache.objects.filter(expires_at__lte=timezone.now()).delete()[0]
+    return deleted
+
+
+def request_analysis(user, kind, params, refresh=False):
+    """
+    Retorna o resultado da análise se já estiver em cache; caso contrário
+    enfileira (ou reaproveita) a tarefa que o calcula.
+
+    Retorna ('ready', dados) ou ('pending', id da tarefa). Com
+    `CELERY_TASK_ALWAYS_EAGER` a tarefa roda na própria requisição e o
+    resultado é devolvido imediatamente.
+    """
+    key = analysis_key(kind, params, data_version(user.pk))
+    if not refresh:
+        data = cached_result(user.pk, key)
+        if data is not None:
+            return 'ready', data
+
+    lock = _lock_key(user.pk, key)
+    task_id = str(uuid.uuid4())
+    if not cache.add(lock, task_id, timeout=settings.ANALYTICS_TASK_LOCK_TTL):
+        running = cache.get(lock)
+        if running:
+            return 'pending', running
+        # O lock expirou entre as duas leituras; a tarefa já terminou
+        data = cached_result(user.pk, key)
+        if data is not None:
+            return 'ready', data
+        cache.add(lock, task_id, timeout=settings.ANALYTICS_TASK_LOCK_TTL)
+
+    if not refresh:
+        # Outra tarefa pode ter concluído antes de obtermos o lock
+        data = cached_result(user.pk, key)
+        if data is not None:
+            cache.delete(lock)
+            return 'ready', data
+
+    result = run_analysis.apply_async(
+        args=[user.pk, kind, params, key], kwargs={'replica': replica_allowed(user)}, task_id=task_id
+    )
+    if result.ready():
+        # Recém-gravado: lido do primário
+        with use_replica(False):
+            return 'ready', cached_result(user.pk, key)
+    return 'pending', task_id
@@ -0,0 +1,52 @@
+from datetime import date
+from decimal import Decimal
+
+from django.core.cache import cache
+
+from apps.accounts.models import User
+from apps.core.testing import UserDataTestCase
+from apps.transactions.models import Transaction
+
+from .invalidation import data_version
+from .tasks import analysis_key, cached_result, run_analysis
+
+PARAMS = {'start': '2026-03-01', 'end': '2026-03-31'}
+
+
+class AnalysisInvalidationTests(UserDataTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='ana', email='ana@example.com', password='pw12345!')
+
+    def current_key(self):
+        return analysis_key('summary', PARAMS, data_version(self.user.pk))
+
+    def test_transaction_writes_invalidate_cached_results(self):
+        key = self.current_key()
+        run_analysis(self.user.pk, 'summary', PARAMS, key)
+        self.assertEqual(cached_result(self.user.pk, self.current_key())['total_expense'], '0.00')
+
+        transaction = Transaction.objects.create(
+            user=self.user, title='Compra', amount=Decimal('25.00'), transaction_type='expense',
+            category=self.user.categories.get(name='Alimentação'),
+            account=self.user.accounts.get(name='Conta Corrente'), date=date(2026, 3, 5),
+        )
+        self.assertNotEqual(self.current_key(), key)
+        self.assertIsNone(cached_result(self.user.pk, self.current_key()))
+
+        run_analysis(self.user.pk, 'summary', PARAMS, self.current_key())
+        key = self.current_key()
+        transaction.delete()
+        self.assertNotEqual(self.current_key(), key)
+
+    def test_other_users_results_are_kept(self):
+        other = User.objects.create_user(username='outro', email='outro@example.com', password='pw12345!')
+        version = data_version(other.pk)
+
+        Transaction.objects.create(
+            user=self.user, title='Compra', amount=Decimal('25.00'), transaction_type='expense',
+            category=self.user.categories.get(name='Alimentação'),
+            account=self.user.accounts.get(name='Conta Corrente'), date=date(2026, 3, 5),
+        )
+
+        self.assertEqual(data_version(other.pk), version)
@@ -4,7 +4,8 @@ from .views import (
     TransactionTrendsView,
     CategoryAnalysisView,
     AnomalyListView,
-    ForecastView
+    ForecastView,
+    ExportView
 )
 
 urlpatterns = [
@@ -13,4 +14,5 @@ urlpatterns = [
     path('categories/', CategoryAnalysisView.as_view(), name='category_analysis'),
     path('anomalies/', AnomalyListView.as_view(), name='anomalies'),
     path('forecast/', ForecastView.as_view(), name='forecast'),
+    path('export/', ExportView.as_view(), name='export'),
 ]
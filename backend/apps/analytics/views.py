@@ -1,63 +1,146 @@
+from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Sum, Count, Avg
+from django.utils.dateparse import parse_date
 from datetime import datetime, timedelta
-from apps.transactions.models import Transaction, Category
 
+from apps.core.mixins import ReplicaReadMixin
+
+from .models import AnomalyDetection
+from .tasks import request_analysis
+
+
+class AnalysisView(ReplicaReadMixin, APIView):
+    """
+    Base das views de análise: devolve o resultado em cache ou, enquanto a
+    tarefa do Celery calcula, 202 com o id da tarefa. O cliente repete a
+    mesma requisição até receber 200; `?refresh=1` força um novo cálculo.
+    Leituras seguras usam a réplica.
+    """
 
-class DashboardView(APIView):
-    """View básica para dashboard - será expandida futuramente."""
-    
     permission_classes = [IsAuthenticated]
-    
+    claims_only_reads = True
+    # Custo no throttling (apps.core.throttling)
+    throttle_cost = 5
+    analysis = None
+
+    def get_params(self, request):
+        return {}
+
+    def period_params(self, request):
+        """Período de `start_date` a `end_date`; padrão: mês atual."""
+        start_date = parse_date(request.query_params.get('start_date', ''))
+        end_date = parse_date(request.query_params.get('end_date', ''))
+
+        if not start_date:
+            start_date = datetime.now().date().replace(day=1)
+        if not end_date:
+            next_month = start_date.replace(day=28) + timedelta(days=4)
+            end_date = next_month - timedelta(days=next_month.day)
+        return {'start': start_date.isoformat(), 'end': end_date.isoformat()}
+
+    def int_param(self, request, name, default, maximum):
+        try:
+            value = int(request.query_params.get(name, default))
+        except ValueError:
+            raise ValueError(f'{name} deve ser um inteiro')
+        return max(1, min(value, maximum))
+
+    def analysis_response(self, request, params):
+        refresh = request.query_params.get('refresh') in ('1', 'true')
+        state, payload = request_analysis(request.user, self.analysis, params, refresh=refresh)
+        if state == 'ready':
+            return Response(payload)
+        return Response({'status': 'pending', 'task_id': payload}, status=status.HTTP_202_ACCEPTED)
+
     def get(self, request):
-        # Implementação básica - será expandida com IA
-        return Response({
-            'message': 'Dashboard analytics - Em desenvolvimento',
-            'user': request.user.email
-        })
+        try:
+            params = self.get_params(request)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return self.analysis_response(request, params)
 
 
-class TransactionTrendsView(APIView):
+class DashboardView(AnalysisView):
+    """Resumo do período para o dashboard."""
+
+    analysis = 'summary'
+
+    def get_params(self, request):
+        return self.period_params(request)
+
+
+class TransactionTrendsView(AnalysisView):
     """Análise de tendências de transações."""
-    
-    permission_classes = [IsAuthenticated]
-    
-    def get(self, request):
-        return Response({
-            'message': 'Transaction trends - Em desenvolvimento'
-        })
+
+    analysis = 'trends'
+    MAX_MONTHS = 36
+
+    def get_params(self, request):
+        return {'months': self.int_param(request, 'months', 12, self.MAX_MONTHS)}
 
 
-class CategoryAnalysisView(APIView):
+class CategoryAnalysisView(AnalysisView):
     """Análise por categorias."""
-    
-    permission_classes = [IsAuthenticated]
-    
-    def get(self, request):
-        return Response({
-            'message': 'Category analysis - Em desenvolvimento'
-        })
 
+    analysis = 'categories'
+
+    def get_params(self, request):
+        return self.period_params(request)
+
+
+class AnomalyListView(AnalysisView):
+    """
+    Lista de anomalias detectadas.
+
+    GET lista as anomalias registradas; POST executa a detecção sobre os
+    últimos `months` meses.
+    """
+
+    analysis = 'anomalies'
+    MAX_MONTHS = 24
+    throttle_costs = {'get': 1, 'post': 20}
 
-class AnomalyListView(APIView):
-    """Lista de anomalias detectadas."""
-    
-    permission_classes = [IsAuthenticated]
-    
     def get(self, request):
-        return Response({
-            'message': 'Anomaly detection - Em desenvolvimento'
-        })
+        anomalies = AnomalyDetection.objects.filter(user=request.user)
+        if request.query_params.get('is_resolved') in ('true', 'false'):
+            anomalies = anomalies.filter(is_resolved=request.query_params['is_resolved'] == 'true')
+        return Response(list(anomalies.values(
+            'id', 'anomaly_type', 'severity', 'title', 'description', 'data',
+            'is_resolved', 'detected_at', 'resolved_at'
+        )[:100]))
+
+    def post(self, request):
+        try:
+            params = {'months': self.int_param(request, 'months', 6, self.MAX_MONTHS)}
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return self.analysis_response(request, params)
 
 
-class ForecastView(APIView):
+class ForecastView(AnalysisView):
     """Previsões financeiras."""
-    
-    permission_classes = [IsAuthenticated]
-    
-    def get(self, request):
-        return Response({
-            'message': 'Financial forecast - Em desenvolvimento'
-        })
+
+    analysis = 'forecast'
+    MAX_MONTHS = 12
+
+    def get_params(self, request):
+        return {'months': self.int_param(request, 'months', 3, self.MAX_MONTHS)}
+
+
+class ExportView(AnalysisView):
+    """Exportação das transações do período em CSV."""
+
+    analysis = 'export'
+    throttle_cost = 50
+    http_method_names = ['post', 'options']
+
+    def post(self, request):
+        start_date = parse_date(request.data.get('start_date') or '')
+        end_date = parse_date(request.data.get('end_date') or '')
+        params = {
+            'start': start_date.isoformat() if start_date else None,
+            'end': end_date.isoformat() if end_date else None,
+        }
+        return self.analysis_response(request, params)
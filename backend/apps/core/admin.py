@@ -0,0 +1,148 @@
+"""
+Base do admin para tabelas grandes (transações).
+
+A listagem não executa COUNT(*): o total vem da estimativa do planejador do
+PostgreSQL (EXPLAIN), com contagem exata apenas para resultados pequenos.
+Chaves estrangeiras usam raw_id/autocomplete em vez de carregar todas as
+opções, e a busca usa caminhos indexados (usuário por e-mail, id, prefixo
+do título).
+
+Com shards, `ShardedAdminMixin` lista um shard por vez (filtro "Shard"), a
+busca por e-mail vai direto ao shard do usuário e as páginas de um objeto
+procuram o shard que o contém.
+"""
+import json
+
+from django.contrib import admin
+from django.contrib.admin.utils import unquote
+from django.contrib.auth import get_user_model
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+from . import sharding
+from .db_routers import PRIMARY, shard_aliases, use_shard
+from .models import ShardAssignment
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginador que usa a estimativa de linhas do planejador no lugar de COUNT(*)."""
+
+    # Abaixo desta estimativa a contagem exata é barata e é usada
+    exact_threshold = 10000
+
+    def _estimate(self, queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        estimate = self._estimate(queryset) if hasattr(queryset, 'query') else None
+        if estimate is None or estimate < self.exact_threshold:
+            return Paginator.count.func(self)
+        return estimate
+
+
+class ShardListFilter(admin.SimpleListFilter):
+    title = 'shard'
+    parameter_name = 'shard'
+
+    def lookups(self, request, model_admin):
+        return [(alias, alias) for alias in shard_aliases()]
+
+    def queryset(self, request, queryset):
+        # O shard já foi aplicado ao contexto por `ShardedAdminMixin`
+        return queryset
+
+
+class ShardedAdminMixin:
+    """Admin de modelos com shard: listagem por shard e objetos buscados em todos os shards."""
+
+    def get_list_filter(self, request):
+        list_filter = super().get_list_filter(request)
+        return [ShardListFilter, *list_filter] if sharding.sharding_enabled() else list_filter
+
+    def _requested_shard(self, request):
+        alias = request.GET.get(ShardListFilter.parameter_name)
+        return alias if alias in shard_aliases() else PRIMARY
+
+    def _object_shard(self, object_id):
+        object_id = unquote(object_id)
+        if not str(object_id).isdigit():
+            return None
+        # Ids são únicos entre shards; começa pelo shard da faixa do id
+        aliases = shard_aliases()
+        index = int(object_id) // sharding.SHARD_ID_BLOCK
+        if index < len(aliases):
+            aliases.insert(0, aliases.pop(index))
+        for alias in aliases:
+            if self.model._base_manager.using(alias).filter(pk=object_id).exists():
+                return alias
+        return None
+
+    def changelist_view(self, request, extra_context=None):
+        with use_shard(self._requested_shard(request)):
+            return super().changelist_view(request, extra_context)
+
+    def changeform_view(self, request, object_id=None, form_url='', extra_context=None):
+        alias = self._object_shard(object_id) if object_id else self._requested_shard(request)
+        with use_shard(alias):
+            return super().changeform_view(request, object_id, form_url, extra_context)
+
+    def delete_view(self, request, object_id, extra_context=None):
+        with use_shard(self._object_shard(object_id)):
+            return super().delete_view(request, object_id, extra_context)
+
+    def history_view(self, request, object_id, extra_context=None):
+        with use_shard(self._object_shard(object_id)):
+            return super().history_view(request, object_id, extra_context)
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if '@' in term and sharding.sharding_enabled():
+            user = get_user_model().objects.filter(email__iexact=term).values_list('pk', flat=True).first()
+            if user is None:
+                return queryset.none(), False
+            # Os dados do usuário estão todos no seu shard, qualquer que seja o filtro escolhido
+            return queryset.using(sharding.shard_for_user(user)).filter(user_id=user), False
+        return super().get_search_results(request, queryset, search_term)
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """ModelAdmin para tabelas com milhões de linhas de usuários."""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    raw_id_fields = ['user']
+    # Ordenação pela chave primária: percorre o índice da PK em vez de ordenar a tabela
+    ordering = ['-pk']
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if '@' in term:
+            users = get_user_model().objects.filter(email__iexact=term).values('pk')
+            return queryset.filter(user__in=users), False
+        if term.isdigit():
+            return queryset.filter(pk=int(term)), False
+        return super().get_search_results(request, queryset, search_term)
+
+
+@admin.register(ShardAssignment)
+class ShardAssignmentAdmin(admin.ModelAdmin):
+    list_display = ['user_id', 'shard', 'locked', 'updated_at']
+    list_filter = ['shard', 'locked']
+    search_fields = ['=user_id']
+    # Mudanças de shard passam por `move_user_shard`, que copia os dados
+    readonly_fields = ['user_id', 'shard', 'locked', 'created_at', 'updated_at']
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,171 @@
+"""
+Roteamento de leituras para réplicas do banco.
+
+Por padrão tudo vai para `default`. Dentro de `use_replica()` (ou depois de
+`route_reads_to_replica()`, no escopo da requisição) as leituras vão para
+uma das réplicas configuradas em `DATABASE_REPLICA_URLS`; escritas sempre
+vão para `default`.
+
+Para preservar read-your-writes, cada escrita de um usuário grava um
+marcador no cache por `DATABASE_READ_YOUR_WRITES_SECONDS`; enquanto o
+marcador existir as leituras desse usuário continuam no primário.
+
+Com shards configurados (`DATABASE_SHARD_URLS`), os dados dos usuários
+(apps em `SHARDED_APPS`) ficam no shard de cada usuário: `ShardRouter`
+envia leituras e escritas desses modelos para o shard do contexto atual,
+definido por `use_shard()` ou, na requisição, pela autenticação (ver
+apps.core.sharding). Sem shard no contexto, ou no shard `default`, o
+roteamento segue para o `ReplicaRouter`.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction as db_transaction
+
+PRIMARY = 'default'
+
+# Apps cujos modelos são dados de usuário e ficam no shard do usuário
+SHARDED_APPS = {'transactions', 'analytics'}
+
+_use_replica = ContextVar('use_replica', default=False)
+_shard = ContextVar('shard', default=None)
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith('replica')]
+
+
+def _recent_write_key(user_id):
+    return f'db:recent-write:{user_id}'
+
+
+def mark_recent_write(user_id):
+    cache.set(_recent_write_key(user_id), 1, timeout=settings.DATABASE_READ_YOUR_WRITES_SECONDS)
+
+
+def wrote_recently(user_id):
+    return cache.get(_recent_write_key(user_id)) is not None
+
+
+def replica_allowed(user):
+    """Indica se as leituras do usuário podem ir para uma réplica agora."""
+    if not replica_aliases():
+        return False
+    return not (user and user.is_authenticated and wrote_recently(user.pk))
+
+
+def route_reads_to_replica():
+    """Envia as leituras do contexto atual para as réplicas; retorna o token para `reset_routing`."""
+    return _use_replica.set(True)
+
+
+def reset_routing(token):
+    _use_replica.reset(token)
+
+
+@contextmanager
+def use_replica(enabled=True):
+    token = _use_replica.set(enabled)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class ReplicaRouter:
+    """Leituras marcadas para réplica vão para uma réplica aleatória; o resto vai para o primário."""
+
+    def db_for_read(self, model, **hints):
+        if _use_replica.get():
+            replicas = replica_aliases()
+            if replicas:
+                return random.choice(replicas)
+        return PRIMARY
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplicas têm os mesmos dados do primário
+        databases = {PRIMARY, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
+
+
+def shard_aliases():
+    """Shards configurados; o primário é sempre o primeiro."""
+    return [PRIMARY, *(alias for alias in settings.DATABASES if alias.startswith('shard'))]
+
+
+def is_sharded(model):
+    return model._meta.app_label in SHARDED_APPS
+
+
+def current_shard():
+    return _shard.get()
+
+
+def route_to_shard(alias):
+    """Envia os modelos com shard do contexto atual para `alias`; retorna o token para `reset_shard`."""
+    return _shard.set(alias)
+
+
+def reset_shard(token):
+    _shard.reset(token)
+
+
+@contextmanager
+def use_shard(alias):
+    token = _shard.set(alias)
+    try:
+        yield
+    finally:
+        _shard.reset(token)
+
+
+def atomic(**kwargs):
+    """`transaction.atomic` no banco dos dados do usuário do contexto atual."""
+    return db_transaction.atomic(using=_shard.get() or PRIMARY, **kwargs)
+
+
+class ShardRouter:
+    """Modelos de `SHARDED_APPS` vão para o shard da instância ou do contexto."""
+
+    def _shard_for(self, model, hints):
+        if not is_sharded(model):
+            return None
+        instance = hints.get('instance')
+        if instance is not None and is_sharded(type(instance)) and instance._state.db:
+            alias = instance._state.db
+        else:
+            alias = _shard.get()
+        # No primário, réplicas continuam valendo
+        return alias if alias and alias != PRIMARY else None
+
+    def db_for_read(self, model, **hints):
+        return self._shard_for(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._shard_for(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Modelos sem shard (usuários) têm cópia em todos os shards
+        if not (is_sharded(type(obj1)) and is_sharded(type(obj2))):
+            return True
+        databases = (obj1._state.db or '', obj2._state.db or '')
+        if any(alias.startswith('shard') for alias in databases):
+            return databases[0] == databases[1]
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Todos os shards têm o esquema completo
+        if db.startswith('shard'):
+            return True
+        return None
@@ -0,0 +1,73 @@
+"""
+Mapa de identidade por requisição.
+
+Em uma escrita, a mesma conta e a mesma categoria eram carregadas várias
+vezes: na validação dos campos do serializer, no `full_clean()` do modelo
+(que confere se cada chave estrangeira existe), no ajuste dos saldos e em um
+segundo `get_object()`. Além das consultas repetidas, instâncias distintas
+da mesma conta faziam um ajuste de saldo sobrescrever o outro.
+
+Com o mapa ativo (`IdentityMapMiddleware`, em cada requisição da API),
+cada objeto é buscado no máximo uma vez e todos os caminhos recebem a mesma
+instância. Só devem entrar no mapa objetos carregados por consultas já
+restritas ao usuário da requisição. Tarefas e comandos não passam pelos
+serializers nem pelas views e não usam o mapa; um código fora da API que
+reutilize esses caminhos pode ativá-lo com `identity_map()`.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_objects = ContextVar('identity_map', default=None)
+
+
+@contextmanager
+def identity_map():
+    token = _objects.set({})
+    try:
+        yield
+    finally:
+        _objects.reset(token)
+
+
+def _key(model, pk):
+    return model._meta.concrete_model, pk
+
+
+def remember(*instances):
+    """Registra instâncias já carregadas; None e objetos não salvos são ignorados."""
+    objects = _objects.get()
+    if objects is None:
+        return
+    for instance in instances:
+        if instance is not None and instance.pk is not None:
+            objects.setdefault(_key(type(instance), instance.pk), instance)
+
+
+def get(queryset, pk):
+    """
+    Objeto de `queryset` com a chave `pk`, consultado só na primeira vez.
+    Levanta `DoesNotExist`, ou `ValidationError` para chaves inválidas.
+    """
+    model = queryset.model
+    pk = model._meta.pk.to_python(pk)
+    objects = _objects.get()
+    if objects is not None and _key(model, pk) in objects:
+        return objects[_key(model, pk)]
+    instance = queryset.get(pk=pk)
+    remember(instance)
+    return instance
+
+
+def loaded_relations(instance):
+    """
+    Chaves estrangeiras cujo objeto relacionado já foi carregado do banco e
+    que, portanto, existem: podem ser excluídas do `full_clean()`.
+    """
+    names = []
+    for field in instance._meta.concrete_fields:
+        if not field.many_to_one or not field.is_cached(instance):
+            continue
+        related = field.get_cached_value(instance)
+        if related is not None and not related._state.adding and related.pk == getattr(instance, field.attname):
+            names.append(field.name)
+    return names
@@ -0,0 +1,254 @@
+"""
+Teste de carga de ponta a ponta contra um servidor em execução.
+
+Cada worker (uma thread com conexão HTTP persistente) autentica um usuário
+sintético pelo login JWT e repete requisições sorteadas conforme os pesos
+do mix de tráfego até o fim da duração. As latências são agregadas por
+endpoint (vazão, p50, p95, p99) e o resultado pode ser gravado em JSON e
+comparado com uma execução anterior.
+"""
+import http.client
+import json
+import math
+import random
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+from urllib.parse import urlsplit
+
+
+@dataclass
+class Endpoint:
+    """Requisição do mix de tráfego; `path` e `body` podem depender da sessão."""
+
+    name: str
+    weight: int
+    method: str
+    path: object
+    body: object = None
+
+
+def _period(session):
+    today = date.today()
+    return f'start_date={today.replace(day=1) - timedelta(days=90):%Y-%m-%d}&end_date={today:%Y-%m-%d}'
+
+
+def _new_transaction(session):
+    return {
+        'title': session.rng.choice(['Supermercado', 'Padaria', 'Farmácia', 'Restaurante']),
+        'amount': f'{session.rng.randint(100, 50000) / 100:.2f}',
+        'transaction_type': 'expense',
+        'category': session.rng.choice(session.categories),
+        'account': session.rng.choice(session.accounts),
+        'date': f'{date.today():%Y-%m-%d}',
+        'status': 'completed',
+        'allow_duplicate': True,
+    }
+
+
+MIXES = {
+    'default': [
+        Endpoint('transactions-list', 30, 'GET', '/api/transactions/transactions/'),
+        Endpoint('transactions-filtered', 10, 'GET',
+                 lambda s: f'/api/transactions/transactions/?transaction_type=expense&{_period(s)}'),
+        Endpoint('transactions-create', 10, 'POST', '/api/transactions/transactions/', _new_transaction),
+        Endpoint('transactions-summary', 10, 'GET', '/api/transactions/transactions/summary/'),
+        Endpoint('transactions-by-category', 5, 'GET', '/api/transactions/transactions/by_category/'),
+        Endpoint('transactions-timeseries', 5, 'GET', '/api/transactions/transactions/timeseries/'),
+        Endpoint('accounts-summary', 10, 'GET', '/api/transactions/accounts/summary/'),
+        Endpoint('analytics-dashboard', 15, 'GET', '/api/analytics/dashboard/'),
+        Endpoint('login', 5, 'LOGIN', '/api/auth/login/'),
+    ],
+    'read-heavy': [
+        Endpoint('transactions-list', 50, 'GET', '/api/transactions/transactions/'),
+        Endpoint('transactions-summary', 20, 'GET', '/api/transactions/transactions/summary/'),
+        Endpoint('accounts-summary', 15, 'GET', '/api/transactions/accounts/summary/'),
+        Endpoint('analytics-dashboard', 15, 'GET', '/api/analytics/dashboard/'),
+    ],
+    'write-heavy': [
+        Endpoint('transactions-create', 60, 'POST', '/api/transactions/transactions/', _new_transaction),
+        Endpoint('transactions-list', 30, 'GET', '/api/transactions/transactions/'),
+        Endpoint('transactions-summary', 10, 'GET', '/api/transactions/transactions/summary/'),
+    ],
+}
+
+
+def percentile(ordered, fraction):
+    """Percentil por posição (nearest-rank) de uma lista ordenada."""
+    if not ordered:
+        return None
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class Session:
+    """Conexão e credenciais de um worker."""
+
+    def __init__(self, base_url, email, password, seed, timeout):
+        parts = urlsplit(base_url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.connection = connection_class(parts.hostname, parts.port, timeout=timeout)
+        self.prefix = parts.path.rstrip('/')
+        self.email, self.password = email, password
+        self.rng = random.Random(seed)
+        self.token = None
+        self.accounts, self.categories = [], []
+
+    def request(self, method, path, body=None):
+        headers = {'Accept': 'application/json'}
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        try:
+            self.connection.request(method, self.prefix + path, body=payload, headers=headers)
+            response = self.connection.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            # Conexão descartada pelo servidor: reabre na próxima requisição
+            self.connection.close()
+            raise
+        return response.status, data
+
+    def login(self):
+        self.token = None
+        status, data = self.request('POST', '/api/auth/login/', {'email': self.email, 'password': self.password})
+        if status == 200:
+            self.token = json.loads(data)['access']
+        return status
+
+    def load_references(self):
+        """Contas e categorias de despesa usadas nas criações."""
+        _, data = self.request('GET', '/api/transactions/accounts/')
+        self.accounts = [item['id'] for item in _results(data)]
+        _, data = self.request('GET', '/api/transactions/categories/by_type/?type=expense')
+        self.categories = [item['id'] for item in _results(data)]
+
+
+def _results(data):
+    payload = json.loads(data or b'[]')
+    return payload['results'] if isinstance(payload, dict) else payload
+
+
+class Recorder:
+    """Latências e status por endpoint, compartilhados entre as threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies, self.statuses, self.errors = {}, {}, {}
+
+    def add(self, name, elapsed, status):
+        with self._lock:
+            self.latencies.setdefault(name, []).append(elapsed)
+            statuses = self.statuses.setdefault(name, {})
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == 'error' or status >= 400:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+    def report(self, duration):
+        endpoints = {}
+        for name, latencies in sorted(self.latencies.items()):
+            ordered = sorted(latencies)
+            endpoints[name] = {
+                'requests': len(ordered),
+                'errors': self.errors.get(name, 0),
+                'statuses': {str(status): count for status, count in sorted(self.statuses[name].items(), key=str)},
+                'throughput': round(len(ordered) / duration, 2),
+                'mean_ms': round(sum(ordered) / len(ordered) * 1000, 2),
+                'p50_ms': round(percentile(ordered, 0.50) * 1000, 2),
+                'p95_ms': round(percentile(ordered, 0.95) * 1000, 2),
+                'p99_ms': round(percentile(ordered, 0.99) * 1000, 2),
+                'max_ms': round(ordered[-1] * 1000, 2),
+            }
+        total = sum(item['requests'] for item in endpoints.values())
+        return {
+            'requests': total,
+            'errors': sum(item['errors'] for item in endpoints.values()),
+            'throughput': round(total / duration, 2) if duration else 0,
+            'endpoints': endpoints,
+        }
+
+
+def _timed(recorder, name, call):
+    started = time.perf_counter()
+    try:
+        status = call()
+    except (OSError, http.client.HTTPException):
+        status = 'error'
+    recorder.add(name, time.perf_counter() - started, status)
+    return status
+
+
+def _worker(session, mix, deadline, recorder, max_requests):
+    if _timed(recorder, 'login', session.login) != 200:
+        return
+    session.load_references()
+    weights = [endpoint.weight for endpoint in mix]
+    sent = 0
+    while time.monotonic() < deadline and (not max_requests or sent < max_requests):
+        endpoint = session.rng.choices(mix, weights)[0]
+        if endpoint.method == 'LOGIN':
+            _timed(recorder, endpoint.name, session.login)
+        else:
+            path = endpoint.path(session) if callable(endpoint.path) else endpoint.path
+            body = endpoint.body(session) if endpoint.body else None
+            if body is not None and not (session.accounts and session.categories):
+                continue
+            _timed(recorder, endpoint.name, lambda: session.request(endpoint.method, path, body)[0])
+        sent += 1
+    session.connection.close()
+
+
+def run(base_url, credentials, mix_name='default', concurrency=10, duration=30,
+        max_requests=None, timeout=30, seed=0):
+    """
+    Executa o teste e retorna o relatório. `credentials` é uma lista de
+    (e-mail, senha), distribuída entre os workers.
+    """
+    mix = MIXES[mix_name]
+    recorder = Recorder()
+    started = time.monotonic()
+    deadline = started + duration
+    threads = []
+    for index in range(concurrency):
+        email, password = credentials[index % len(credentials)]
+        session = Session(base_url, email, password, seed + index, timeout)
+        thread = threading.Thread(
+            target=_worker, args=(session, mix, deadline, recorder, max_requests), daemon=True
+        )
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    return {
+        'config': {
+            'url': base_url,
+            'mix': mix_name,
+            'concurrency': concurrency,
+            'duration': duration,
+            'users': len(credentials),
+        },
+        'elapsed': round(elapsed, 2),
+        **recorder.report(elapsed),
+    }
+
+
+def compare(current, previous):
+    """Variação de vazão e p95 por endpoint em relação a um resultado anterior."""
+    rows = []
+    for name, stats in current['endpoints'].items():
+        before = previous.get('endpoints', {}).get(name)
+        if not before:
+            continue
+        rows.append({
+            'endpoint': name,
+            'throughput': (before['throughput'], stats['throughput']),
+            'p95_ms': (before['p95_ms'], stats['p95_ms']),
+            'p95_change': round((stats['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100, 1)
+            if before['p95_ms'] else None,
+        })
+    return rows
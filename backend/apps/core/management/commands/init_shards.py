@@ -0,0 +1,35 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core import sharding
+from apps.core.db_routers import PRIMARY, shard_aliases
+
+
+class Command(BaseCommand):
+    help = (
+        'Prepara os shards de DATABASE_SHARD_URLS: aplica as migrações e leva as sequências '
+        'de cada shard para a sua faixa de ids. Pode ser executado novamente a cada shard novo.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shard', action='append', dest='shards',
+                            help='Prepara apenas o shard informado (pode ser repetido).')
+        parser.add_argument('--skip-migrate', action='store_true',
+                            help='Apenas ajusta as sequências.')
+
+    def handle(self, *args, **options):
+        aliases = [alias for alias in shard_aliases() if alias != PRIMARY]
+        if options['shards']:
+            unknown = set(options['shards']) - set(aliases)
+            if unknown:
+                raise CommandError(f"Shards desconhecidos: {', '.join(sorted(unknown))}.")
+            aliases = options['shards']
+        if not aliases:
+            raise CommandError('Nenhum shard configurado em DATABASE_SHARD_URLS.')
+
+        for alias in aliases:
+            if not options['skip_migrate']:
+                call_command('migrate', database=alias, interactive=False, verbosity=options['verbosity'])
+            tables = sharding.init_sequences(alias)
+            start = sharding.shard_index(alias) * sharding.SHARD_ID_BLOCK
+            self.stdout.write(self.style.SUCCESS(f'{alias}: {len(tables)} sequências a partir de {start}.'))
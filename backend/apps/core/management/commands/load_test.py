@@ -0,0 +1,121 @@
+import json
+import os
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.core import loadtest
+from apps.transactions.seeding import create_seed_user, seed_transactions
+
+User = get_user_model()
+
+PREFIX = 'loadtest'
+
+
+class Command(BaseCommand):
+    help = (
+        'Executa um teste de carga contra um servidor já iniciado (runserver, gunicorn...) e '
+        'reporta vazão e p50/p95/p99 por endpoint. Com --seed cria antes os usuários sintéticos '
+        'na base configurada, que deve ser a mesma usada pelo servidor.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000',
+                            help='Endereço do servidor (padrão: http://127.0.0.1:8000).')
+        parser.add_argument('--mix', choices=sorted(loadtest.MIXES), default='default',
+                            help='Mix de tráfego (padrão: default).')
+        parser.add_argument('--concurrency', type=int, default=10,
+                            help='Workers simultâneos (padrão: 10).')
+        parser.add_argument('--duration', type=int, default=30,
+                            help='Duração em segundos (padrão: 30).')
+        parser.add_argument('--max-requests', type=int,
+                            help='Limite de requisições por worker.')
+        parser.add_argument('--users', type=int, default=10,
+                            help='Usuários sintéticos distribuídos entre os workers (padrão: 10).')
+        parser.add_argument('--password', default='loadtest-password',
+                            help='Senha dos usuários sintéticos.')
+        parser.add_argument('--seed', action='store_true',
+                            help='Cria os usuários sintéticos que ainda não existem.')
+        parser.add_argument('--rows-per-user', type=int, default=2000,
+                            help='Transações de cada usuário criado com --seed (padrão: 2000).')
+        parser.add_argument('--output',
+                            help='Grava o resultado em JSON (diretório ou arquivo).')
+        parser.add_argument('--compare',
+                            help='Resultado anterior (JSON) para comparar vazão e p95.')
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            self.seed(options['users'], options['rows_per_user'], options['password'])
+
+        credentials = [(f'{PREFIX}{index}@example.com', options['password']) for index in range(options['users'])]
+        if not credentials:
+            raise CommandError('Informe ao menos um usuário.')
+
+        self.stdout.write(
+            f"Mix {options['mix']}: {options['concurrency']} workers por {options['duration']}s em {options['url']}..."
+        )
+        result = loadtest.run(
+            options['url'],
+            credentials,
+            mix_name=options['mix'],
+            concurrency=options['concurrency'],
+            duration=options['duration'],
+            max_requests=options['max_requests'],
+        )
+        result['started_at'] = timezone.now().isoformat()
+        login = result['endpoints'].get('login')
+        if not login or login['requests'] == login['errors']:
+            raise CommandError('Nenhum login bem-sucedido; use --seed ou confira --url e --password.')
+
+        self.print_report(result)
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as previous:
+                self.print_comparison(loadtest.compare(result, json.load(previous)))
+        if options['output']:
+            self.save(result, options['output'])
+
+    def seed(self, users, rows_per_user, password):
+        existing = set(
+            User.objects.filter(username__startswith=PREFIX).values_list('username', flat=True)
+        )
+        for index in range(users):
+            if f'{PREFIX}{index}' in existing:
+                continue
+            user = create_seed_user(index, prefix=PREFIX, password=password)
+            seed_transactions(user, rows_per_user)
+            self.stdout.write(f'Usuário {user.email} criado com {rows_per_user} transações.')
+
+    def print_report(self, result):
+        header = f"{'endpoint':<28}{'req':>7}{'err':>6}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for name, stats in result['endpoints'].items():
+            self.stdout.write(
+                f"{name:<28}{stats['requests']:>7}{stats['errors']:>6}{stats['throughput']:>9.1f}"
+                f"{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}{stats['max_ms']:>9.1f}"
+            )
+        style = self.style.ERROR if result['errors'] else self.style.SUCCESS
+        self.stdout.write(style(
+            f"{result['requests']} requisições em {result['elapsed']}s "
+            f"({result['throughput']} req/s), {result['errors']} com erro. Latências em ms."
+        ))
+
+    def print_comparison(self, rows):
+        for row in rows:
+            change = row['p95_change']
+            text = (
+                f"{row['endpoint']:<28}req/s {row['throughput'][0]} -> {row['throughput'][1]}, "
+                f"p95 {row['p95_ms'][0]} -> {row['p95_ms'][1]} ms"
+                + (f' ({change:+.1f}%)' if change is not None else '')
+            )
+            self.stdout.write(self.style.ERROR(text) if change and change > 10 else text)
+
+    def save(self, result, output):
+        path = output
+        if os.path.isdir(output) or output.endswith(os.sep):
+            os.makedirs(output, exist_ok=True)
+            path = os.path.join(output, f"loadtest_{result['config']['mix']}_{timezone.now():%Y%m%d%H%M%S}.json")
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(result, file, indent=2)
+        self.stdout.write(f'Resultado gravado em {path}.')
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core import sharding
+from apps.core.db_routers import shard_aliases
+
+
+class Command(BaseCommand):
+    help = (
+        'Move os dados de usuários para outro shard. Enquanto a cópia acontece o usuário recebe '
+        '503 na API; a origem só é limpa depois que o diretório aponta para o shard novo.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users', required=True,
+                            help='Usuário a mover (pode ser repetido).')
+        parser.add_argument('--to', required=True, dest='target',
+                            help=f"Shard de destino ({', '.join(shard_aliases())}).")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Linhas copiadas por lote (padrão: 1000).')
+
+    def handle(self, *args, **options):
+        for user_id in options['users']:
+            source = sharding.shard_for_user(user_id)
+            try:
+                copied = sharding.move_user(user_id, options['target'], batch_size=options['batch_size'])
+            except sharding.ShardError as e:
+                raise CommandError(f'Usuário {user_id}: {e}')
+            if not copied:
+                self.stdout.write(f"Usuário {user_id}: já está em {options['target']}.")
+                continue
+            self.stdout.write(self.style.SUCCESS(
+                f"Usuário {user_id}: {sum(copied.values())} linhas movidas de {source} para {options['target']}."
+            ))
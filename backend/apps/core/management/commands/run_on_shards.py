@@ -0,0 +1,30 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.db_routers import shard_aliases, use_shard
+
+
+class Command(BaseCommand):
+    help = (
+        'Executa um comando de manutenção uma vez em cada shard (ex.: run_on_shards '
+        'reconcile_balances --fix), com os dados de usuário direcionados ao shard da vez.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('command_name', help='Comando a executar.')
+        parser.add_argument('arguments', nargs='*', help='Argumentos do comando (use -- antes das opções).')
+        parser.add_argument('--shard', action='append', dest='shards',
+                            help='Executa apenas no shard informado (pode ser repetido).')
+
+    def handle(self, *args, **options):
+        aliases = shard_aliases()
+        if options['shards']:
+            unknown = set(options['shards']) - set(aliases)
+            if unknown:
+                raise CommandError(f"Shards desconhecidos: {', '.join(sorted(unknown))}.")
+            aliases = options['shards']
+
+        for alias in aliases:
+            self.stdout.write(f'== {alias}')
+            with use_shard(alias):
+                call_command(options['command_name'], *options['arguments'])
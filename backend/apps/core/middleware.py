@@ -0,0 +1,50 @@
+from rest_framework.permissions import SAFE_METHODS
+
+from .db_routers import mark_recent_write, use_replica, use_shard
+from .identity import identity_map
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Delimita o roteamento para réplicas ao escopo da requisição (inclusive a
+    renderização da resposta) e marca o usuário após escritas bem-sucedidas
+    para que suas próximas leituras permaneçam no primário.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with use_replica(False):
+            response = self.get_response(request)
+
+        user = getattr(request, 'user', None)
+        if (request.method not in SAFE_METHODS and response.status_code < 400
+                and user is not None and user.is_authenticated):
+            mark_recent_write(user.pk)
+        return response
+
+
+class ShardRoutingMiddleware:
+    """
+    Delimita o shard definido na autenticação ao escopo da requisição, para
+    que não vaze para a próxima requisição atendida pela mesma thread.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with use_shard(None):
+            return self.get_response(request)
+
+
+class IdentityMapMiddleware:
+    """Um mapa de identidade (apps.core.identity) novo para cada requisição."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with identity_map():
+            return self.get_response(request)
@@ -0,0 +1,25 @@
+from rest_framework.permissions import SAFE_METHODS
+
+from .db_routers import replica_allowed, route_reads_to_replica
+
+
+class ReplicaReadMixin:
+    """
+    Lê de uma réplica nas requisições seguras das ações em `replica_actions`
+    (todas, se None), exceto logo após escritas do usuário.
+
+    Requer `ReplicaRoutingMiddleware`, que restaura o roteamento ao fim da
+    requisição.
+    """
+
+    replica_actions = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        action = getattr(self, 'action', None)
+        if request.method not in SAFE_METHODS:
+            return
+        if self.replica_actions is not None and action not in self.replica_actions:
+            return
+        if replica_allowed(request.user):
+            route_reads_to_replica()
@@ -0,0 +1,26 @@
+from django.db import models
+
+
+class ShardAssignment(models.Model):
+    """
+    Diretório de shards: em qual banco ficam os dados de cada usuário.
+
+    Fica sempre no primário. Usuários sem registro estão no primário.
+    """
+
+    user_id = models.BigIntegerField(unique=True)
+    shard = models.CharField(max_length=50)
+    # Enquanto verdadeiro os dados estão sendo movidos e as requisições do usuário são recusadas
+    locked = models.BooleanField(default=False)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'shard_assignments'
+        verbose_name = 'Shard Assignment'
+        verbose_name_plural = 'Shard Assignments'
+        ordering = ['user_id']
+
+    def __str__(self):
+        return f"{self.user_id} -> {self.shard}"
@@ -0,0 +1,282 @@
+"""
+Sharding por usuário.
+
+Os dados de cada usuário (modelos dos apps em `SHARDED_APPS`) ficam em um
+único banco: o primário ou um dos shards de `DATABASE_SHARD_URLS`. O
+diretório `ShardAssignment`, no primário e com cache, diz onde; usuários
+sem registro estão no primário. Usuários novos são distribuídos por hash do
+id entre os shards de `DATABASE_SHARDS_FOR_NEW_USERS` (padrão: todos) e
+registrados no diretório, que a partir daí é a fonte da verdade: mover um
+usuário (`move_user`) é copiar suas linhas e trocar o registro.
+
+Cada shard tem o esquema completo e uma cópia da linha de cada usuário
+que hospeda, só para as chaves estrangeiras. As chaves primárias de cada
+shard começam em `índice * SHARD_ID_BLOCK` (`init_sequences`), então são
+únicas entre shards e as linhas mudam de shard sem trocar de id.
+
+Na API, a autenticação direciona a requisição para o shard do usuário;
+tarefas e comandos usam `use_user_shard()` ou `for_each_shard()`.
+"""
+import time
+import zlib
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections, transaction as db_transaction
+from django.db.models import Count, Max
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from apps.analytics.models import AnalyticsCache, AnomalyDetection, Forecast
+from apps.transactions.models import (
+    Account, BalanceAdjustment, BalanceCheckpoint, BalanceSnapshot, BudgetUsage, Category, CategoryBudget,
+    CategoryClosure, CategoryTokenCount, CategoryTokenIndex, RecurringTransaction, Tag, Transaction,
+    TransactionArchive, TransactionSplit, TransactionTag,
+)
+
+from .db_routers import PRIMARY, is_sharded, route_to_shard, shard_aliases, use_shard
+from .models import ShardAssignment
+
+# Faixa de chaves primárias de cada shard: shardN começa em N * SHARD_ID_BLOCK
+SHARD_ID_BLOCK = 10 ** 12
+
+# (modelo, campo que liga a linha ao usuário), na ordem de cópia
+USER_TABLES = [
+    (Category, 'user_id'),
+    (CategoryClosure, 'descendant__user_id'),
+    (Account, 'user_id'),
+    (BalanceAdjustment, 'account__user_id'),
+    (Tag, 'user_id'),
+    (Transaction, 'user_id'),
+    (TransactionSplit, 'transaction__user_id'),
+    (TransactionTag, 'transaction__user_id'),
+    (RecurringTransaction, 'user_id'),
+    (BalanceSnapshot, 'account__user_id'),
+    (BalanceCheckpoint, 'account__user_id'),
+    (TransactionArchive, 'user_id'),
+    (CategoryBudget, 'user_id'),
+    (BudgetUsage, 'user_id'),
+    (CategoryTokenIndex, 'user_id'),
+    (CategoryTokenCount, 'user_id'),
+    (AnomalyDetection, 'user_id'),
+    (Forecast, 'user_id'),
+    # Resultados em cache não são copiados: são recalculados no shard novo
+    (AnalyticsCache, 'user_id'),
+]
+NOT_COPIED = {AnalyticsCache}
+
+
+class ShardError(Exception):
+    """Erro ao mover um usuário entre shards."""
+
+
+class ShardMoveInProgress(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Seus dados estão sendo migrados. Tente novamente em instantes.'
+    default_code = 'shard_move_in_progress'
+
+
+def sharding_enabled():
+    return len(shard_aliases()) > 1
+
+
+def _cache_key(user_id):
+    return f'shard:user:{user_id}'
+
+
+def placement(user_id):
+    """Shard de um usuário novo, por hash estável do id."""
+    aliases = settings.DATABASE_SHARDS_FOR_NEW_USERS or shard_aliases()
+    return aliases[zlib.crc32(str(user_id).encode()) % len(aliases)]
+
+
+def _lookup(user_id):
+    """(shard, bloqueado) do usuário, pelo cache ou pelo diretório."""
+    if not sharding_enabled():
+        return PRIMARY, False
+    key = _cache_key(user_id)
+    entry = cache.get(key)
+    if entry is None:
+        row = ShardAssignment.objects.using(PRIMARY).filter(user_id=user_id).values_list('shard', 'locked').first()
+        entry = tuple(row) if row else (PRIMARY, False)
+        cache.set(key, entry, timeout=settings.SHARD_DIRECTORY_CACHE_SECONDS)
+    return entry
+
+
+def shard_for_user(user_id):
+    return _lookup(user_id)[0]
+
+
+def route_to_user(user_id):
+    """Direciona o contexto atual (a requisição) para o shard do usuário; retorna o token."""
+    alias, locked = _lookup(user_id)
+    if locked:
+        raise ShardMoveInProgress()
+    return route_to_shard(alias)
+
+
+@contextmanager
+def use_user_shard(user_id):
+    with use_shard(shard_for_user(user_id)):
+        yield
+
+
+def for_each_shard():
+    """Percorre os shards, com o contexto direcionado a cada um."""
+    for alias in shard_aliases():
+        with use_shard(alias):
+            yield alias
+
+
+def mirror_user(user, alias):
+    """Copia (ou atualiza) a linha do usuário no shard, usada pelas chaves estrangeiras e joins."""
+    if alias == PRIMARY:
+        return
+    User = get_user_model()
+    values = {field.attname: getattr(user, field.attname) for field in User._meta.concrete_fields}
+    User.objects.using(alias).bulk_create(
+        [User(**values)],
+        update_conflicts=True,
+        unique_fields=[User._meta.pk.attname],
+        update_fields=[name for name in values if name != User._meta.pk.attname],
+    )
+
+
+def sync_user(user):
+    """Mantém a cópia do usuário no shard igual à do primário."""
+    if sharding_enabled():
+        mirror_user(user, shard_for_user(user.pk))
+
+
+def assign_new_user(user):
+    """Escolhe e registra o shard de um usuário recém-criado."""
+    if not sharding_enabled():
+        return PRIMARY
+    alias = placement(user.pk)
+    ShardAssignment.objects.using(PRIMARY).update_or_create(user_id=user.pk, defaults={'shard': alias})
+    mirror_user(user, alias)
+    cache.set(_cache_key(user.pk), (alias, False), timeout=settings.SHARD_DIRECTORY_CACHE_SECONDS)
+    return alias
+
+
+def forget_user(user_id):
+    """Remove o registro e a cópia do usuário no seu shard, após a exclusão dos dados."""
+    alias = shard_for_user(user_id)
+    if alias != PRIMARY:
+        get_user_model().objects.using(alias).filter(pk=user_id).delete()
+    ShardAssignment.objects.using(PRIMARY).filter(user_id=user_id).delete()
+    cache.delete(_cache_key(user_id))
+
+
+def _set_assignment(user_id, alias, locked):
+    ShardAssignment.objects.using(PRIMARY).update_or_create(
+        user_id=user_id, defaults={'shard': alias, 'locked': locked}
+    )
+    cache.delete(_cache_key(user_id))
+
+
+def _user_rows(model, field, user_id, alias):
+    return model._base_manager.using(alias).filter(**{field: user_id})
+
+
+def _rows_state(model, field, user_id, alias):
+    """Contagem e última alteração das linhas do usuário, para detectar escritas durante a cópia."""
+    aggregates = {'count': Count('pk')}
+    if any(f.name == 'updated_at' for f in model._meta.concrete_fields):
+        aggregates['updated_at'] = Max('updated_at')
+    return _user_rows(model, field, user_id, alias).aggregate(**aggregates)
+
+
+def move_user(user_id, target, batch_size=1000):
+    """
+    Move os dados do usuário para o shard `target`. Durante a cópia o
+    usuário fica bloqueado (503 na API); antes de copiar, espera
+    `SHARD_MOVE_DRAIN_SECONDS` para que requisições que resolveram o shard
+    antes do bloqueio terminem. Se a origem mudar durante a cópia, a cópia
+    é desfeita e o usuário continua na origem. A troca no diretório só
+    acontece depois que a cópia foi confirmada, e só então as linhas da
+    origem são removidas. Retorna {tabela: linhas copiadas}.
+    """
+    if target not in shard_aliases():
+        raise ShardError(f'Shard desconhecido: {target}.')
+    user = get_user_model().objects.using(PRIMARY).get(pk=user_id)
+    source = shard_for_user(user_id)
+    if source == target:
+        return {}
+
+    _set_assignment(user_id, source, locked=True)
+    try:
+        # Requisições em andamento podem ter resolvido o shard antes do bloqueio e ainda escrever na origem
+        time.sleep(settings.SHARD_MOVE_DRAIN_SECONDS)
+        mirror_user(user, target)
+        copied, states = {}, {}
+        with db_transaction.atomic(using=target):
+            for model, field in USER_TABLES:
+                if model in NOT_COPIED:
+                    continue
+                states[model] = (field, _rows_state(model, field, user_id, source))
+                rows = _user_rows(model, field, user_id, source).order_by('pk')
+                last_pk, count = None, 0
+                while True:
+                    page = rows.filter(pk__gt=last_pk) if last_pk is not None else rows
+                    batch = list(page[:batch_size])
+                    if not batch:
+                        break
+                    model._base_manager.using(target).bulk_create(batch)
+                    last_pk, count = batch[-1].pk, count + len(batch)
+                if count != _user_rows(model, field, user_id, target).count():
+                    raise ShardError(f'Contagem divergente em {model._meta.db_table}; o shard {target} já tinha linhas do usuário.')
+                copied[model._meta.db_table] = count
+            # Uma escrita na origem depois da cópia seria perdida na limpeza: desfaz a cópia
+            for model, (field, state) in states.items():
+                if _rows_state(model, field, user_id, source) != state:
+                    raise ShardError(f'{model._meta.db_table} mudou na origem durante a cópia; tente novamente.')
+    except Exception:
+        _set_assignment(user_id, source, locked=False)
+        raise
+
+    _set_assignment(user_id, target, locked=False)
+
+    # Origem: remove as linhas copiadas, das dependentes para as principais
+    with db_transaction.atomic(using=source):
+        for model, field in reversed(USER_TABLES):
+            _user_rows(model, field, user_id, source).delete()
+        if source != PRIMARY:
+            get_user_model().objects.using(source).filter(pk=user_id).delete()
+    return copied
+
+
+def shard_index(alias):
+    return 0 if alias == PRIMARY else int(alias[len('shard'):])
+
+
+def init_sequences(alias):
+    """
+    Leva as sequências das tabelas com shard para a faixa do shard. Retorna
+    as tabelas ajustadas; o primário (faixa 0) não precisa de ajuste.
+    """
+    start = shard_index(alias) * SHARD_ID_BLOCK
+    if not start:
+        return []
+    connection = connections[alias]
+    tables = sorted(model._meta.db_table for model in apps.get_models() if is_sharded(model))
+    with connection.cursor() as cursor:
+        for table in tables:
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    f"SELECT setval(pg_get_serial_sequence(%s, 'id'), GREATEST(%s, (SELECT COALESCE(MAX(id), 0) FROM {connection.ops.quote_name(table)})))",
+                    [table, start],
+                )
+            elif connection.vendor == 'sqlite':
+                cursor.execute('UPDATE sqlite_sequence SET seq = MAX(seq, %s) WHERE name = %s', [start, table])
+                cursor.execute(
+                    'INSERT INTO sqlite_sequence (name, seq) SELECT %s, %s '
+                    'WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = %s)',
+                    [table, start, table],
+                )
+            else:
+                raise ShardError(f'Banco {connection.vendor} não suportado.')
+    return tables
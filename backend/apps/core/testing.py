@@ -0,0 +1,56 @@
+"""
+Apoio aos testes da API.
+"""
+from unittest import mock
+
+from django.db import DEFAULT_DB_ALIAS
+from django.test import TestCase, override_settings
+from rest_framework.request import ForcedAuthentication
+
+from . import sharding, throttling
+from .db_routers import shard_aliases, use_shard
+
+
+def _forced_authenticate(self, request):
+    # `force_authenticate` dispensa a autenticação, que é quem direciona a requisição ao shard do usuário
+    user, token = self.force_user, self.force_token
+    if user is not None and user.is_authenticated:
+        sharding.route_to_user(user.pk)
+    return user, token
+
+
+class UserDataTestCase(TestCase):
+    """
+    `TestCase` com acesso a todos os bancos.
+    
+    Com `DATABASE_SHARD_URLS` configurado, criar um usuário já grava no shard
+    dele (`assign_user_shard`). Os usuários criados pela classe ficam todos no
+    último shard, e o contexto dos testes aponta para ele, como a autenticação
+    faz numa requisição; requisições com `force_authenticate` também são
+    direcionadas ao shard do usuário.
+    """
+    
+    databases = '__all__'
+    # Banco com os dados dos usuários da classe (para `assertNumQueries(using=...)` e afins)
+    user_db = DEFAULT_DB_ALIAS
+
+    @classmethod
+    def setUpClass(cls):
+        aliases = shard_aliases()
+        if len(aliases) > 1:
+            cls.user_db = aliases[-1]
+            cls.enterClassContext(override_settings(DATABASE_SHARDS_FOR_NEW_USERS=aliases[-1:]))
+            cls.enterClassContext(use_shard(aliases[-1]))
+            cls.enterClassContext(mock.patch.object(ForcedAuthentication, 'authenticate', _forced_authenticate))
+        super().setUpClass()
+
+
+class FreshThrottleMixin:
+    """Buckets de throttling em memória novos para a classe de testes, sem dividir tokens com as demais."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        patcher = mock.patch.object(throttling, '_store', throttling.InMemoryTokenBucket())
+        patcher.start()
+        cls.addClassCleanup(patcher.stop)
@@ -0,0 +1,416 @@
+import json
+import os
+import tempfile
+import uuid
+from contextlib import ExitStack, contextmanager
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import LiveServerTestCase, SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.transactions.models import Account, Transaction, TransactionSplit
+
+from . import db_routers, identity, loadtest, mixins, sharding, throttling
+from .db_routers import shard_aliases, use_shard
+from .testing import FreshThrottleMixin, UserDataTestCase
+
+
+@skipUnless(len(shard_aliases()) > 1, 'Exige shards em DATABASE_SHARD_URLS')
+@override_settings(SHARD_MOVE_DRAIN_SECONDS=0)
+class MoveUserTests(UserDataTestCase):
+    def setUp(self):
+        cache.clear()
+        for alias in shard_aliases():
+            sharding.init_sequences(alias)
+        self.user = User.objects.create_user(username='mov', email='mov@example.com', password='pw12345!')
+        self.source = sharding.shard_for_user(self.user.pk)
+        self.target = next(alias for alias in shard_aliases() if alias != self.source)
+        with use_shard(self.source):
+            account = self.user.accounts.get(name='Conta Corrente')
+            category = self.user.categories.get(name='Alimentação')
+            self.transaction = Transaction.objects.create(
+                user=self.user, title='Mercado', amount=Decimal('50.00'), transaction_type='expense',
+                category=category, account=account, date=date(2026, 3, 1),
+            )
+            TransactionSplit.objects.create(transaction=self.transaction, category=category, amount=Decimal('50.00'))
+
+    def rows(self, model, alias):
+        return model._base_manager.using(alias).filter(user_id=self.user.pk).count()
+
+    def test_rows_move_with_their_ids(self):
+        accounts = self.rows(Account, self.source)
+
+        copied = sharding.move_user(self.user.pk, self.target)
+
+        self.assertEqual(copied[Transaction._meta.db_table], 1)
+        self.assertEqual(sharding._lookup(self.user.pk), (self.target, False))
+        self.assertEqual((self.rows(Account, self.target), self.rows(Account, self.source)), (accounts, 0))
+        self.assertTrue(Transaction._base_manager.using(self.target).filter(pk=self.transaction.pk).exists())
+        self.assertEqual(self.rows(Transaction, self.source), 0)
+
+    def test_user_is_locked_while_in_flight_requests_drain(self):
+        def drain(seconds):
+            self.assertEqual(seconds, 7)
+            self.assertEqual(sharding._lookup(self.user.pk), (self.source, True))
+            self.assertEqual(self.rows(Transaction, self.target), 0)
+
+        with override_settings(SHARD_MOVE_DRAIN_SECONDS=7):
+            with mock.patch.object(sharding.time, 'sleep', side_effect=drain) as sleep:
+                sharding.move_user(self.user.pk, self.target)
+
+        sleep.assert_called_once()
+
+    def test_write_to_source_during_copy_aborts_move(self):
+        rows_state = sharding._rows_state
+        late = []
+
+        def write_during_copy(model, field, user_id, alias):
+            # Requisição atrasada grava na origem depois que as transações já foram copiadas
+            if model is TransactionSplit and not late:
+                with use_shard(self.source):
+                    late.append(Transaction.objects.create(
+                        user=self.user, title='Atrasada', amount=Decimal('5.00'), transaction_type='expense',
+                        category_id=self.transaction.category_id, account_id=self.transaction.account_id,
+                        date=date(2026, 3, 2),
+                    ))
+            return rows_state(model, field, user_id, alias)
+
+        with mock.patch.object(sharding, '_rows_state', side_effect=write_during_copy):
+            with self.assertRaises(sharding.ShardError):
+                sharding.move_user(self.user.pk, self.target)
+
+        self.assertEqual(sharding._lookup(self.user.pk), (self.source, False))
+        self.assertEqual(self.rows(Transaction, self.source), 2)
+        self.assertEqual(self.rows(Transaction, self.target), 0)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class InMemoryTokenBucketTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch.object(throttling.time, 'monotonic', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.store = throttling.InMemoryTokenBucket()
+
+    def test_cost_drains_bucket_until_refill(self):
+        bucket = [('throttle:user:1', 10, 2.0)]
+
+        self.assertEqual(self.store.consume(bucket, 6), (True, 0.0))
+        self.assertEqual(self.store.consume(bucket, 6), (False, 1.0))
+
+        self.clock.now += 1
+        self.assertEqual(self.store.consume(bucket, 6), (True, 0.0))
+        self.assertEqual(self.store.consume(bucket, 1), (False, 0.5))
+
+    def test_buckets_are_debited_together_or_not_at_all(self):
+        user, ip = ('throttle:user:1', 10, 1.0), ('throttle:ip:1.2.3.4', 4, 1.0)
+
+        self.assertEqual(self.store.consume([user, ip], 3), (True, 0.0))
+        self.assertEqual(self.store.consume([user, ip], 3), (False, 2.0))
+        # O bucket do usuário não pagou pela recusa
+        self.assertEqual(self.store.consume([user], 7), (True, 0.0))
+
+    def test_cost_above_capacity_empties_the_bucket(self):
+        bucket = [('throttle:user:1', 5, 1.0)]
+
+        self.assertEqual(self.store.consume(bucket, 50), (True, 0.0))
+        self.assertEqual(self.store.consume(bucket, 1), (False, 1.0))
+
+
+class RedisTokenBucketTests(SimpleTestCase):
+    def test_unreachable_redis_falls_back_to_memory(self):
+        store = throttling.RedisTokenBucket(url='redis://localhost:1/0')
+        bucket = [(f'throttle:user:{uuid.uuid4().hex}', 2, 0.001)]
+
+        with self.assertLogs(throttling.logger, 'WARNING'):
+            self.assertTrue(store.consume(bucket, 2)[0])
+            self.assertFalse(store.consume(bucket, 1)[0])
+
+    def test_script_debits_shared_buckets(self):
+        store = throttling.RedisTokenBucket()
+        try:
+            store.script.registered_client.ping()
+        except Exception:
+            self.skipTest('Redis indisponível em REDIS_URL')
+        bucket = [(f'throttle:user:{uuid.uuid4().hex}', 10, 0.001)]
+
+        self.assertEqual(store.consume(bucket, 6), (True, 0.0))
+        allowed, wait = throttling.RedisTokenBucket().consume(bucket, 6)
+        self.assertFalse(allowed)
+        self.assertGreater(wait, 1000)
+
+
+@override_settings(THROTTLE_BUCKETS={'user': (20, 0.001), 'ip': (1000, 1.0)})
+class CostThrottleTests(UserDataTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(throttling, '_store', throttling.InMemoryTokenBucket())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(username='thr', email='thr@example.com', password='pw12345!')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_expensive_actions_spend_more_tokens(self):
+        summary = '/api/transactions/transactions/summary/?start_date=2026-03-01&end_date=2026-03-31'
+        for _ in range(4):
+            self.assertEqual(self.client.get(summary).status_code, 200)
+
+        response = self.client.get(summary)
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 1000)
+
+    def test_users_have_separate_buckets(self):
+        summary = '/api/transactions/transactions/summary/?start_date=2026-03-01&end_date=2026-03-31'
+        for _ in range(4):
+            self.client.get(summary)
+        other = User.objects.create_user(username='thr2', email='thr2@example.com', password='pw12345!')
+        self.client.force_authenticate(other)
+
+        self.assertEqual(self.client.get(summary).status_code, 200)
+
+
+class WriteRequestsMixin:
+    url = '/api/transactions/transactions/'
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='idm', email='idm@example.com', password='pw12345!')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.account = self.user.accounts.get(name='Conta Corrente')
+        self.food = self.user.categories.get(name='Alimentação')
+        self.home = self.user.categories.get(name='Moradia')
+
+    def row(self, amount='100.00', food='30.00', **extra):
+        # Categoria principal repetida em um item: a mesma categoria chega por dois campos
+        return {
+            'title': 'Supermercado', 'amount': amount, 'transaction_type': 'expense', 'category': self.food.pk,
+            'account': self.account.pk, 'date': '2026-03-10', 'allow_duplicate': True,
+            'splits': [{'category': self.food.pk, 'amount': food}, {'category': self.home.pk, 'amount': '70.00'}],
+            **extra,
+        }
+
+    def create(self):
+        response = self.client.post(self.url, self.row(), format='json')
+        self.assertEqual(response.status_code, 201)
+        return self.user.transactions.latest('pk')
+
+    def update(self, transaction):
+        response = self.client.patch(f'{self.url}{transaction.pk}/', self.row('120.00', '50.00'), format='json')
+        self.assertEqual(response.status_code, 200)
+
+    @contextmanager
+    def queries(self):
+        """SQL executado em todos os bancos (com shards, o perfil do usuário fica no primário)."""
+        executed = []
+        with ExitStack() as stack:
+            contexts = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in connections]
+            yield executed
+        executed.extend(query['sql'] for context in contexts for query in context.captured_queries)
+
+    def lookups(self, executed):
+        return sum(1 for sql in executed if sql.startswith(('SELECT "accounts".', 'SELECT "categories".')))
+
+
+class IdentityMapTests(WriteRequestsMixin, FreshThrottleMixin, UserDataTestCase):
+    def test_create_queries(self):
+        self.create()
+
+        with self.queries() as executed:
+            self.create()
+
+        self.assertEqual(len(executed), 29)
+        # Conta e duas categorias na validação, uma vez cada, e as categorias dos itens na resposta
+        self.assertEqual(self.lookups(executed), 5)
+
+    def test_update_reuses_objects_loaded_with_the_transaction(self):
+        transaction = self.create()
+
+        with self.queries() as executed:
+            self.update(transaction)
+
+        self.assertEqual(len(executed), 47)
+        # Só as categorias da resposta; as da validação vêm do get_object()
+        self.assertEqual(self.lookups(executed), 2)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('-120.00'))
+
+    def test_map_is_cleared_between_requests(self):
+        get, seen = identity.get, []
+
+        def spy(queryset, pk):
+            seen.append((identity._objects.get(), len(identity._objects.get())))
+            return get(queryset, pk)
+
+        with mock.patch.object(identity, 'get', side_effect=spy):
+            self.create()
+            first = seen[:]
+            self.create()
+
+        self.assertIsNone(identity._objects.get())
+        second = seen[len(first):]
+        self.assertEqual((first[0][1], second[0][1]), (0, 0))
+        self.assertIsNot(first[0][0], second[0][0])
+
+
+@override_settings(MIDDLEWARE=[name for name in settings.MIDDLEWARE if not name.endswith('.IdentityMapMiddleware')])
+class WithoutIdentityMapTests(WriteRequestsMixin, FreshThrottleMixin, UserDataTestCase):
+    def test_create_queries(self):
+        self.create()
+
+        with self.queries() as executed:
+            self.create()
+
+        self.assertEqual(len(executed), 30)
+        self.assertEqual(self.lookups(executed), 6)
+
+    def test_update_queries_each_object_again(self):
+        transaction = self.create()
+
+        with self.queries() as executed:
+            self.update(transaction)
+
+        self.assertEqual(len(executed), 51)
+        self.assertEqual(self.lookups(executed), 6)
+
+
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.router = db_routers.ReplicaRouter()
+        self.user = User(pk=41)
+
+    def replicas(self, aliases):
+        patcher = mock.patch.object(db_routers, 'replica_aliases', return_value=aliases)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_marked_reads_go_to_a_replica_and_writes_to_primary(self):
+        self.replicas(['replica1', 'replica2'])
+
+        self.assertEqual(self.router.db_for_read(Transaction), 'default')
+        with db_routers.use_replica():
+            self.assertIn(self.router.db_for_read(Transaction), ['replica1', 'replica2'])
+            self.assertEqual(self.router.db_for_write(Transaction), 'default')
+        self.assertEqual(self.router.db_for_read(Transaction), 'default')
+
+    def test_reads_stay_on_primary_after_the_users_write(self):
+        self.replicas(['replica1'])
+        self.assertTrue(db_routers.replica_allowed(self.user))
+
+        db_routers.mark_recent_write(self.user.pk)
+        self.assertFalse(db_routers.replica_allowed(self.user))
+        self.assertTrue(db_routers.replica_allowed(User(pk=42)))
+
+        # Fim da janela de read-your-writes
+        cache.delete(db_routers._recent_write_key(self.user.pk))
+        self.assertTrue(db_routers.replica_allowed(self.user))
+
+    def test_without_replicas_everything_uses_primary(self):
+        self.replicas([])
+
+        self.assertFalse(db_routers.replica_allowed(self.user))
+        with db_routers.use_replica():
+            self.assertEqual(self.router.db_for_read(Transaction), 'default')
+
+
+class ReplicaReadMixinTests(FreshThrottleMixin, UserDataTestCase):
+    summary = '/api/transactions/transactions/summary/?start_date=2026-03-01&end_date=2026-03-31'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='rep', email='rep@example.com', password='pw12345!')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # Sem réplicas reais no teste: só a decisão de rotear é observada
+        patcher = mock.patch.object(mixins, 'route_reads_to_replica')
+        self.route = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def replicas(self, aliases):
+        patcher = mock.patch.object(db_routers, 'replica_aliases', return_value=aliases)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_listed_actions_read_from_replica_until_the_user_writes(self):
+        self.replicas(['replica1'])
+
+        self.assertEqual(self.client.get(self.summary).status_code, 200)
+        self.assertEqual(self.route.call_count, 1)
+        self.client.get('/api/transactions/transactions/')
+        self.assertEqual(self.route.call_count, 1)
+
+        account = self.user.accounts.get(name='Conta Corrente')
+        self.client.post('/api/transactions/accounts/', {
+            'name': 'Reserva', 'account_type': 'savings', 'currency': account.currency,
+        }, format='json')
+        self.client.get(self.summary)
+        self.assertEqual(self.route.call_count, 1)
+
+    def test_without_replicas_reads_stay_on_primary(self):
+        self.replicas([])
+
+        self.client.get(self.summary)
+
+        self.route.assert_not_called()
+
+
+class LoadTestReportTests(SimpleTestCase):
+    def test_percentile_and_comparison(self):
+        ordered = [0.01 * step for step in range(1, 101)]
+        self.assertIsNone(loadtest.percentile([], 0.5))
+        self.assertAlmostEqual(loadtest.percentile(ordered, 0.95), 0.95)
+        self.assertAlmostEqual(loadtest.percentile(ordered, 0.99), 0.99)
+
+        endpoint = {'throughput': 10.0, 'p95_ms': 100.0}
+        rows = loadtest.compare(
+            {'endpoints': {'list': {'throughput': 8.0, 'p95_ms': 125.0}, 'new': endpoint}},
+            {'endpoints': {'list': endpoint}},
+        )
+        self.assertEqual(rows, [{'endpoint': 'list', 'throughput': (10.0, 8.0), 'p95_ms': (100.0, 125.0), 'p95_change': 25.0}])
+
+
+# Sem broker no teste: as análises do dashboard rodam na própria requisição
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+class LoadTestCommandTests(FreshThrottleMixin, LiveServerTestCase):
+    databases = '__all__'
+
+    def test_short_run_reports_every_endpoint(self):
+        output = tempfile.TemporaryDirectory()
+        self.addCleanup(output.cleanup)
+        stdout = StringIO()
+
+        call_command(
+            'load_test', '--url', self.live_server_url, '--seed', '--users', '1', '--rows-per-user', '5',
+            '--concurrency', '2', '--max-requests', '5', '--output', output.name + os.sep, stdout=stdout,
+        )
+
+        self.assertIn('p95', stdout.getvalue())
+        [name] = os.listdir(output.name)
+        with open(os.path.join(output.name, name), encoding='utf-8') as file:
+            result = json.load(file)
+        self.assertEqual(result['config']['mix'], 'default')
+        self.assertEqual(result['endpoints']['login']['statuses'], {'200': 2})
+        self.assertEqual(result['errors'], 0)
+        # Dois logins iniciais e até cinco requisições por worker
+        self.assertLessEqual(result['requests'], 12)
+        self.assertEqual(result['requests'], sum(stats['requests'] for stats in result['endpoints'].values()))
+        for stats in result['endpoints'].values():
+            self.assertLessEqual(stats['p50_ms'], stats['p95_ms'])
+            self.assertLessEqual(stats['p95_ms'], stats['max_ms'])
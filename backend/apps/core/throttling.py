@@ -0,0 +1,184 @@
+"""
+Throttling por custo com token buckets.
+
+Cada requisição consome do bucket do usuário e do bucket do IP uma
+quantidade de tokens igual ao custo do endpoint: 1 por padrão, mais para
+os endpoints caros. As views declaram o custo em `throttle_cost` ou, por
+action ou método, em `throttle_costs`. Os buckets se recarregam
+continuamente até a capacidade.
+
+`RedisTokenBucket` mantém os buckets no Redis e verifica e debita todos de
+uma vez em um script Lua, de forma atômica entre processos.
+`InMemoryTokenBucket` atende testes e execuções de processo único e
+também é o fallback quando o Redis fica indisponível.
+"""
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'throttle:'
+
+# KEYS: buckets; ARGV: custo, depois capacidade e recarga (tokens/s) de cada bucket.
+# Retorna {1, '0'} se debitou ou {0, segundos até haver tokens suficientes}.
+TOKEN_BUCKET_LUA = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local cost = tonumber(ARGV[1])
+local tokens = {}
+local wait = 0
+for i = 1, #KEYS do
+    local capacity = tonumber(ARGV[2 * i])
+    local rate = tonumber(ARGV[2 * i + 1])
+    local need = math.min(cost, capacity)
+    local bucket = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local available = tonumber(bucket[1]) or capacity
+    local updated = tonumber(bucket[2]) or now
+    available = math.min(capacity, available + math.max(0, now - updated) * rate)
+    tokens[i] = available
+    if available < need then
+        wait = math.max(wait, (need - available) / rate)
+    end
+end
+if wait > 0 then
+    return {0, tostring(wait)}
+end
+for i = 1, #KEYS do
+    local capacity = tonumber(ARGV[2 * i])
+    local rate = tonumber(ARGV[2 * i + 1])
+    redis.call('HSET', KEYS[i], 'tokens', tokens[i] - math.min(cost, capacity), 'ts', now)
+    redis.call('PEXPIRE', KEYS[i], math.ceil(capacity / rate * 1000))
+end
+return {1, '0'}
+"""
+
+
+class InMemoryTokenBucket:
+    """Buckets em memória, restritos ao processo atual."""
+
+    # Acima deste número de buckets, os já cheios são descartados
+    MAX_BUCKETS = 10000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def consume(self, buckets, cost):
+        """
+        Debita `cost` de todos os `buckets` ((chave, capacidade, recarga)) ou
+        de nenhum. Retorna (permitido, segundos de espera).
+        """
+        now = time.monotonic()
+        with self._lock:
+            available, wait = [], 0.0
+            for key, capacity, rate in buckets:
+                tokens, updated = self._buckets.get(key, (capacity, now))
+                tokens = min(capacity, tokens + (now - updated) * rate)
+                available.append(tokens)
+                need = min(cost, capacity)
+                if tokens < need:
+                    wait = max(wait, (need - tokens) / rate)
+            if wait:
+                return False, wait
+
+            for (key, capacity, rate), tokens in zip(buckets, available):
+                self._buckets[key] = (tokens - min(cost, capacity), now)
+            if len(self._buckets) > self.MAX_BUCKETS:
+                self._prune(now)
+        return True, 0.0
+
+    def _prune(self, now):
+        for key, (tokens, updated) in list(self._buckets.items()):
+            capacity, rate = settings.THROTTLE_BUCKETS.get(key.split(':')[1], (0, 1))
+            if tokens + (now - updated) * rate >= capacity:
+                del self._buckets[key]
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class RedisTokenBucket:
+    """Buckets no Redis, compartilhados por todos os processos."""
+
+    def __init__(self, url=None):
+        self.url = url or settings.REDIS_URL
+        self._script = None
+        self._fallback = InMemoryTokenBucket()
+
+    @property
+    def script(self):
+        if self._script is None:
+            import redis
+            self._script = redis.Redis.from_url(self.url).register_script(TOKEN_BUCKET_LUA)
+        return self._script
+
+    def consume(self, buckets, cost):
+        from redis.exceptions import RedisError
+
+        args = [cost]
+        for _, capacity, rate in buckets:
+            args.extend([capacity, rate])
+        try:
+            allowed, wait = self.script(keys=[key for key, _, _ in buckets], args=args)
+        except RedisError:
+            logger.warning('Redis indisponível; throttling limitado ao processo atual', exc_info=True)
+            return self._fallback.consume(buckets, cost)
+        return bool(allowed), float(wait)
+
+    def reset(self):
+        self._fallback.reset()
+
+
+_store = None
+
+
+def get_bucket_store():
+    """Instância única do armazenamento configurado em THROTTLE_BACKEND."""
+    global _store
+    if _store is None:
+        _store = import_string(settings.THROTTLE_BACKEND)()
+    return _store
+
+
+def view_cost(request, view):
+    """Custo da requisição: `throttle_costs` por action ou método, senão `throttle_cost`."""
+    costs = getattr(view, 'throttle_costs', None) or {}
+    action = getattr(view, 'action', None)
+    for name in (action, request.method.lower()):
+        if name in costs:
+            return costs[name]
+    return getattr(view, 'throttle_cost', 1)
+
+
+class CostThrottle(BaseThrottle):
+    """Throttle por custo sobre os buckets do usuário e do IP (THROTTLE_BUCKETS)."""
+
+    def allow_request(self, request, view):
+        cost = view_cost(request, view)
+        if not cost:
+            return True
+
+        buckets = []
+        user = getattr(request, 'user', None)
+        for scope, (capacity, rate) in settings.THROTTLE_BUCKETS.items():
+            if scope == 'user':
+                if not user or not user.is_authenticated:
+                    continue
+                ident = user.pk
+            else:
+                ident = self.get_ident(request)
+            buckets.append((f'{KEY_PREFIX}{scope}:{ident}', capacity, rate))
+
+        allowed, self.retry_after = get_bucket_store().consume(buckets, cost)
+        return allowed
+
+    def wait(self):
+        # Inteiro: vira o cabeçalho Retry-After
+        return max(1, math.ceil(self.retry_after))
@@ -0,0 +1,87 @@
+"""
+Distribuição de eventos por usuário.
+
+`RedisBroker` usa pub/sub do Redis para alcançar todos os processos do
+servidor ASGI; `InMemoryBroker` atende testes e execuções de processo único.
+"""
+import asyncio
+import json
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+def channel_name(user_id):
+    return f'events:user:{user_id}'
+
+
+class InMemoryBroker:
+    """Broker em memória, restrito ao processo atual."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def publish(self, user_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(queue.put_nowait, event)
+
+    async def subscribe(self, user_id):
+        queue = asyncio.Queue()
+        subscriber = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscriber)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            with self._lock:
+                self._subscribers[user_id].discard(subscriber)
+                if not self._subscribers[user_id]:
+                    del self._subscribers[user_id]
+
+
+class RedisBroker:
+    """Broker sobre pub/sub do Redis."""
+
+    def __init__(self, url=None):
+        self.url = url or settings.REDIS_URL
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            import redis
+            self._client = redis.Redis.from_url(self.url)
+        return self._client
+
+    def publish(self, user_id, event):
+        self.client.publish(channel_name(user_id), json.dumps(event))
+
+    async def subscribe(self, user_id):
+        from redis import asyncio as aioredis
+
+        client = aioredis.Redis.from_url(self.url)
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(channel_name(user_id))
+        try:
+            async for message in pubsub.listen():
+                yield json.loads(message['data'])
+        finally:
+            await pubsub.unsubscribe(channel_name(user_id))
+            await pubsub.close()
+            await client.close()
+
+
+_broker = None
+
+
+def get_broker():
+    """Instância única do broker configurado em REALTIME_BROKER."""
+    global _broker
+    if _broker is None:
+        _broker = import_string(settings.REALTIME_BROKER)()
+    return _broker
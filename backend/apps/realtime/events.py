@@ -0,0 +1,72 @@
+"""
+Eventos compactos de alteração enviados aos clientes conectados.
+
+Os eventos são publicados apenas após o commit da transação do banco, para
+que o cliente nunca receba uma alteração que acabou revertida.
+"""
+import logging
+
+from django.db import transaction as db_transaction
+
+from .brokers import get_broker
+
+logger = logging.getLogger(__name__)
+
+
+def _safely(callback, *args):
+    try:
+        callback(*args)
+    except Exception:
+        # Falhas de entrega não devem afetar a escrita já confirmada
+        logger.exception('Falha ao publicar evento')
+
+
+def publish(user_id, event_type, data):
+    """Publica um evento para o usuário após o commit."""
+    event = {'type': event_type, 'data': data}
+    db_transaction.on_commit(lambda: _safely(get_broker().publish, user_id, event))
+
+
+def balances_changed(user_id, account_ids):
+    """Publica os saldos atualizados das contas, lidos no momento do commit."""
+    from apps.transactions.models import Account
+
+    account_ids = {pk for pk in account_ids if pk}
+    if not account_ids:
+        return
+
+    def send():
+        balances = Account.objects.filter(user_id=user_id, pk__in=account_ids).values_list('pk', 'balance')
+        for account_id, balance in balances:
+            get_broker().publish(user_id, {
+                'type': 'balance.changed',
+                'data': {'account': account_id, 'balance': str(balance)},
+            })
+
+    db_transaction.on_commit(lambda: _safely(send))
+
+
+def transaction_changed(transaction, action):
+    """Publica a criação (`added`), alteração (`updated`) ou exclusão (`deleted`) de uma transação."""
+    data = {'id': transaction.pk}
+    if action != 'deleted':
+        data.update({
+            'title': transaction.title,
+            'amount': str(transaction.amount),
+            'transaction_type': transaction.transaction_type,
+            'status': transaction.status,
+            'date': transaction.date.isoformat(),
+            'category': transaction.category_id,
+            'account': transaction.account_id,
+            'destination_account': transaction.destination_account_id,
+        })
+    publish(transaction.user_id, f'transaction.{action}', data)
+
+
+def anomaly_detected(anomaly):
+    publish(anomaly.user_id, 'anomaly.detected', {
+        'id': anomaly.pk,
+        'anomaly_type': anomaly.anomaly_type,
+        'severity': anomaly.severity,
+        'title': anomaly.title,
+    })
@@ -0,0 +1,113 @@
+"""
+Endpoint Server-Sent Events servido diretamente pelo ASGI.
+
+O cliente se conecta a `/api/events/` com o access token JWT no header
+Authorization ou no parâmetro `token` (EventSource não permite headers) e
+recebe os eventos do próprio usuário. O token passa pelas mesmas
+verificações da API (`CachedJWTAuthentication`): assinatura e validade,
+conta ativa e versão de credenciais, com o usuário lido do cache.
+
+Só é servido por um servidor ASGI (uvicorn, ver `config.asgi`); o
+`runserver` do Django é WSGI e responde 404 nesse caminho.
+"""
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from apps.accounts.authentication import CachedJWTAuthentication
+
+from .brokers import get_broker
+
+EVENTS_PATH = '/api/events/'
+
+
+def _token_from_scope(scope):
+    for name, value in scope.get('headers', []):
+        if name == b'authorization':
+            parts = value.decode('latin1').split()
+            if len(parts) == 2 and parts[0] in jwt_settings.AUTH_HEADER_TYPES:
+                return parts[1]
+    query = parse_qs(scope.get('query_string', b'').decode('latin1'))
+    return query.get('token', [None])[0]
+
+
+def _user_id_from_scope(scope):
+    token = _token_from_scope(scope)
+    if not token:
+        return None
+    authentication = CachedJWTAuthentication()
+    try:
+        return authentication.get_user(authentication.get_validated_token(token)).pk
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+def _format(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event['data'])}\n\n".encode('utf-8')
+
+
+async def _send_json_error(send, status, message):
+    body = json.dumps({'detail': message}).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json')],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def events_application(scope, receive, send):
+    """Aplicação ASGI que mantém a conexão SSE aberta e repassa os eventos do usuário."""
+    if scope['method'] != 'GET':
+        return await _send_json_error(send, 405, 'Método não permitido.')
+
+    user_id = await sync_to_async(_user_id_from_scope)(scope)
+    if user_id is None:
+        return await _send_json_error(send, 401, 'Token de acesso inválido ou ausente.')
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': b': conectado\n\n', 'more_body': True})
+
+    async def wait_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    async def stream():
+        events = get_broker().subscribe(user_id)
+        keepalive = settings.REALTIME_KEEPALIVE_SECONDS
+        # A leitura do próximo evento sobrevive aos keepalives; cancelá-la fecharia a assinatura
+        pending = None
+        try:
+            while True:
+                if pending is None:
+                    pending = asyncio.ensure_future(events.__anext__())
+                done, _ = await asyncio.wait({pending}, timeout=keepalive)
+                if not done:
+                    await send({'type': 'http.response.body', 'body': b': keepalive\n\n', 'more_body': True})
+                    continue
+                event, pending = pending.result(), None
+                await send({'type': 'http.response.body', 'body': _format(event), 'more_body': True})
+        finally:
+            if pending is not None:
+                pending.cancel()
+                await asyncio.gather(pending, return_exceptions=True)
+            await events.aclose()
+
+    disconnect, streaming = asyncio.ensure_future(wait_disconnect()), asyncio.ensure_future(stream())
+    await asyncio.wait([disconnect, streaming], return_when=asyncio.FIRST_COMPLETED)
+    for task in (disconnect, streaming):
+        task.cancel()
+    await asyncio.gather(disconnect, streaming, return_exceptions=True)
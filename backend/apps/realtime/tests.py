@@ -0,0 +1,57 @@
+from unittest import mock
+
+from rest_framework.test import APIClient
+
+from apps.accounts.authentication import revoke_tokens, tokens_for_user
+from apps.accounts.models import User
+from apps.core.testing import FreshThrottleMixin, UserDataTestCase
+
+from .sse import _user_id_from_scope
+
+
+def scope_with(token):
+    return {'headers': [(b'authorization', f'Bearer {token}'.encode())], 'query_string': b''}
+
+
+class EventsAuthenticationTests(UserDataTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='sse', email='sse@example.com', password='pw12345!')
+
+    def test_valid_token_identifies_user(self):
+        token = tokens_for_user(self.user)['access']
+
+        self.assertEqual(_user_id_from_scope(scope_with(token)), self.user.pk)
+        self.assertEqual(_user_id_from_scope({'headers': [], 'query_string': f'token={token}'.encode()}), self.user.pk)
+
+    def test_revoked_token_is_rejected(self):
+        token = tokens_for_user(self.user)['access']
+        revoke_tokens(self.user)
+
+        self.assertIsNone(_user_id_from_scope(scope_with(token)))
+
+    def test_inactive_user_is_rejected(self):
+        token = tokens_for_user(self.user)['access']
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertIsNone(_user_id_from_scope(scope_with(token)))
+
+
+class AccountEventsTests(FreshThrottleMixin, UserDataTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='ev', email='ev@example.com', password='pw12345!')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.account = self.user.accounts.get(name='Conta Corrente')
+        self.url = f'/api/transactions/accounts/{self.account.pk}/'
+
+    def test_balance_event_only_when_balance_changes(self):
+        with mock.patch('apps.transactions.views.events.balances_changed') as balances_changed:
+            self.client.patch(self.url, {'name': 'Conta Principal'}, format='json')
+            self.client.patch(self.url, {'balance': str(self.account.balance)}, format='json')
+            balances_changed.assert_not_called()
+
+            response = self.client.patch(self.url, {'balance': '250.00'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        balances_changed.assert_called_once_with(self.user.pk, [self.account.pk])
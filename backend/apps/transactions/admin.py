@@ -1,14 +1,18 @@
 from django.contrib import admin
-from .models import Category, Account, Transaction, RecurringTransaction
+
+from apps.core.admin import LargeTableAdmin, ShardedAdminMixin
+from .models import Category, Account, Transaction, RecurringTransaction, TransactionSplit
 
 
 @admin.register(Category)
-class CategoryAdmin(admin.ModelAdmin):
+class CategoryAdmin(ShardedAdminMixin, admin.ModelAdmin):
     list_display = ['name', 'category_type', 'color', 'is_active', 'user', 'created_at']
     list_filter = ['category_type', 'is_active', 'created_at']
     search_fields = ['name', 'description', 'user__email']
     ordering = ['user', 'name']
     readonly_fields = ['created_at', 'updated_at']
+    raw_id_fields = ['user']
+    list_select_related = ['user']
     
     fieldsets = (
         ('Informações Básicas', {
@@ -28,12 +32,14 @@ class CategoryAdmin(admin.ModelAdmin):
 
 
 @admin.register(Account)
-class AccountAdmin(admin.ModelAdmin):
+class AccountAdmin(ShardedAdminMixin, admin.ModelAdmin):
     list_display = ['name', 'account_type', 'balance', 'currency', 'is_active', 'user', 'created_at']
     list_filter = ['account_type', 'currency', 'is_active', 'created_at']
     search_fields = ['name', 'bank_name', 'account_number', 'user__email']
     ordering = ['user', 'name']
     readonly_fields = ['created_at', 'updated_at']
+    raw_id_fields = ['user']
+    list_select_related = ['user']
     
     fieldsets = (
         ('Informações Básicas', {
@@ -52,14 +58,21 @@ class AccountAdmin(admin.ModelAdmin):
     )
 
 
+class TransactionSplitInline(admin.TabularInline):
+    model = TransactionSplit
+    extra = 0
+    autocomplete_fields = ['category']
+
+
 @admin.register(Transaction)
-class TransactionAdmin(admin.ModelAdmin):
+class TransactionAdmin(ShardedAdminMixin, LargeTableAdmin):
     list_display = ['title', 'amount', 'transaction_type', 'category', 'account', 'date', 'status', 'user']
     list_filter = ['transaction_type', 'status', 'date', 'is_recurring', 'created_at']
-    search_fields = ['title', 'description', 'notes', 'user__email']
-    ordering = ['-date', '-created_at']
+    # Busca por prefixo do título; e-mail do usuário e id são tratados em LargeTableAdmin
+    search_fields = ['^title']
     readonly_fields = ['created_at', 'updated_at']
-    date_hierarchy = 'date'
+    autocomplete_fields = ['category', 'account', 'destination_account']
+    inlines = [TransactionSplitInline]
     
     fieldsets = (
         ('Informações Básicas', {
@@ -91,13 +104,13 @@ class TransactionAdmin(admin.ModelAdmin):
 
 
 @admin.register(RecurringTransaction)
-class RecurringTransactionAdmin(admin.ModelAdmin):
+class RecurringTransactionAdmin(ShardedAdminMixin, LargeTableAdmin):
     list_display = ['title', 'amount', 'frequency', 'next_execution', 'is_active', 'user']
-    list_filter = ['frequency', 'transaction_type', 'is_active', 'created_at']
-    search_fields = ['title', 'description', 'user__email']
-    ordering = ['next_execution']
+    list_filter = ['frequency', 'transaction_type', 'is_active', 'next_execution', 'created_at']
+    search_fields = ['^title']
     readonly_fields = ['created_at', 'updated_at']
-    date_hierarchy = 'next_execution'
+    autocomplete_fields = ['category', 'account']
+    list_select_related = ['user']
     
     fieldsets = (
         ('Informações Básicas', {
@@ -0,0 +1,167 @@
+"""
+Arquivamento de anos encerrados em armazenamento frio.
+
+As transações de um usuário em um ano (com os itens das divididas) são
+serializadas em NDJSON, comprimidas e gravadas em `TransactionArchive`,
+junto com o efeito líquido do ano em cada conta para que a reconciliação
+de saldos continue correta. As linhas são lidas em lotes com `iterator()` e
+comprimidas à medida que chegam.
+"""
+import json
+import zlib
+from datetime import date
+from decimal import Decimal
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Sum
+
+from apps.analytics.invalidation import invalidate_results
+from apps.core.db_routers import atomic
+
+from . import splits, tags
+from .models import Transaction, TransactionArchive
+from .reconciliation import signed_amount
+
+
+# Transações lidas por lote ao arquivar
+CHUNK_SIZE = 2000
+
+
+class ArchiveError(Exception):
+    """Erro ao arquivar ou restaurar um ano de transações."""
+
+
+def _year_range(year):
+    return date(year, 1, 1), date(year, 12, 31)
+
+
+def _account_totals(queryset):
+    """Efeito líquido das transações concluídas em cada conta."""
+    completed = queryset.filter(status='completed')
+    totals = {}
+    for row in completed.values('account_id').annotate(total=Sum(signed_amount())).order_by():
+        totals[row['account_id']] = totals.get(row['account_id'], Decimal('0')) + row['total']
+    for row in completed.filter(transaction_type='transfer', destination_account__isnull=False).values(
+        'destination_account_id'
+    ).annotate(total=Sum('amount')).order_by():
+        account_id = row['destination_account_id']
+        totals[account_id] = totals.get(account_id, Decimal('0')) + row['total']
+    return {str(account_id): str(total) for account_id, total in totals.items()}
+
+
+def encode_rows(rows):
+    """Serializa as linhas em NDJSON comprimido."""
+    compressor = zlib.compressobj(level=9)
+    chunks = []
+    for row in rows:
+        line = json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+        chunks.append(compressor.compress(line.encode('utf-8')))
+    chunks.append(compressor.flush())
+    return b''.join(chunks)
+
+
+def _archived_rows(queryset, progress):
+    """
+    Linhas da queryset em ordem de id, com os itens das divididas, lidas em
+    lotes. `progress['count']` recebe a quantidade de linhas lidas.
+    """
+    def with_splits(batch):
+        items = splits.archived_splits([row['id'] for row in batch])
+        for row in batch:
+            if row['id'] in items:
+                row['splits'] = items[row['id']]
+            progress['count'] += 1
+            yield row
+
+    batch = []
+    for row in queryset.order_by('pk').values().iterator(chunk_size=CHUNK_SIZE):
+        batch.append(row)
+        if len(batch) >= CHUNK_SIZE:
+            yield from with_splits(batch)
+            batch = []
+    yield from with_splits(batch)
+
+
+def decode_rows(payload):
+    """Reconstrói as linhas de um conteúdo arquivado."""
+    for line in zlib.decompress(bytes(payload)).decode('utf-8').splitlines():
+        if line:
+            yield json.loads(line)
+
+
+def archive_user_year(user_id, year):
+    """Arquiva as transações de um usuário em um ano. Retorna o número de transações movidas."""
+    start, end = _year_range(year)
+    queryset = Transaction.objects.filter(user_id=user_id, date__gte=start, date__lte=end)
+
+    if Transaction.objects.filter(user_id=user_id, date__lt=start).exists():
+        raise ArchiveError(f'Usuário {user_id} possui transações anteriores a {year}; arquive os anos mais antigos primeiro.')
+
+    with atomic():
+        progress = {'count': 0}
+        payload = encode_rows(_archived_rows(queryset, progress))
+        if not progress['count']:
+            return 0
+
+        TransactionArchive.objects.create(
+            user_id=user_id,
+            year=year,
+            transaction_count=progress['count'],
+            account_totals=_account_totals(queryset),
+            payload=payload,
+        )
+        deleted = queryset.delete()[1].get(Transaction._meta.label, 0)
+        if deleted != progress['count']:
+            # Transações gravadas durante a leitura ficariam fora do arquivo
+            raise ArchiveError(f'Transações de {year} do usuário {user_id} mudaram durante o arquivamento; tente novamente.')
+    return progress['count']
+
+
+def archive_year(year, user_ids=None):
+    """
+    Arquiva um ano encerrado para todos os usuários (ou os informados).
+
+    Gera (usuário, transações arquivadas) para cada usuário processado.
+    """
+    if year >= date.today().year:
+        raise ArchiveError('Apenas anos encerrados podem ser arquivados.')
+
+    start, end = _year_range(year)
+    users = Transaction.objects.filter(date__gte=start, date__lte=end)
+    if user_ids:
+        users = users.filter(user_id__in=user_ids)
+    archived_users = TransactionArchive.objects.filter(year=year).values('user_id')
+    users = users.exclude(user_id__in=archived_users)
+
+    for user_id in users.values_list('user_id', flat=True).distinct().order_by('user_id'):
+        yield user_id, archive_user_year(user_id, year)
+
+
+def restore_user_year(user_id, year):
+    """Devolve para a tabela de transações um ano arquivado. Retorna o número de transações restauradas."""
+    if TransactionArchive.objects.filter(user_id=user_id, year__gt=year).exists():
+        raise ArchiveError(f'Usuário {user_id} possui anos arquivados posteriores a {year}; restaure os mais recentes primeiro.')
+
+    with atomic():
+        archive = TransactionArchive.objects.select_for_update().filter(user_id=user_id, year=year).first()
+        if archive is None:
+            return 0
+
+        rows = list(decode_rows(archive.payload))
+        items = [(row['id'], row.pop('splits')) for row in rows if 'splits' in row]
+        transactions = [Transaction(**row) for row in rows]
+        for transaction in transactions:
+            transaction.fingerprint = transaction.compute_fingerprint()
+        Transaction.objects.bulk_create(transactions, batch_size=1000)
+
+        # bulk_create sobrescreve os campos auto_now; restaura os originais
+        for transaction, row in zip(transactions, rows):
+            transaction.created_at = row['created_at']
+            transaction.updated_at = row['updated_at']
+        Transaction.objects.bulk_update(transactions, ['created_at', 'updated_at'], batch_size=1000)
+        tags.link_rows((transaction.pk, transaction.user_id, transaction.tags) for transaction in transactions)
+        splits.restore_splits(items)
+        archive.delete()
+    # bulk_create não dispara os signals que invalidam os resultados de analytics
+    invalidate_results(user_id)
+    return len(transactions)
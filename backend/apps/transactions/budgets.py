@@ -0,0 +1,196 @@
+"""
+Acompanhamento incremental de orçamentos mensais.
+
+Cada despesa concluída incrementa, com um UPDATE atômico, o contador do mês
+da sua categoria e o contador total do usuário (`BudgetUsage`). Consultar
+quanto resta do orçamento e disparar alertas não exige reagregar o mês.
+Os limites vêm de `CategoryBudget` e de `UserProfile.monthly_expense_limit`.
+
+Despesas sem cotação para a moeda do usuário ficam fora dos contadores,
+tanto no incremento quanto em `rebuild_usage`, como nos demais totais
+convertidos (`fx.converted_amount`). Depois de carregar cotações de datas
+passadas, `rebuild_budget_usage` inclui as despesas que passaram a ter
+cotação.
+"""
+from decimal import Decimal
+
+from django.db import IntegrityError
+from django.db.models import F, Sum
+from django.db.models.functions import TruncMonth
+
+from apps.accounts.models import UserProfile
+from apps.analytics.models import AnomalyDetection
+from apps.core.db_routers import atomic
+from apps.realtime import events
+
+from . import fx, splits
+from .models import BudgetUsage, CategoryBudget, Transaction
+
+ZERO = Decimal('0.00')
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def _expense_amount(transaction, amount=None):
+    """Valor da despesa (ou de um dos seus itens) na moeda do usuário, ou None sem cotação."""
+    user = transaction.user
+    original = transaction.amount if amount is None else amount
+    amount = fx.convert(original, transaction.account.currency, user.currency, transaction.date)
+    return Decimal(amount).quantize(ZERO) if amount is not None else None
+
+
+def _increment(user_id, category_id, month, delta):
+    """Soma `delta` ao contador, criando-o se necessário."""
+    usage = BudgetUsage.objects.filter(user_id=user_id, category_id=category_id, month=month)
+    if not usage.update(spent=F('spent') + delta):
+        try:
+            with atomic():
+                BudgetUsage.objects.create(user_id=user_id, category_id=category_id, month=month, spent=delta)
+        except IntegrityError:
+            # Outra escrita criou o contador ao mesmo tempo
+            usage.update(spent=F('spent') + delta)
+
+
+def monthly_limit(user, category_id=None):
+    """Limite mensal da categoria, ou o limite geral do perfil quando `category_id` é None."""
+    if category_id is not None:
+        return CategoryBudget.objects.filter(
+            user=user, category_id=category_id, is_active=True
+        ).values_list('monthly_limit', flat=True).first()
+    try:
+        return user.profile.monthly_expense_limit
+    except UserProfile.DoesNotExist:
+        return None
+
+
+def _check_alert(user, category_id, month, limit):
+    """Marca o contador como alertado ao cruzar o limite e registra a anomalia uma única vez."""
+    usage = BudgetUsage.objects.filter(user=user, category_id=category_id, month=month)
+    usage.filter(alerted=True, spent__lt=limit).update(alerted=False)
+    if not usage.filter(alerted=False, spent__gte=limit).update(alerted=True):
+        return
+
+    try:
+        if not user.profile.budget_alerts:
+            return
+    except UserProfile.DoesNotExist:
+        pass
+
+    spent = usage.values_list('spent', flat=True).first()
+    scope = 'mensal' if category_id is None else 'da categoria'
+    anomaly = AnomalyDetection.objects.create(
+        user=user,
+        anomaly_type='budget_exceeded',
+        severity='high' if spent >= limit * Decimal('1.2') else 'medium',
+        title=f'Orçamento {scope} excedido',
+        description=f'Gasto de {spent} em {month:%m/%Y} ultrapassou o limite de {limit}.',
+        data={
+            'category_id': category_id,
+            'month': month.isoformat(),
+            'spent': str(spent),
+            'limit': str(limit),
+        },
+    )
+    events.anomaly_detected(anomaly)
+
+
+def record_transaction(transaction, sign=1):
+    """Atualiza os contadores de orçamento com a transação (`sign=-1` reverte)."""
+    if transaction.status != 'completed' or transaction.transaction_type != 'expense':
+        return
+
+    total = _expense_amount(transaction)
+    if total is None:
+        return
+
+    month = month_start(transaction.date)
+    # Transações divididas contam no orçamento de cada categoria dos itens
+    deltas = {}
+    for category_id, amount in splits.split_lines(transaction):
+        deltas[category_id] = deltas.get(category_id, ZERO) + _expense_amount(transaction, amount) * sign
+    deltas[None] = total * sign
+    for category_id, delta in deltas.items():
+        _increment(transaction.user_id, category_id, month, delta)
+        limit = monthly_limit(transaction.user, category_id)
+        if limit:
+            _check_alert(transaction.user, category_id, month, limit)
+
+
+def budget_status(user, month):
+    """Situação dos orçamentos do usuário em um mês: total e por categoria."""
+    usages = {
+        usage.category_id: usage
+        for usage in BudgetUsage.objects.filter(user=user, month=month).select_related('category')
+    }
+    budgets = {
+        budget.category_id: budget
+        for budget in CategoryBudget.objects.filter(user=user, is_active=True).select_related('category')
+    }
+
+    def status_row(category, limit, spent):
+        return {
+            'category_id': category.id if category else None,
+            'category_name': category.name if category else None,
+            'limit': limit,
+            'spent': spent,
+            'remaining': limit - spent if limit is not None else None,
+            'percentage': round(spent / limit * 100, 2) if limit else None,
+        }
+
+    total = usages.get(None)
+    categories = []
+    for category_id in sorted(set(usages) | set(budgets), key=lambda pk: (pk is None, pk)):
+        if category_id is None:
+            continue
+        usage, budget = usages.get(category_id), budgets.get(category_id)
+        category = budget.category if budget else usage.category
+        categories.append(status_row(
+            category,
+            budget.monthly_limit if budget else None,
+            usage.spent if usage else ZERO,
+        ))
+
+    return {
+        'month': month,
+        'total': status_row(None, monthly_limit(user), total.spent if total else ZERO),
+        'categories': categories,
+    }
+
+
+def rebuild_usage(user):
+    """
+    Recalcula do zero os contadores do usuário a partir das despesas concluídas.
+
+    Meses que já ultrapassam o limite são marcados como alertados para não
+    gerar alertas retroativos.
+    """
+    amount = fx.converted_amount('amount', 'account__currency', 'date', user.currency)
+    expenses = Transaction.objects.filter(
+        user=user, status='completed', transaction_type='expense'
+    ).annotate(month=TruncMonth('date'))
+    limits = dict(CategoryBudget.objects.filter(user=user, is_active=True).values_list('category_id', 'monthly_limit'))
+    limits[None] = monthly_limit(user)
+
+    rows = []
+    grouped = [
+        splits.line_items(expenses).values('line_category_id', 'month').annotate(
+            spent=Sum(splits.line_amount(user.currency))
+        ).order_by(),
+        expenses.values('month').annotate(spent=Sum(amount)).order_by(),
+    ]
+    for queryset in grouped:
+        for row in queryset:
+            category_id = row.get('line_category_id')
+            spent = row['spent'] or ZERO
+            limit = limits.get(category_id)
+            rows.append(BudgetUsage(
+                user=user, category_id=category_id, month=row['month'],
+                spent=spent, alerted=bool(limit) and spent >= limit,
+            ))
+
+    with atomic():
+        BudgetUsage.objects.filter(user=user).delete()
+        BudgetUsage.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
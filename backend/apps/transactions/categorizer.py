@@ -0,0 +1,294 @@
+"""
+Categorização automática de transações a partir do histórico do usuário.
+
+Cada transação categorizada contribui com tokens do título, do local e da
+faixa de valor para a contagem da sua categoria (`CategoryTokenCount`). A
+sugestão é um Naive Bayes multinomial sobre essas contagens.
+
+As contagens são linhas por categoria e token, incrementadas com `F()` nas
+escritas de transações: escritas concorrentes do mesmo usuário só disputam
+as linhas dos tokens que têm em comum. Para as predições o índice é
+compilado em memória: cada token aponta apenas para as categorias em que
+aparece, com o peso já em log, e uma versão guardada no cache (trocada
+após o commit de cada escrita) invalida a cópia compilada.
+"""
+import math
+import threading
+import uuid
+from collections import Counter, OrderedDict, defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.core.cache import cache
+from django.db import router, transaction as db_transaction
+from django.db.models import F
+
+from apps.core.db_routers import atomic
+
+from .models import Category, CategoryTokenCount, CategoryTokenIndex, Transaction
+from .text import normalize_text, words
+
+STOPWORDS = {'a', 'o', 'as', 'os', 'de', 'da', 'do', 'das', 'dos', 'e', 'em', 'na', 'no', 'para', 'com', 'por'}
+
+# Tokens reservados com os totais de cada categoria (os demais têm prefixo `w:`, `l:` ou `v:`)
+DOCUMENTS = '#docs'
+TOKENS = '#tokens'
+
+# Suavização de Laplace
+ALPHA = 0.5
+# Índices compilados mantidos em memória por processo
+COMPILED_CACHE_SIZE = 256
+
+
+def amount_band(amount):
+    """Faixa exponencial do valor (1-2, 2-4, 4-8...)."""
+    if amount is None or amount <= 0:
+        return None
+    return int(math.log2(amount))
+
+
+def tokenize(title, location='', amount=None):
+    tokens = {
+        f'w:{word}' for word in words(title)
+        if len(word) > 1 and word not in STOPWORDS and not word.isdigit()
+    }
+    if location:
+        tokens.add(f'l:{normalize_text(location).strip()}')
+    band = amount_band(amount)
+    if band is not None:
+        tokens.add(f'v:{band}')
+    return tokens
+
+
+def _trainable(transaction):
+    return transaction.transaction_type != 'transfer' and transaction.status != 'cancelled'
+
+
+def _count(counts, category_id, tokens):
+    """Soma os tokens de uma transação a `counts` ({(category_id, token): ocorrências})."""
+    counts[(category_id, DOCUMENTS)] += 1
+    counts[(category_id, TOKENS)] += len(tokens)
+    for token in tokens:
+        counts[(category_id, token)] += 1
+
+
+def _version_key(user_id):
+    return f'categorizer:version:{user_id}'
+
+
+def index_version(user_id):
+    """Versão atual do índice do usuário."""
+    # Aleatória: se a chave sair do cache, cópias compiladas antigas não voltam a valer
+    return cache.get_or_set(_version_key(user_id), lambda: uuid.uuid4().hex[:12], timeout=None)
+
+
+def _invalidate(user_id):
+    """Troca a versão do índice depois do commit das contagens."""
+    def bump():
+        cache.set(_version_key(user_id), uuid.uuid4().hex[:12], timeout=None)
+
+    db_transaction.on_commit(bump, using=router.db_for_write(CategoryTokenCount))
+
+
+def rebuild_index(user_id):
+    """Reconstrói as contagens do usuário a partir de todas as suas transações."""
+    counts = Counter()
+    rows = Transaction.objects.filter(user_id=user_id).exclude(
+        transaction_type='transfer'
+    ).exclude(status='cancelled').values_list('title', 'location', 'amount', 'category_id')
+    for title, location, amount, category_id in rows.iterator(chunk_size=2000):
+        _count(counts, category_id, tokenize(title, location, amount))
+
+    with atomic():
+        CategoryTokenCount.objects.filter(user_id=user_id).delete()
+        CategoryTokenCount.objects.bulk_create([
+            CategoryTokenCount(user_id=user_id, category_id=category_id, token=token, count=count)
+            for (category_id, token), count in counts.items()
+        ], batch_size=2000)
+        CategoryTokenIndex.objects.update_or_create(user_id=user_id)
+        _invalidate(user_id)
+    return len(counts)
+
+
+def learn_many(transactions, sign=1):
+    """
+    Atualiza o índice com um lote de transações do mesmo usuário
+    (`sign=-1` as remove).
+    
+    Os tokens do lote são somados antes da escrita: cada categoria recebe um
+    UPDATE por valor distinto de incremento, não um por transação.
+    """
+    transactions = [transaction for transaction in transactions if _trainable(transaction)]
+    if not transactions:
+        return
+    user_id = transactions[0].user_id
+
+    if not CategoryTokenIndex.objects.filter(user_id=user_id).exists():
+        # Primeiro uso: o índice vem do histórico, que já inclui as transações
+        rebuild_index(user_id)
+        if sign > 0:
+            return
+
+    counts = Counter()
+    for transaction in transactions:
+        _count(counts, transaction.category_id, tokenize(transaction.title, transaction.location, transaction.amount))
+    increments = defaultdict(list)
+    for (category_id, token), count in counts.items():
+        increments[(category_id, count)].append(token)
+
+    with atomic():
+        if sign > 0:
+            # Cria as linhas que faltam zeradas; o incremento vem no UPDATE, que não perde escritas concorrentes
+            CategoryTokenCount.objects.bulk_create([
+                CategoryTokenCount(user_id=user_id, category_id=category_id, token=token)
+                for category_id, token in counts
+            ], ignore_conflicts=True)
+        for (category_id, count), tokens in sorted(increments.items()):
+            CategoryTokenCount.objects.filter(category_id=category_id, token__in=tokens).update(
+                count=F('count') + sign * count
+            )
+        if sign < 0:
+            CategoryTokenCount.objects.filter(
+                user_id=user_id, category_id__in={category_id for category_id, _ in counts}, count__lte=0
+            ).delete()
+        _invalidate(user_id)
+
+
+def learn(transaction, sign=1):
+    """Atualiza o índice com a transação (`sign=-1` a remove)."""
+    learn_many([transaction], sign)
+
+
+class CompiledIndex:
+    """Forma do índice otimizada para predição."""
+
+    __slots__ = ('version', 'categories', 'base', 'denominators', 'weights', 'candidates')
+
+    def __init__(self, version, counts, categories):
+        """`counts` são as linhas (category_id, token, ocorrências) do usuário."""
+        self.version = version
+        category_totals = defaultdict(lambda: [0, 0])
+        tokens = defaultdict(dict)
+        for category_id, token, count in counts:
+            if token == DOCUMENTS:
+                category_totals[category_id][0] = count
+            elif token == TOKENS:
+                category_totals[category_id][1] = count
+            else:
+                tokens[token][category_id] = count
+
+        totals = [
+            (category_id, docs, token_count)
+            for category_id, (docs, token_count) in sorted(category_totals.items())
+            if category_id in categories and docs > 0
+        ]
+        positions = {category_id: position for position, (category_id, _, _) in enumerate(totals)}
+        vocabulary = len(tokens)
+        documents = sum(docs for _, docs, _ in totals) or 1
+
+        self.categories = [categories[category_id] for category_id, _, _ in totals]
+        self.base = [math.log(docs / documents) for _, docs, _ in totals]
+        self.denominators = [math.log(token_count + ALPHA * vocabulary) - math.log(ALPHA) for _, _, token_count in totals]
+        self.weights = {}
+        for token, counts in tokens.items():
+            weights = tuple(
+                (positions[category_id], math.log((count + ALPHA) / ALPHA))
+                for category_id, count in counts.items()
+                if category_id in positions
+            )
+            if weights:
+                self.weights[token] = weights
+        self.candidates = {
+            transaction_type: [
+                position for position, category in enumerate(self.categories)
+                if category.category_type in (transaction_type, 'both')
+            ]
+            for transaction_type in ('income', 'expense')
+        }
+
+    def predict(self, tokens, transaction_type, limit=3):
+        """Categorias mais prováveis com a probabilidade de cada uma."""
+        candidates = self.candidates.get(transaction_type)
+        if not candidates:
+            return []
+
+        known = [self.weights[token] for token in tokens if token in self.weights]
+        scores = self.base[:]
+        size = len(known)
+        for position, denominator in enumerate(self.denominators):
+            scores[position] -= size * denominator
+        for weights in known:
+            for position, weight in weights:
+                scores[position] += weight
+
+        best = max(scores[position] for position in candidates)
+        probabilities = [(math.exp(scores[position] - best), position) for position in candidates]
+        total = sum(probability for probability, _ in probabilities)
+        probabilities.sort(reverse=True)
+        return [
+            (self.categories[position], probability / total)
+            for probability, position in probabilities[:limit]
+        ]
+
+
+_compiled = OrderedDict()
+_compiled_lock = threading.Lock()
+
+
+def compiled_index(user):
+    """Índice compilado do usuário, recompilado apenas quando a versão muda."""
+    version = index_version(user.pk)
+    with _compiled_lock:
+        compiled = _compiled.get(user.pk)
+        if compiled is not None and compiled.version == version:
+            _compiled.move_to_end(user.pk)
+            return compiled
+
+    if not CategoryTokenIndex.objects.filter(user=user).exists():
+        rebuild_index(user.pk)
+        version = index_version(user.pk)
+    counts = CategoryTokenCount.objects.filter(user=user).values_list('category_id', 'token', 'count')
+    categories = Category.objects.filter(user=user, is_active=True).in_bulk()
+    compiled = CompiledIndex(version, counts.iterator(chunk_size=2000), categories)
+
+    with _compiled_lock:
+        _compiled[user.pk] = compiled
+        _compiled.move_to_end(user.pk)
+        while len(_compiled) > COMPILED_CACHE_SIZE:
+            _compiled.popitem(last=False)
+    return compiled
+
+
+def parse_amount(value):
+    if value in (None, ''):
+        return None
+    try:
+        return Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        raise ValueError('Valor inválido')
+
+
+def _suggestions(predictions):
+    return [
+        {'category': category.id, 'category_name': category.name, 'confidence': round(probability, 4)}
+        for category, probability in predictions
+    ]
+
+
+def suggest(user, title, transaction_type, amount=None, location='', limit=3):
+    """Sugestões de categoria para uma transação."""
+    predictions = compiled_index(user).predict(tokenize(title, location, amount), transaction_type, limit)
+    return _suggestions(predictions)
+
+
+def categorize(user, rows):
+    """
+    Melhor categoria para cada linha (dicionários com title, transaction_type,
+    amount e location), usando um único índice compilado para o lote.
+    """
+    index = compiled_index(user)
+    results = []
+    for row in rows:
+        tokens = tokenize(row.get('title') or '', row.get('location') or '', parse_amount(row.get('amount')))
+        predictions = index.predict(tokens, row.get('transaction_type') or 'expense', limit=1)
+        results.append(_suggestions(predictions)[0] if predictions else None)
+    return results
@@ -0,0 +1,118 @@
+"""
+Comparação de períodos.
+
+Os totais de todos os períodos saem de uma única agregação condicional: uma
+soma filtrada por período, agrupada por tipo e categoria, sobre os itens
+das transações que caem em algum dos períodos.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q, Sum
+
+from . import splits
+from .timeseries import month_start
+
+ZERO = Decimal('0')
+
+# Limite de períodos por comparação
+MAX_PERIODS = 12
+
+
+def parse_periods(value, parse):
+    """Converte 'início:fim,início:fim' em [(início, fim)]."""
+    periods = []
+    for item in value.split(','):
+        start, _, end = item.partition(':')
+        start, end = parse(start.strip()), parse(end.strip())
+        if not start or not end or start > end:
+            raise ValueError(f'Período inválido: {item}')
+        periods.append((start, end))
+    if len(periods) > MAX_PERIODS:
+        raise ValueError(f'Máximo de {MAX_PERIODS} períodos.')
+    return periods
+
+
+def default_periods(today):
+    """Mês atual, mês anterior e o mesmo mês do ano anterior."""
+    return [
+        (month_start(today, offset), month_start(today, offset + 1) - timedelta(days=1))
+        for offset in (0, -1, -12)
+    ]
+
+
+def _ranges(date_field, periods):
+    return [Q(**{f'{date_field}__range': period}) for period in periods]
+
+
+def within_periods(queryset, periods, date_field='date'):
+    """Linhas que caem em algum dos períodos."""
+    return queryset.filter(reduce(or_, _ranges(date_field, periods)))
+
+
+def period_totals(queryset, date_field, amount, periods, group_fields):
+    """
+    Linhas agrupadas por `group_fields` com `p0`, `p1`... = soma de
+    `amount` em cada período.
+    """
+    ranges = _ranges(date_field, periods)
+    return queryset.filter(reduce(or_, ranges)).values(*group_fields).annotate(**{
+        f'p{index}': Sum(amount, filter=period_range)
+        for index, period_range in enumerate(ranges)
+    }).order_by()
+
+
+GROUP_FIELDS = ['transaction_type', 'line_category_id', 'line_category_name']
+
+
+def transaction_rows(queryset, amount, periods):
+    """Linhas por tipo e categoria dos itens das transações; `amount` é `splits.line_amount`."""
+    queryset = queryset.filter(status='completed', transaction_type__in=['income', 'expense'])
+    return period_totals(splits.line_items(queryset, 'name'), 'date', amount, periods, GROUP_FIELDS)
+
+
+def _changes(values):
+    """Variação do primeiro período em relação a cada um dos demais."""
+    base = values[0]
+    return [
+        {
+            'delta': base - other,
+            'percentage': round((base - other) / abs(other) * 100, 2) if other else None,
+        }
+        for other in values[1:]
+    ]
+
+
+def _metric(values):
+    return {'values': values, 'changes': _changes(values)}
+
+
+def compare(rows, periods):
+    """Totais por tipo e por categoria de cada período, com as variações."""
+    size = len(periods)
+    totals = {kind: [ZERO] * size for kind in ('income', 'expense')}
+    categories = []
+    for row in rows:
+        values = [row[f'p{index}'] or ZERO for index in range(size)]
+        for index, value in enumerate(values):
+            totals[row['transaction_type']][index] += value
+        categories.append({
+            'transaction_type': row['transaction_type'],
+            'category_id': row['line_category_id'],
+            'category_name': row['line_category_name'],
+            **_metric(values),
+        })
+    categories.sort(key=lambda item: (item['transaction_type'], -item['values'][0], -sum(item['values'])))
+
+    net = [income - expense for income, expense in zip(totals['income'], totals['expense'])]
+    return {
+        'periods': [{'start': start, 'end': end} for start, end in periods],
+        'totals': {
+            'income': _metric(totals['income']),
+            'expense': _metric(totals['expense']),
+            'net': _metric(net),
+        },
+        'categories': categories,
+    }
@@ -1,6 +1,7 @@
 import django_filters
-from django.db.models import Q
-from .models import Transaction, Category, Account
+from django.db.models import Exists, OuterRef, Q
+from .models import Transaction, Category, Account, TransactionSplit
+from . import hierarchy, tags
 
 
 class TransactionFilter(django_filters.FilterSet):
@@ -11,36 +12,50 @@ class TransactionFilter(django_filters.FilterSet):
     amount_from = django_filters.NumberFilter(field_name='amount', lookup_expr='gte')
     amount_to = django_filters.NumberFilter(field_name='amount', lookup_expr='lte')
     
+    # Filtros de múltipla escolha sem DISTINCT: só comparam colunas da própria
+    # transação, e agregações sobre consultas com DISTINCT viram subconsultas
+    # que perdem as referências a `accounts` (ver fx.count_unconverted).
+    
+    # Inclui as subcategorias das categorias escolhidas
     category = django_filters.ModelMultipleChoiceFilter(
         queryset=Category.objects.none(),
         field_name='category',
-        to_field_name='id'
+        to_field_name='id',
+        method='filter_category',
+        distinct=False
     )
     
     account = django_filters.ModelMultipleChoiceFilter(
         queryset=Account.objects.none(),
         field_name='account',
-        to_field_name='id'
+        to_field_name='id',
+        distinct=False
     )
     
     transaction_type = django_filters.MultipleChoiceFilter(
         choices=Transaction.TRANSACTION_TYPES,
-        field_name='transaction_type'
+        field_name='transaction_type',
+        distinct=False
     )
     
     status = django_filters.MultipleChoiceFilter(
         choices=Transaction.TRANSACTION_STATUS,
-        field_name='status'
+        field_name='status',
+        distinct=False
     )
     
     search = django_filters.CharFilter(method='filter_search')
     
+    # Listas separadas por vírgula: `tags` exige qualquer uma, `tags__all` todas
+    tags = django_filters.CharFilter(method='filter_tags')
+    tags__all = django_filters.CharFilter(method='filter_tags')
+    
     class Meta:
         model = Transaction
         fields = [
             'transaction_type', 'status', 'is_recurring',
             'date_from', 'date_to', 'amount_from', 'amount_to',
-            'category', 'account', 'search'
+            'category', 'account', 'search', 'tags', 'tags__all'
         ]
     
     def __init__(self, *args, **kwargs):
@@ -50,6 +65,16 @@ class TransactionFilter(django_filters.FilterSet):
             self.filters['category'].queryset = Category.objects.filter(user=user, is_active=True)
             self.filters['account'].queryset = Account.objects.filter(user=user, is_active=True)
     
+    def filter_category(self, queryset, name, value):
+        """Filtra pelas categorias e subcategorias, na transação ou em algum dos seus itens."""
+        if not value:
+            return queryset
+        categories = hierarchy.subtree([category.pk for category in value])
+        return queryset.filter(
+            Q(category_id__in=categories)
+            | Exists(TransactionSplit.objects.filter(transaction=OuterRef('pk'), category_id__in=categories))
+        )
+    
     def filter_search(self, queryset, name, value):
         """Filtro de busca personalizado."""
         if not value:
@@ -61,3 +86,12 @@ class TransactionFilter(django_filters.FilterSet):
             Q(notes__icontains=value) |
             Q(location__icontains=value)
         )
+    
+    def filter_tags(self, queryset, name, value):
+        """Filtra pelas tags normalizadas."""
+        slugs = list(tags.unique_tags(value.split(',')))
+        if not slugs:
+            return queryset
+        if name == 'tags__all':
+            return tags.filter_all(queryset, slugs)
+        return tags.filter_any(queryset, slugs)
@@ -0,0 +1,131 @@
+"""
+Conversão de moedas a partir da tabela de cotações diárias.
+
+A cotação de uma moeda em uma data é a mais recente até essa data. As
+agregações convertem os valores no próprio SQL (subquery correlacionada por
+moeda e data), de modo que totais em várias moedas continuam sendo uma
+única query; `get_rate`/`convert` atendem conversões pontuais em Python
+com as cotações no cache do Django (TTL `FX_RATE_CACHE_SECONDS`). As chaves
+levam uma versão que `clear_cache` incrementa, então uma carga de cotações
+invalida o cache de todos os processos.
+
+Linhas sem cotação não têm valor convertido: `count_unconverted` informa
+quantas ficaram fora dos totais.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, Count, DecimalField, F, FloatField, Func, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Cast
+from django.db.models.lookups import IsNull
+
+from .models import ExchangeRate
+
+AMOUNT_FIELD = DecimalField(max_digits=20, decimal_places=2)
+RATE_FIELD = DecimalField(max_digits=18, decimal_places=8)
+
+
+class DecimalDivision(Func):
+    """Divisão decimal; no SQLite evita a divisão inteira entre valores sem casas decimais."""
+
+    arg_joiner = ' / '
+    template = '(%(expressions)s)'
+    output_field = AMOUNT_FIELD
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        numerator, denominator = self.get_source_expressions()
+        clone = self.copy()
+        clone.set_source_expressions([Cast(numerator, FloatField()), denominator])
+        return super(DecimalDivision, clone).as_sql(compiler, connection, **extra_context)
+
+
+def base_currency():
+    return settings.FX_BASE_CURRENCY
+
+
+VERSION_KEY = 'fx:version'
+
+
+def _version():
+    return cache.get_or_set(VERSION_KEY, 1, timeout=None)
+
+
+def get_rate(currency, on_date):
+    """Cotação da moeda na data (em moeda base), ou None se não houver cotação."""
+    if currency == base_currency():
+        return 1
+    key = f'fx:rate:{_version()}:{currency}:{on_date}'
+    # Em tupla para que a ausência de cotação também fique em cache
+    cached = cache.get(key)
+    if cached is None:
+        cached = (ExchangeRate.objects.filter(
+            currency=currency, date__lte=on_date
+        ).order_by('-date').values_list('rate', flat=True).first(),)
+        cache.set(key, cached, timeout=settings.FX_RATE_CACHE_SECONDS)
+    return cached[0]
+
+
+def convert(amount, from_currency, to_currency, on_date):
+    """Converte um valor entre moedas na data informada, ou None sem cotação."""
+    if from_currency == to_currency:
+        return amount
+    source, target = get_rate(from_currency, on_date), get_rate(to_currency, on_date)
+    if source is None or target is None:
+        return None
+    return amount * source / target
+
+
+def clear_cache():
+    """Invalida as cotações em cache em todos os processos."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 2, timeout=None)
+
+
+def _rate_expression(currency, date):
+    """
+    Expressão SQL da cotação de `currency` na data `date`.
+
+    `currency` e `date` podem ser referências a campos (F/OuterRef) ou valores.
+    """
+    if isinstance(currency, str):
+        if currency == base_currency():
+            return Value(1, output_field=RATE_FIELD)
+        currency_ref = currency
+    else:
+        currency_ref = OuterRef(currency.name)
+    date_ref = OuterRef(date.name) if isinstance(date, F) else date
+
+    rate = Subquery(
+        ExchangeRate.objects.filter(
+            currency=currency_ref, date__lte=date_ref
+        ).order_by('-date').values('rate')[:1],
+        output_field=RATE_FIELD,
+    )
+    if isinstance(currency, str):
+        return rate
+    return Case(When(**{currency.name: base_currency()}, then=Value(1)), default=rate, output_field=RATE_FIELD)
+
+
+def converted_amount(amount_field, currency_field, date, target_currency):
+    """
+    Expressão SQL do valor convertido para `target_currency`.
+
+    `date` é o nome de um campo de data ou uma data fixa. Linhas sem
+    cotação resultam em NULL e ficam fora das somas (ver `count_unconverted`).
+    """
+    date = F(date) if isinstance(date, str) else Value(date)
+    return Case(
+        When(**{currency_field: target_currency}, then=F(amount_field)),
+        default=DecimalDivision(
+            F(amount_field) * _rate_expression(F(currency_field), date),
+            _rate_expression(target_currency, date),
+        ),
+        output_field=AMOUNT_FIELD,
+    )
+
+
+def count_unconverted(queryset, target_currency, amount_field='amount', currency_field='account__currency', date='date'):
+    """Número de linhas de `queryset` sem cotação para `target_currency`, que ficam fora das somas."""
+    amount = converted_amount(amount_field, currency_field, date, target_currency)
+    return queryset.aggregate(count=Count('pk', filter=Q(IsNull(amount, True))))['count']
@@ -0,0 +1,106 @@
+"""
+Hierarquia de categorias sobre uma tabela de fechamento.
+
+`CategoryClosure` guarda todos os pares ancestral/descendente, então uma
+subárvore inteira é obtida (ou agregada) com uma única junção indexada, sem
+percorrer a árvore em Python. Criar uma categoria insere suas linhas a
+partir das do pai; mover uma subárvore troca, em lote, as linhas que a
+ligam aos ancestrais antigos pelas que a ligam aos novos.
+"""
+from apps.core.db_routers import atomic
+
+from .models import Category, CategoryClosure
+
+
+class HierarchyError(ValueError):
+    pass
+
+
+def add_category(category):
+    """Insere as linhas de uma categoria recém-criada (ainda sem filhos)."""
+    links = [CategoryClosure(ancestor_id=category.pk, descendant_id=category.pk, depth=0)]
+    if category.parent_id:
+        links.extend(
+            CategoryClosure(ancestor_id=ancestor_id, descendant_id=category.pk, depth=depth + 1)
+            for ancestor_id, depth in CategoryClosure.objects.filter(
+                descendant_id=category.parent_id
+            ).values_list('ancestor_id', 'depth')
+        )
+    CategoryClosure.objects.bulk_create(links, ignore_conflicts=True)
+
+
+def subtree(category_ids):
+    """Subconsulta com os ids das categorias e de todos os seus descendentes."""
+    return CategoryClosure.objects.filter(ancestor_id__in=category_ids).values('descendant_id')
+
+
+def move_category(category, parent):
+    """Move a categoria (com toda a sua subárvore) para baixo de `parent` ou para a raiz."""
+    parent_id = parent.pk if parent else None
+    if parent_id == category.parent_id:
+        return category
+    if parent is not None:
+        if parent.user_id != category.user_id:
+            raise HierarchyError('A categoria pai deve pertencer ao mesmo usuário.')
+        if CategoryClosure.objects.filter(ancestor_id=category.pk, descendant_id=parent_id).exists():
+            raise HierarchyError('Uma categoria não pode ser movida para dentro da própria subárvore.')
+
+    with atomic():
+        descendants = list(
+            CategoryClosure.objects.filter(ancestor_id=category.pk).values_list('descendant_id', 'depth')
+        )
+        subtree_ids = [descendant_id for descendant_id, _ in descendants]
+        # Desliga a subárvore dos ancestrais antigos
+        CategoryClosure.objects.filter(descendant_id__in=subtree_ids).exclude(ancestor_id__in=subtree_ids).delete()
+
+        if parent is not None:
+            ancestors = CategoryClosure.objects.filter(descendant_id=parent_id).values_list('ancestor_id', 'depth')
+            CategoryClosure.objects.bulk_create([
+                CategoryClosure(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=up + down + 1)
+                for ancestor_id, up in ancestors
+                for descendant_id, down in descendants
+            ], batch_size=1000)
+
+        Category.objects.filter(pk=category.pk).update(parent_id=parent_id)
+        category.parent_id = parent_id
+    return category
+
+
+def remove_category(category):
+    """Sobe os filhos da categoria um nível, antes de excluí-la."""
+    for child in Category.objects.filter(parent_id=category.pk):
+        move_category(child, category.parent)
+
+
+def rebuild_closure(user_ids=None):
+    """Reconstrói a tabela a partir de `Category.parent`. Retorna o número de linhas."""
+    categories = Category.objects.all()
+    links = CategoryClosure.objects.all()
+    if user_ids:
+        categories = categories.filter(user_id__in=user_ids)
+        links = links.filter(descendant__user_id__in=user_ids)
+
+    parents = dict(categories.values_list('pk', 'parent_id'))
+    rows = []
+    for category_id in parents:
+        # Sobe pela cadeia de pais; `seen` interrompe ciclos gravados por fora da API
+        ancestor_id, depth, seen = category_id, 0, set()
+        while ancestor_id is not None and ancestor_id not in seen:
+            seen.add(ancestor_id)
+            rows.append(CategoryClosure(ancestor_id=ancestor_id, descendant_id=category_id, depth=depth))
+            ancestor_id, depth = parents.get(ancestor_id), depth + 1
+
+    with atomic():
+        links.delete()
+        CategoryClosure.objects.bulk_create(rows, batch_size=2000)
+    return len(rows)
+
+
+def tree(categories):
+    """Aninha as categorias (já carregadas) pelo pai; as sem pai na lista ficam na raiz."""
+    nodes = {category.pk: {'category': category, 'children': []} for category in categories}
+    roots = []
+    for node in nodes.values():
+        parent = nodes.get(node['category'].parent_id)
+        (parent['children'] if parent else roots).append(node)
+    return roots
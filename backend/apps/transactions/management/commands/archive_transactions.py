@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.transactions import partitioning
+from apps.transactions.archive import ArchiveError, archive_year, restore_user_year
+from apps.transactions.models import Transaction, TransactionArchive
+
+
+class Command(BaseCommand):
+    help = 'Move as transações de um ano encerrado para o arquivo frio comprimido (ou as restaura).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('year', type=int)
+        parser.add_argument('--user', type=int, action='append', dest='users',
+                            help='Restringe a operação a um usuário (pode repetir).')
+        parser.add_argument('--restore', action='store_true',
+                            help='Restaura o ano arquivado para a tabela de transações.')
+        parser.add_argument('--drop-partition', action='store_true',
+                            help='Remove a partição do ano quando ela ficar vazia (PostgreSQL particionado).')
+
+    def handle(self, *args, **options):
+        year = options['year']
+        try:
+            if options['restore']:
+                self.restore(year, options['users'])
+            else:
+                self.archive(year, options['users'], options['drop_partition'])
+        except ArchiveError as e:
+            raise CommandError(str(e))
+
+    def archive(self, year, users, drop_partition):
+        total = 0
+        for user_id, count in archive_year(year, users):
+            total += count
+            self.stdout.write(f'Usuário {user_id}: {count} transações arquivadas.')
+        self.stdout.write(self.style.SUCCESS(f'{total} transações de {year} arquivadas.'))
+
+        if drop_partition and partitioning.is_partitioned():
+            if Transaction.objects.filter(date__year=year).exists():
+                self.stdout.write(self.style.WARNING(f'A partição de {year} ainda possui transações e foi mantida.'))
+            else:
+                partitioning.detach_partition(year, drop=True)
+                self.stdout.write(self.style.SUCCESS(f'Partição {partitioning.partition_name(year)} removida.'))
+
+    def restore(self, year, users):
+        if partitioning.is_partitioned() and partitioning.partition_name(year) not in dict(partitioning.list_partitions()):
+            partitioning.create_partition(year)
+
+        archives = TransactionArchive.objects.filter(year=year)
+        if users:
+            archives = archives.filter(user_id__in=users)
+
+        total = 0
+        for user_id in archives.values_list('user_id', flat=True):
+            count = restore_user_year(user_id, year)
+            total += count
+            self.stdout.write(f'Usuário {user_id}: {count} transações restauradas.')
+        self.stdout.write(self.style.SUCCESS(f'{total} transações de {year} restauradas.'))
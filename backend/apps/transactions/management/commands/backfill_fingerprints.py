@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from apps.transactions.models import Transaction
+
+
+class Command(BaseCommand):
+    help = 'Calcula a impressão digital das transações que ainda não a possuem.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help='Transações atualizadas por lote (padrão: 2000).')
+        parser.add_argument('--all', action='store_true',
+                            help='Recalcula também as transações que já possuem impressão digital.')
+
+    def handle(self, *args, **options):
+        queryset = Transaction.objects.order_by('pk')
+        if not options['all']:
+            queryset = queryset.filter(fingerprint='')
+
+        updated, last_pk = 0, 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk)[:options['batch_size']])
+            if not batch:
+                break
+            for transaction in batch:
+                transaction.fingerprint = transaction.compute_fingerprint()
+            Transaction.objects.bulk_update(batch, ['fingerprint'])
+            updated += len(batch)
+            last_pk = batch[-1].pk
+        self.stdout.write(self.style.SUCCESS(f'{updated} transações atualizadas.'))
@@ -0,0 +1,181 @@
+import json
+from dataclasses import dataclass, field
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction as db_transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from apps.transactions.models import Transaction
+from apps.transactions.seeding import create_seed_user, seed_transactions
+
+TABLE = Transaction._meta.db_table
+
+
+class PlanRegression(Exception):
+    pass
+
+
+@dataclass
+class PlanCheck:
+    """Endpoint verificado e os índices que seu plano deve usar."""
+
+    name: str
+    path: str
+    expected_indexes: list = field(default_factory=list)
+    # Alternativa a `expected_indexes`: qualquer índice que comece pela coluna
+    leading_column: str = None
+
+
+def plan_checks(user):
+    account = user.accounts.first()
+    return [
+        PlanCheck('transactions-list', '/api/transactions/transactions/',
+                  ['transactions_user_recent_idx']),
+        PlanCheck('transactions-list-period',
+                  '/api/transactions/transactions/?date_from=2024-01-01&date_to=2024-03-31&transaction_type=expense',
+                  ['transactions_user_recent_idx', 'transactions_done_type_idx']),
+        PlanCheck('transactions-search', '/api/transactions/transactions/?search=mercado',
+                  leading_column='user_id'),
+        PlanCheck('transactions-summary', '/api/transactions/transactions/summary/',
+                  ['transactions_done_date_idx']),
+        PlanCheck('transactions-by-category', '/api/transactions/transactions/by_category/',
+                  ['transactions_done_type_idx']),
+        PlanCheck('accounts-balance-history', f'/api/transactions/accounts/{account.pk}/balance_history/'),
+        PlanCheck('accounts-summary', '/api/transactions/accounts/summary/'),
+    ]
+
+
+def _walk(node):
+    yield node
+    for child in node.get('Plans', []):
+        yield from _walk(child)
+
+
+def _parent_indexes():
+    """Mapeia índices de partições para o índice declarado na tabela pai."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname, parent.relname FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            WHERE child.relkind = 'i'
+            """
+        )
+        return dict(cursor.fetchall())
+
+
+def _relation_sizes():
+    """Estimativa de linhas de cada tabela/partição de transações."""
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT relname, reltuples FROM pg_class WHERE relname LIKE %s', [f'{TABLE}%'])
+        return dict(cursor.fetchall())
+
+
+def _leading_columns():
+    """Mapeia cada índice para a primeira coluna indexada."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT idx.relname, att.attname FROM pg_index
+            JOIN pg_class idx ON idx.oid = pg_index.indexrelid
+            JOIN pg_attribute att ON att.attrelid = pg_index.indrelid AND att.attnum = pg_index.indkey[0]
+            """
+        )
+        return dict(cursor.fetchall())
+
+
+class Command(BaseCommand):
+    help = (
+        'Popula uma base sintética, captura o SQL dos endpoints de transações, executa EXPLAIN '
+        'e falha se algum plano deixar de usar os índices esperados (PostgreSQL).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50,
+                            help='Usuários sintéticos (padrão: 50).')
+        parser.add_argument('--rows-per-user', type=int, default=2000,
+                            help='Transações por usuário (padrão: 2000).')
+        parser.add_argument('--row-factor', type=float, default=1.5,
+                            help='Estimativa máxima de linhas lidas, em múltiplos das transações de um usuário.')
+        parser.add_argument('--show-plans', action='store_true', help='Exibe os planos completos.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('A verificação de planos requer PostgreSQL.')
+
+        failures = []
+        try:
+            with db_transaction.atomic():
+                user = self.seed(options['users'], options['rows_per_user'])
+                max_rows = options['rows_per_user'] * options['row_factor']
+                self.parents, self.leading = _parent_indexes(), _leading_columns()
+                self.sizes = _relation_sizes()
+                for check in plan_checks(user):
+                    failures.extend(self.run_check(user, check, max_rows, options['show_plans']))
+                # Os dados sintéticos nunca são mantidos
+                raise PlanRegression
+        except PlanRegression:
+            pass
+
+        if failures:
+            for failure in failures:
+                self.stderr.write(self.style.ERROR(failure))
+            raise CommandError(f'{len(failures)} regressões de plano encontradas.')
+        self.stdout.write(self.style.SUCCESS('Todos os planos usam os índices esperados.'))
+
+    def seed(self, users, rows_per_user):
+        self.stdout.write(f'Gerando {users * rows_per_user} transações para {users} usuários...')
+        seeded = [create_seed_user(index, prefix='plancheck') for index in range(users)]
+        for user in seeded:
+            seed_transactions(user, rows_per_user)
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {TABLE}')
+        return seeded[0]
+
+    def run_check(self, user, check, max_rows, show_plans):
+        client = APIClient()
+        client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as captured:
+            response = client.get(check.path)
+        if response.status_code != 200:
+            return [f'{check.name}: resposta {response.status_code}']
+
+        failures = []
+        used_indexes = set()
+        statements = [q['sql'] for q in captured.captured_queries if f'"{TABLE}"' in q['sql']]
+        for sql in statements:
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+                plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            if show_plans:
+                self.stdout.write(json.dumps(plan, indent=2))
+
+            for node in _walk(plan[0]['Plan']):
+                if 'Index Name' in node:
+                    used_indexes.add(self.parents.get(node['Index Name'], node['Index Name']))
+                relation = node.get('Relation Name', '')
+                if not relation.startswith(TABLE):
+                    continue
+                # Seq Scan só é regressão em tabelas/partições maiores que o volume de um usuário
+                if node['Node Type'] == 'Seq Scan' and self.sizes.get(relation, 0) > max_rows:
+                    failures.append(f'{check.name}: Seq Scan em {relation}')
+                if node['Plan Rows'] > max_rows:
+                    failures.append(
+                        f"{check.name}: estimativa de {node['Plan Rows']} linhas em {relation} (máximo {max_rows:.0f})"
+                    )
+
+        if check.expected_indexes and not used_indexes & set(check.expected_indexes):
+            failures.append(
+                f"{check.name}: esperado um de {', '.join(check.expected_indexes)}; "
+                f"usados: {', '.join(sorted(used_indexes)) or 'nenhum'}"
+            )
+        if check.leading_column and not any(self.leading.get(name) == check.leading_column for name in used_indexes):
+            failures.append(f'{check.name}: nenhum índice iniciado por {check.leading_column} foi usado')
+
+        status = self.style.ERROR('FALHOU') if failures else self.style.SUCCESS('ok')
+        self.stdout.write(f"{check.name}: {len(statements)} consultas, índices {sorted(used_indexes)} [{status}]")
+        return failures
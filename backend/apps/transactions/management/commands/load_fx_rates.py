@@ -0,0 +1,51 @@
+import csv
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from apps.core.sharding import for_each_shard
+from apps.transactions import fx
+from apps.transactions.models import ExchangeRate
+
+
+class Command(BaseCommand):
+    help = (
+        'Carrega cotações diárias de um arquivo CSV com as colunas date, currency, rate '
+        '(rate = unidades da moeda base por unidade da moeda).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Arquivo CSV com as cotações.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], newline='', encoding='utf-8') as handle:
+                rates = [self.parse_row(number, row) for number, row in enumerate(csv.DictReader(handle), start=2)]
+        except OSError as e:
+            raise CommandError(f'Não foi possível ler o arquivo: {e}')
+
+        # As cotações entram nas queries de cada shard, então todos têm a tabela completa
+        for _ in for_each_shard():
+            ExchangeRate.objects.bulk_create(
+                [ExchangeRate(currency=rate.currency, date=rate.date, rate=rate.rate) for rate in rates],
+                batch_size=options['batch_size'],
+                update_conflicts=True,
+                unique_fields=['currency', 'date'],
+                update_fields=['rate'],
+            )
+        fx.clear_cache()
+        self.stdout.write(self.style.SUCCESS(f'{len(rates)} cotações carregadas.'))
+
+    def parse_row(self, number, row):
+        date = parse_date((row.get('date') or '').strip())
+        currency = (row.get('currency') or '').strip().upper()
+        try:
+            rate = Decimal((row.get('rate') or '').strip())
+        except InvalidOperation:
+            rate = None
+
+        if not date or len(currency) != 3 or not rate or rate <= 0:
+            raise CommandError(f'Linha {number} inválida: {row}')
+        return ExchangeRate(currency=currency, date=date, rate=rate)
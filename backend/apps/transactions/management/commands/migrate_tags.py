@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from apps.transactions.tags import migrate_tags
+
+
+class Command(BaseCommand):
+    help = 'Cria as tags normalizadas a partir da lista de tags gravada em cada transação.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help='Transações processadas por lote (padrão: 2000).')
+        parser.add_argument('--user', type=int, action='append', dest='users',
+                            help='Migra apenas o usuário informado (pode ser repetido).')
+
+    def handle(self, *args, **options):
+        created = migrate_tags(batch_size=options['batch_size'], user_ids=options['users'])
+        self.stdout.write(self.style.SUCCESS(f'{created} associações processadas.'))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from apps.transactions.models import Account
+from apps.transactions.reconciliation import chunked
+from apps.transactions.snapshots import rebuild_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Recria as movimentações diárias e mensais de saldo a partir do histórico de transações.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users',
+                            help='Restringe a reconstrução a um usuário (pode repetir).')
+        parser.add_argument('--chunk-size', type=int, default=200,
+                            help='Número de contas por lote (padrão: 200).')
+
+    def handle(self, *args, **options):
+        accounts = Account.objects.order_by('pk')
+        if options['users']:
+            accounts = accounts.filter(user_id__in=options['users'])
+
+        total = 0
+        account_ids = list(accounts.values_list('pk', flat=True))
+        for chunk in chunked(account_ids, options['chunk_size']):
+            total += rebuild_snapshots(chunk)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} snapshots criados para {len(account_ids)} contas.'
+        ))
@@ -0,0 +1,24 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from apps.transactions.budgets import rebuild_usage
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Recalcula os contadores mensais de orçamento a partir das despesas concluídas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users',
+                            help='Restringe o recálculo a um usuário (pode repetir).')
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('pk')
+        if options['users']:
+            users = users.filter(pk__in=options['users'])
+
+        total = 0
+        for user in users.iterator():
+            total += rebuild_usage(user)
+        self.stdout.write(self.style.SUCCESS(f'{total} contadores de orçamento recalculados.'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from apps.transactions.hierarchy import rebuild_closure
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói a tabela de hierarquia das categorias a partir da categoria pai de cada uma.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users',
+                            help='Reconstrói apenas o usuário informado (pode ser repetido).')
+
+    def handle(self, *args, **options):
+        rows = rebuild_closure(user_ids=options['users'])
+        self.stdout.write(self.style.SUCCESS(f'{rows} linhas de hierarquia gravadas.'))
@@ -0,0 +1,25 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from apps.transactions.categorizer import rebuild_index
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói o índice de categorização automática a partir do histórico de transações.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users',
+                            help='Restringe a reconstrução a um usuário (pode repetir).')
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('pk')
+        if options['users']:
+            users = users.filter(pk__in=options['users'])
+
+        count = 0
+        for user_id in users.values_list('pk', flat=True).iterator():
+            rebuild_index(user_id)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'{count} índices de categorização reconstruídos.'))
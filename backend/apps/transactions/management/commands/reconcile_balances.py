@@ -0,0 +1,56 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from apps.transactions.reconciliation import reconcile
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula os saldos das contas a partir do saldo inicial, dos ajustes e das transações '
+        'concluídas e reporta divergências.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true',
+                            help='Corrige os saldos divergentes (só contas com saldo inicial registrado).')
+        parser.add_argument('--adopt', action='store_true',
+                            help='Registra o saldo atual como ponto de partida das contas sem saldo inicial.')
+        parser.add_argument('--user', type=int, action='append', dest='users',
+                            help='Restringe a reconciliação a um usuário (pode repetir).')
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Número de usuários por lote (padrão: 500).')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Número de processos paralelos (padrão: 1).')
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('pk')
+        if options['users']:
+            users = users.filter(pk__in=options['users'])
+        user_ids = list(users.values_list('pk', flat=True))
+
+        total_checked = total_drift = total_fixed = total_adopted = 0
+        for checked, drifts, fixed, adopted in reconcile(
+            user_ids,
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+            fix=options['fix'],
+            adopt=options['adopt'],
+        ):
+            total_checked += checked
+            total_drift += len(drifts)
+            total_fixed += fixed
+            total_adopted += adopted
+            for drift in drifts:
+                self.stdout.write(
+                    f"Conta {drift.account_id} (usuário {drift.user_id}): "
+                    f"saldo {drift.cached_balance}, razão {drift.ledger_balance}, "
+                    f"diferença {drift.difference}"
+                    + ('' if drift.tracked else ' (sem saldo inicial registrado; use --adopt)')
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{total_checked} contas verificadas, {total_drift} divergentes, {total_fixed} corrigidas, '
+            f'{total_adopted} adotadas.'
+        ))
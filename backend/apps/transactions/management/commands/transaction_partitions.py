@@ -0,0 +1,81 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.dateparse import parse_date
+
+from apps.transactions import partitioning
+from apps.transactions.models import Transaction
+
+
+class Command(BaseCommand):
+    help = 'Gerencia o particionamento anual da tabela de transações (PostgreSQL).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS,
+                            help='Banco (ou shard) em que a operação é feita (padrão: default).')
+        subparsers = parser.add_subparsers(dest='action', required=True)
+
+        convert = subparsers.add_parser('convert', help='Converte a tabela em particionada por ano.')
+        convert.add_argument('--extra-years', type=int, default=1,
+                             help='Anos futuros a criar antecipadamente (padrão: 1).')
+
+        for action in ('create', 'attach'):
+            sub = subparsers.add_parser(action, help=f'{action.capitalize()} a partição de um ano.')
+            sub.add_argument('year', type=int)
+
+        detach = subparsers.add_parser('detach', help='Desanexa a partição de um ano.')
+        detach.add_argument('year', type=int)
+        detach.add_argument('--drop', action='store_true', help='Remove a tabela após desanexar.')
+
+        subparsers.add_parser('list', help='Lista as partições anexadas.')
+
+        explain = subparsers.add_parser('explain', help='Mostra as partições lidas por uma consulta por período.')
+        explain.add_argument('--user', type=int, required=True)
+        explain.add_argument('--start', required=True, help='Data inicial (AAAA-MM-DD).')
+        explain.add_argument('--end', required=True, help='Data final (AAAA-MM-DD).')
+
+    def handle(self, *args, **options):
+        try:
+            getattr(self, f"handle_{options['action']}")(options)
+        except partitioning.PartitioningError as e:
+            raise CommandError(str(e))
+
+    def handle_convert(self, options):
+        replaced = partitioning.convert_to_partitioned(
+            extra_years=options['extra_years'], using=options['database']
+        )
+        self.stdout.write(self.style.SUCCESS('Tabela de transações convertida para particionada.'))
+        if replaced:
+            # O PostgreSQL não aceita chaves estrangeiras para `id` sozinho em tabela particionada
+            self.stdout.write(self.style.WARNING(
+                f'{len(replaced)} chaves estrangeiras para transactions foram trocadas por constraint triggers: '
+                f"{', '.join(replaced)}. Partições só podem ser removidas (`detach --drop`) quando vazias."
+            ))
+
+    def handle_create(self, options):
+        partitioning.create_partition(options['year'], using=options['database'])
+        self.stdout.write(self.style.SUCCESS(f"Partição {partitioning.partition_name(options['year'])} criada."))
+
+    def handle_attach(self, options):
+        partitioning.attach_partition(options['year'], using=options['database'])
+        self.stdout.write(self.style.SUCCESS(f"Partição {partitioning.partition_name(options['year'])} anexada."))
+
+    def handle_detach(self, options):
+        partitioning.detach_partition(options['year'], drop=options['drop'], using=options['database'])
+        self.stdout.write(self.style.SUCCESS(f"Partição {partitioning.partition_name(options['year'])} desanexada."))
+
+    def handle_list(self, options):
+        for name, bounds in partitioning.list_partitions(options['database']):
+            self.stdout.write(f'{name}: {bounds}')
+
+    def handle_explain(self, options):
+        start, end = parse_date(options['start']), parse_date(options['end'])
+        if not start or not end:
+            raise CommandError('Datas devem estar no formato AAAA-MM-DD.')
+
+        # Mesma forma das consultas de TransactionViewSet.summary / TransactionFilter
+        queryset = Transaction.objects.using(options['database']).filter(
+            user_id=options['user'], date__gte=start, date__lte=end, status='completed'
+        )
+        self.stdout.write(queryset.explain())
+        scanned = partitioning.scanned_partitions(queryset)
+        self.stdout.write(self.style.SUCCESS(f"Partições lidas: {', '.join(scanned) or 'nenhuma'}"))
@@ -1,7 +1,26 @@
 from django.db import models
 from django.conf import settings
 from django.core.validators import MinValueValidator
+from django.contrib.postgres.indexes import OpClass
+from django.db.models.functions import Upper
 from decimal import Decimal
+import hashlib
+
+from apps.core import identity
+
+from .text import words
+
+
+class PrefixIndex(models.Index):
+    """Índice de expressões para LIKE 'prefixo%'; no PostgreSQL usa o operator class `text_pattern_ops`."""
+
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().create_sql(model, schema_editor, using, **kwargs)
+        index = models.Index(
+            *[OpClass(expression, name='text_pattern_ops') for expression in self.expressions], name=self.name,
+        )
+        return index.create_sql(model, schema_editor, using, **kwargs)
 
 
 class Category(models.Model):
@@ -20,6 +39,15 @@ class Category(models.Model):
     category_type = models.CharField(max_length=10, choices=CATEGORY_TYPES, verbose_name='Tipo')
     is_active = models.BooleanField(default=True, verbose_name='Ativo')
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='categories')
+    # Hierarquia: alterações devem passar por hierarchy.move_category para manter CategoryClosure
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='children',
+        verbose_name='Categoria Pai'
+    )
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -35,6 +63,27 @@ class Category(models.Model):
         return self.name
 
 
+class CategoryClosure(models.Model):
+    """
+    Tabela de fechamento da hierarquia de categorias: uma linha para cada par
+    ancestral/descendente (incluindo a própria categoria, com profundidade 0).
+    """
+    
+    # Sem índice próprio: coberto pela unicidade (ancestor, descendant)
+    ancestor = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='descendant_links', db_index=False)
+    descendant = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='ancestor_links')
+    depth = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        db_table = 'category_closure'
+        verbose_name = 'Hierarquia de Categorias'
+        verbose_name_plural = 'Hierarquia de Categorias'
+        unique_together = ['ancestor', 'descendant']
+
+    def __str__(self):
+        return f"{self.ancestor_id} > {self.descendant_id} ({self.depth})"
+
+
 class Account(models.Model):
     """Contas bancárias ou carteiras do usuário."""
     
@@ -123,13 +172,19 @@ class Transaction(models.Model):
     date = models.DateField(verbose_name='Data')
     status = models.CharField(max_length=10, choices=TRANSACTION_STATUS, default='completed', verbose_name='Status')
     is_recurring = models.BooleanField(default=False, verbose_name='Recorrente')
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='transactions')
+    # Sem índice próprio: todos os índices compostos de Meta.indexes começam por user
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='transactions', db_index=False
+    )
     
     # Campos para análise e ML
     tags = models.JSONField(default=list, blank=True, verbose_name='Tags')
     location = models.CharField(max_length=200, blank=True, verbose_name='Local')
     notes = models.TextField(blank=True, verbose_name='Observações')
     
+    # Identifica transações equivalentes (reimportações, reenvios); ver compute_fingerprint
+    fingerprint = models.CharField(max_length=40, blank=True, editable=False, verbose_name='Impressão Digital')
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -139,15 +194,41 @@ class Transaction(models.Model):
         verbose_name_plural = 'Transações'
         ordering = ['-date', '-created_at']
         indexes = [
-            models.Index(fields=['user', 'date']),
+            # Listagem e busca: filtro por usuário na ordenação padrão
+            models.Index(fields=['user', '-date', '-created_at'], name='transactions_user_recent_idx'),
+            # summary: usuário + período sobre transações concluídas
+            models.Index(
+                fields=['user', 'date'],
+                name='transactions_done_date_idx',
+                condition=models.Q(status='completed'),
+                include=['transaction_type', 'amount'],
+            ),
+            # by_category: usuário + tipo + período sobre transações concluídas
+            models.Index(
+                fields=['user', 'transaction_type', 'date'],
+                name='transactions_done_type_idx',
+                condition=models.Q(status='completed'),
+                include=['category', 'amount'],
+            ),
             models.Index(fields=['user', 'transaction_type']),
             models.Index(fields=['user', 'category']),
             models.Index(fields=['user', 'account']),
+            # Verificação de duplicatas na criação e na importação
+            models.Index(fields=['user', 'fingerprint'], name='transactions_fingerprint_idx'),
+            # Busca por prefixo do título no admin (`^title` vira UPPER(title) LIKE 'X%')
+            PrefixIndex(Upper('title'), name='transactions_title_prefix_idx'),
         ]
 
     def __str__(self):
         return f"{self.title} - R$ {self.amount} ({self.get_transaction_type_display()})"
 
+    def compute_fingerprint(self):
+        """Hash de usuário, conta, data, tipo, valor e título normalizado (ou local, sem título)."""
+        text = ' '.join(words(self.title or '')) or ' '.join(words(self.location or ''))
+        amount = Decimal(self.amount).quantize(Decimal('0.01'))
+        key = f'{self.user_id}|{self.account_id}|{self.date}|{self.transaction_type}|{amount}|{text}'
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
     def clean(self):
         from django.core.exceptions import ValidationError
         
@@ -164,10 +245,45 @@ class Transaction(models.Model):
             raise ValidationError('Categoria incompatível com o tipo de transação.')
 
     def save(self, *args, **kwargs):
-        self.full_clean()
+        # Conta, categoria e usuário já carregados existem: dispensa as consultas de validação
+        self.full_clean(exclude=identity.loaded_relations(self))
+        self.fingerprint = self.compute_fingerprint()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'fingerprint'}
         super().save(*args, **kwargs)
 
 
+class TransactionSplit(models.Model):
+    """
+    Item de uma transação dividida entre categorias.
+
+    Só as transações divididas têm itens; a soma dos itens é igual ao valor
+    da transação (ver apps.transactions.splits).
+    """
+    
+    transaction = models.ForeignKey(Transaction, on_delete=models.CASCADE, related_name='splits')
+    category = models.ForeignKey(
+        Category, on_delete=models.PROTECT, related_name='split_lines', verbose_name='Categoria'
+    )
+    amount = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        validators=[MinValueValidator(Decimal('0.01'))],
+        verbose_name='Valor'
+    )
+    note = models.CharField(max_length=200, blank=True, verbose_name='Observação')
+
+    class Meta:
+        db_table = 'transaction_splits'
+        verbose_name = 'Item da Transação'
+        verbose_name_plural = 'Itens das Transações'
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.transaction_id} - {self.category_id}: {self.amount}"
+
+
 class RecurringTransaction(models.Model):
     """Template para transações recorrentes."""
     
@@ -200,6 +316,286 @@ class RecurringTransaction(models.Model):
         verbose_name = 'Transação Recorrente'
         verbose_name_plural = 'Transações Recorrentes'
         ordering = ['next_execution']
+        indexes = [
+            # Busca por prefixo do título no admin
+            PrefixIndex(Upper('title'), name='recurring_title_prefix_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.get_frequency_display()}"
+
+
+class BalanceSnapshot(models.Model):
+    """Movimentação diária das contas calculada a partir das transações concluídas."""
+    
+    account = models.ForeignKey(
+        Account,
+        on_delete=models.CASCADE,
+        related_name='balance_snapshots',
+        verbose_name='Conta'
+    )
+    date = models.DateField(verbose_name='Data')
+    net_change = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Movimentação do Dia')
+
+    class Meta:
+        db_table = 'balance_snapshots'
+        verbose_name = 'Movimentação Diária'
+        verbose_name_plural = 'Movimentações Diárias'
+        unique_together = ['account', 'date']
+        ordering = ['date']
+
+    def __str__(self):
+        return f"{self.account} em {self.date}: {self.net_change}"
+
+
+class BalanceCheckpoint(models.Model):
+    """Movimentação mensal das contas: soma dos snapshots diários do mês."""
+    
+    account = models.ForeignKey(
+        Account,
+        on_delete=models.CASCADE,
+        related_name='balance_checkpoints',
+        verbose_name='Conta'
+    )
+    # Primeiro dia do mês
+    month = models.DateField(verbose_name='Mês')
+    net_change = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Movimentação do Mês')
+
+    class Meta:
+        db_table = 'balance_checkpoints'
+        verbose_name = 'Movimentação Mensal'
+        verbose_name_plural = 'Movimentações Mensais'
+        unique_together = ['account', 'month']
+        ordering = ['month']
+
+    def __str__(self):
+        return f"{self.account} em {self.month:%m/%Y}: {self.net_change}"
+
+
+class BalanceAdjustment(models.Model):
+    """
+    Variação de saldo que não vem de transações: o saldo inicial informado
+    na criação da conta e os ajustes manuais. O saldo do razão é a soma dos
+    ajustes com as transações (ver apps.transactions.reconciliation).
+    """
+    
+    KINDS = [
+        ('opening', 'Saldo Inicial'),
+        ('adjustment', 'Ajuste'),
+    ]
+    
+    account = models.ForeignKey(
+        Account,
+        on_delete=models.CASCADE,
+        related_name='adjustments',
+        verbose_name='Conta'
+    )
+    kind = models.CharField(max_length=10, choices=KINDS, verbose_name='Tipo')
+    date = models.DateField(verbose_name='Data')
+    amount = models.DecimalField(max_digits=14, decimal_places=2, verbose_name='Valor')
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'balance_adjustments'
+        verbose_name = 'Ajuste de Saldo'
+        verbose_name_plural = 'Ajustes de Saldo'
+        ordering = ['date', 'pk']
+        constraints = [
+            # Uma conta tem no máximo um saldo inicial
+            models.UniqueConstraint(
+                fields=['account'], condition=models.Q(kind='opening'), name='balance_adjustments_one_opening'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.account} em {self.date}: {self.amount}"
+
+
+class TransactionArchive(models.Model):
+    """Transações de anos encerrados movidas para armazenamento frio."""
+    
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='transaction_archives')
+    year = models.PositiveIntegerField(verbose_name='Ano')
+    transaction_count = models.PositiveIntegerField(default=0, verbose_name='Quantidade de Transações')
+    # Efeito líquido do ano arquivado em cada conta: {account_id: valor}
+    account_totals = models.JSONField(default=dict, verbose_name='Totais por Conta')
+    # NDJSON das transações comprimido com zlib
+    payload = models.BinaryField(verbose_name='Conteúdo')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'transactions_archive'
+        verbose_name = 'Arquivo de Transações'
+        verbose_name_plural = 'Arquivos de Transações'
+        unique_together = ['user', 'year']
+        ordering = ['user', 'year']
+
+    def __str__(self):
+        return f"{self.user} - {self.year} ({self.transaction_count} transações)"
+
+
+class ExchangeRate(models.Model):
+    """Cotação diária de uma moeda em relação à moeda base (FX_BASE_CURRENCY)."""
+    
+    currency = models.CharField(max_length=3, verbose_name='Moeda')
+    date = models.DateField(verbose_name='Data')
+    # Unidades da moeda base por 1 unidade de `currency`
+    rate = models.DecimalField(max_digits=18, decimal_places=8, verbose_name='Cotação')
+
+    class Meta:
+        db_table = 'exchange_rates'
+        verbose_name = 'Cotação'
+        verbose_name_plural = 'Cotações'
+        unique_together = ['currency', 'date']
+        ordering = ['currency', '-date']
+
+    def __str__(self):
+        return f"{self.currency} {self.date}: {self.rate}"
+
+
+class CategoryBudget(models.Model):
+    """Limite mensal de gastos de uma categoria."""
+    
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='category_budgets')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='budgets', verbose_name='Categoria')
+    monthly_limit = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        validators=[MinValueValidator(Decimal('0.01'))],
+        verbose_name='Limite Mensal'
+    )
+    is_active = models.BooleanField(default=True, verbose_name='Ativo')
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'category_budgets'
+        verbose_name = 'Orçamento por Categoria'
+        verbose_name_plural = 'Orçamentos por Categoria'
+        unique_together = ['user', 'category']
+
+    def __str__(self):
+        return f"{self.category} - {self.monthly_limit}"
+
+
+class BudgetUsage(models.Model):
+    """
+    Gasto acumulado no mês, por categoria ou total (category nulo).
+    
+    Atualizado de forma incremental a cada escrita de transação.
+    """
+    
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='budget_usages')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True, related_name='budget_usages')
+    month = models.DateField(verbose_name='Mês')  # Primeiro dia do mês
+    spent = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Gasto')
+    alerted = models.BooleanField(default=False, verbose_name='Alerta Enviado')
+    
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'budget_usages'
+        verbose_name = 'Uso do Orçamento'
+        verbose_name_plural = 'Usos do Orçamento'
+        ordering = ['-month']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'category', 'month'],
+                condition=models.Q(category__isnull=False),
+                name='budget_usage_category_month_uniq',
+            ),
+            models.UniqueConstraint(
+                fields=['user', 'month'],
+                condition=models.Q(category__isnull=True),
+                name='budget_usage_total_month_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.category or 'Total'} em {self.month:%m/%Y}: {self.spent}"
+
+
+class CategoryTokenIndex(models.Model):
+    """
+    Marca o índice do categorizador automático do usuário como construído.
+    
+    As contagens ficam em `CategoryTokenCount`; esta linha só indica que elas
+    já refletem o histórico e não é alterada nas escritas de transações.
+    """
+    
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='category_index')
+    
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'category_token_indexes'
+        verbose_name = 'Índice de Categorização'
+        verbose_name_plural = 'Índices de Categorização'
+
+    def __str__(self):
+        return f"{self.user} - {self.updated_at}"
+
+
+class CategoryTokenCount(models.Model):
+    """
+    Ocorrências de um token (título, local ou faixa de valor) nas transações
+    de uma categoria.
+    
+    Cada escrita de transação incrementa apenas as linhas dos seus tokens.
+    Os tokens reservados `#docs` e `#tokens` guardam, por categoria, o número
+    de transações e o total de tokens.
+    """
+    
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='category_token_counts')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='token_counts')
+    token = models.CharField(max_length=255, verbose_name='Token')
+    count = models.IntegerField(default=0, verbose_name='Ocorrências')
+
+    class Meta:
+        db_table = 'category_token_counts'
+        verbose_name = 'Contagem de Token'
+        verbose_name_plural = 'Contagens de Tokens'
+        unique_together = ['category', 'token']
+
+    def __str__(self):
+        return f"{self.category} - {self.token}: {self.count}"
+
+
+class Tag(models.Model):
+    """Tag de transações do usuário, normalizada em `slug`."""
+    
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='tags')
+    name = models.CharField(max_length=50, verbose_name='Nome')
+    # Nome normalizado (minúsculas, sem acentos) usado nas buscas
+    slug = models.CharField(max_length=50, verbose_name='Identificador')
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'tags'
+        verbose_name = 'Tag'
+        verbose_name_plural = 'Tags'
+        unique_together = ['user', 'slug']
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
+class TransactionTag(models.Model):
+    """Associação entre transações e tags."""
+    
+    transaction = models.ForeignKey(Transaction, on_delete=models.CASCADE, related_name='tag_links')
+    # Sem índice próprio: coberto pela unicidade (tag, transaction)
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='transaction_links', db_index=False)
+
+    class Meta:
+        db_table = 'transaction_tags'
+        verbose_name = 'Tag da Transação'
+        verbose_name_plural = 'Tags das Transações'
+        unique_together = ['tag', 'transaction']
+
+    def __str__(self):
+        return f"{self.transaction_id} - {self.tag_id}"
@@ -0,0 +1,296 @@
+"""
+Particionamento declarativo por ano da tabela `transactions` (PostgreSQL).
+
+A conversão troca a tabela comum por uma tabela particionada por faixa de
+`date`, com uma partição por ano e uma partição padrão. O modelo Django não
+muda: a chave primária física passa a ser (id, date), exigência do
+PostgreSQL para tabelas particionadas, e as consultas filtradas por data
+(listagem, `summary`, `by_category`, `TransactionFilter`) passam a ler
+apenas as partições do período.
+
+A conversão roda pelo comando `transaction_partitions convert` ou numa
+migração, com `migrations.RunPython(partition_transactions, migrations.RunPython.noop)`.
+As operações recebem o banco em `using`; com shards, cada shard tem a sua
+tabela de transações e é convertido separadamente.
+"""
+import re
+from datetime import date
+
+from django.db import DEFAULT_DB_ALIAS, connections, models, transaction as db_transaction
+
+from .models import Transaction
+
+TABLE = Transaction._meta.db_table
+DEFAULT_PARTITION = f'{TABLE}_default'
+PARTITION_RE = re.compile(rf'\b({TABLE}_(?:\d{{4}}|default))\b')
+
+
+class PartitioningError(Exception):
+    """Operação de particionamento inválida para o estado atual do banco."""
+
+
+def partition_name(year):
+    return f'{TABLE}_{year}'
+
+
+def _bounds(year):
+    return date(year, 1, 1).isoformat(), date(year + 1, 1, 1).isoformat()
+
+
+def _require_postgresql(connection):
+    if connection.vendor != 'postgresql':
+        raise PartitioningError('Particionamento disponível apenas no PostgreSQL.')
+
+
+def is_partitioned(using=DEFAULT_DB_ALIAS):
+    """Indica se a tabela de transações já é particionada."""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)', [TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions(using=DEFAULT_DB_ALIAS):
+    """Retorna [(nome, faixa)] das partições anexadas."""
+    connection = connections[using]
+    _require_postgresql(connection)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+            FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = to_regclass(%s)
+            ORDER BY child.relname
+            """,
+            [TABLE],
+        )
+        return cursor.fetchall()
+
+
+def _create_year_partition(cursor, year):
+    start, end = _bounds(year)
+    cursor.execute(
+        f'CREATE TABLE IF NOT EXISTS {partition_name(year)} PARTITION OF {TABLE} '
+        f"FOR VALUES FROM ('{start}') TO ('{end}')"
+    )
+
+
+# Funções das constraint triggers que substituem as chaves estrangeiras para `transactions`
+REFERENCE_FUNCTIONS = f"""
+CREATE OR REPLACE FUNCTION {TABLE}_reference_check() RETURNS trigger AS $$
+DECLARE
+    ref bigint := (to_jsonb(NEW) ->> TG_ARGV[0])::bigint;
+BEGIN
+    IF ref IS NOT NULL AND NOT EXISTS (SELECT 1 FROM {TABLE} WHERE id = ref) THEN
+        RAISE foreign_key_violation USING MESSAGE = format(
+            '%s.%s = %s não existe em {TABLE}', TG_TABLE_NAME, TG_ARGV[0], ref
+        );
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION {TABLE}_referenced_check() RETURNS trigger AS $$
+DECLARE
+    referenced boolean;
+BEGIN
+    -- Linha movida de partição (create_partition, mudança de data) continua existindo
+    IF EXISTS (SELECT 1 FROM {TABLE} WHERE id = OLD.id) THEN
+        RETURN NULL;
+    END IF;
+    EXECUTE format('SELECT EXISTS (SELECT 1 FROM %I WHERE %I = $1)', TG_ARGV[0], TG_ARGV[1])
+        INTO referenced USING OLD.id;
+    IF referenced THEN
+        RAISE foreign_key_violation USING MESSAGE = format(
+            '{TABLE}.id = %s ainda é referenciado por %s.%s', OLD.id, TG_ARGV[0], TG_ARGV[1]
+        );
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+
+def _replace_foreign_keys(cursor, references):
+    """
+    Troca as chaves estrangeiras [(tabela, constraint, coluna)] por constraint
+    triggers adiadas até o commit, como as chaves criadas pelo Django.
+    """
+    cursor.execute(REFERENCE_FUNCTIONS)
+    for table, name, column in references:
+        cursor.execute(f'ALTER TABLE {table} DROP CONSTRAINT {name}')
+        cursor.execute(
+            f'CREATE CONSTRAINT TRIGGER {name}_check AFTER INSERT OR UPDATE OF {column} ON {table} '
+            f'DEFERRABLE INITIALLY DEFERRED FOR EACH ROW '
+            f"EXECUTE FUNCTION {TABLE}_reference_check('{column}')"
+        )
+        cursor.execute(
+            f'CREATE CONSTRAINT TRIGGER {name}_referenced AFTER DELETE ON {TABLE} '
+            f'DEFERRABLE INITIALLY DEFERRED FOR EACH ROW '
+            f"EXECUTE FUNCTION {TABLE}_referenced_check('{table}', '{column}')"
+        )
+
+
+def _model_indexes(model):
+    """Índices do modelo: campos com `db_index` (chaves estrangeiras) e `Meta.indexes`."""
+    indexes = [
+        models.Index(fields=[field.name], name=f'{model._meta.db_table}_{field.column}_idx')
+        for field in model._meta.local_fields
+        if field.db_index and not field.unique
+    ]
+    return indexes + list(model._meta.indexes)
+
+
+def _convert(schema_editor, extra_years):
+    connection = schema_editor.connection
+    legacy = f'{TABLE}_legacy'
+    with connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE')
+        # Verificações adiadas de chaves estrangeiras pendentes impedem o ALTER TABLE
+        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        cursor.execute(f'ALTER TABLE {TABLE} RENAME TO {legacy}')
+
+        cursor.execute(
+            "SELECT conrelid::regclass::text, conname, attname FROM pg_constraint "
+            "JOIN pg_attribute ON attrelid = conrelid AND attnum = conkey[1] "
+            "WHERE contype = 'f' AND confrelid = to_regclass(%s) ORDER BY 1, 2",
+            [legacy],
+        )
+        references = cursor.fetchall()
+
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE contype = 'f' AND conrelid = to_regclass(%s)",
+            [legacy],
+        )
+        foreign_keys = cursor.fetchall()
+
+        cursor.execute(
+            f'CREATE TABLE {TABLE} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING IDENTITY '
+            f'INCLUDING CONSTRAINTS INCLUDING STORAGE) PARTITION BY RANGE (date)'
+        )
+        cursor.execute(f'ALTER TABLE {TABLE} ADD PRIMARY KEY (id, date)')
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}')
+
+        cursor.execute(f'SELECT EXTRACT(YEAR FROM MIN(date)), EXTRACT(YEAR FROM MAX(date)) FROM {legacy}')
+        first, last = cursor.fetchone()
+        current = date.today().year
+        first = int(first) if first is not None else current
+        last = max(int(last) if last is not None else current, current) + extra_years
+        for year in range(first, last + 1):
+            _create_year_partition(cursor, year)
+        cursor.execute(f'CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT')
+
+        cursor.execute(f'INSERT INTO {TABLE} SELECT * FROM {legacy}')
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), COALESCE(MAX(id), 1)) FROM {TABLE}",
+            [TABLE],
+        )
+        _replace_foreign_keys(cursor, references)
+        cursor.execute(f'DROP TABLE {legacy}')
+
+    # Índices do modelo recriados na tabela particionada, na mesma transação
+    for index in _model_indexes(Transaction):
+        schema_editor.add_index(Transaction, index)
+    return [f'{table}.{name}' for table, name, _ in references]
+
+
+def convert_to_partitioned(extra_years=1, using=DEFAULT_DB_ALIAS):
+    """
+    Converte `transactions` em tabela particionada por ano.
+
+    Cria partições para todos os anos com dados e para os próximos
+    `extra_years` anos, além da partição padrão, e recria os índices do
+    modelo, tudo em uma única transação.
+
+    O PostgreSQL só aceita chaves estrangeiras para a chave (id, date) de
+    uma tabela particionada, e as tabelas que apontam para `transactions`
+    (itens de transações divididas, tags...) guardam apenas o id. As chaves
+    estrangeiras delas são trocadas por constraint triggers adiadas até o
+    commit: inserir uma referência a uma transação inexistente, ou excluir
+    uma transação ainda referenciada, falha como antes. `DROP TABLE` não
+    dispara triggers, por isso `detach_partition(drop=True)` exige a
+    partição vazia. Retorna os nomes das chaves estrangeiras trocadas.
+    """
+    connection = connections[using]
+    _require_postgresql(connection)
+    if is_partitioned(using):
+        raise PartitioningError('A tabela de transações já é particionada.')
+
+    with connection.schema_editor() as schema_editor:
+        return _convert(schema_editor, extra_years)
+
+
+def partition_transactions(apps, schema_editor):
+    """
+    Conversão para `migrations.RunPython` (reverso: `RunPython.noop`).
+
+    Roda apenas no PostgreSQL e em bancos ainda não convertidos; em cada
+    shard, o migrate do shard faz a própria conversão.
+    """
+    alias = schema_editor.connection.alias
+    if schema_editor.connection.vendor == 'postgresql' and not is_partitioned(alias):
+        _convert(schema_editor, extra_years=1)
+
+
+def create_partition(year, using=DEFAULT_DB_ALIAS):
+    """
+    Cria a partição de um ano.
+
+    Linhas do ano que estejam na partição padrão são movidas para a nova
+    partição antes de anexá-la.
+    """
+    connection = connections[using]
+    _require_postgresql(connection)
+    start, end = _bounds(year)
+    name = partition_name(year)
+    with db_transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute(f'CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE date >= %s AND date < %s RETURNING *) '
+            f'INSERT INTO {name} SELECT * FROM moved',
+            [start, end],
+        )
+        cursor.execute(f"ALTER TABLE {TABLE} ATTACH PARTITION {name} FOR VALUES FROM ('{start}') TO ('{end}')")
+
+
+def attach_partition(year, using=DEFAULT_DB_ALIAS):
+    """Anexa novamente uma partição anual previamente desanexada."""
+    connection = connections[using]
+    _require_postgresql(connection)
+    start, end = _bounds(year)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"ALTER TABLE {TABLE} ATTACH PARTITION {partition_name(year)} "
+            f"FOR VALUES FROM ('{start}') TO ('{end}')"
+        )
+
+
+def detach_partition(year, drop=False, using=DEFAULT_DB_ALIAS):
+    """
+    Desanexa a partição de um ano, removendo-a se `drop` for verdadeiro.
+
+    Só partições vazias podem ser removidas: `DROP TABLE` não passa pelas
+    triggers que protegem as referências a transações.
+    """
+    connection = connections[using]
+    _require_postgresql(connection)
+    with db_transaction.atomic(using=using), connection.cursor() as cursor:
+        if drop:
+            cursor.execute(f'SELECT EXISTS (SELECT 1 FROM {partition_name(year)})')
+            if cursor.fetchone()[0]:
+                raise PartitioningError(f'A partição {partition_name(year)} ainda possui transações.')
+        cursor.execute(f'ALTER TABLE {TABLE} DETACH PARTITION {partition_name(year)}')
+        if drop:
+            cursor.execute(f'DROP TABLE {partition_name(year)}')
+
+
+def scanned_partitions(queryset):
+    """Partições lidas pelo plano de execução da queryset (verificação de pruning)."""
+    return sorted(set(PARTITION_RE.findall(queryset.explain())))
@@ -0,0 +1,135 @@
+"""
+Projeção de fluxo de caixa a partir das transações recorrentes.
+
+Cada template vira um gerador preguiçoso das suas datas de ocorrência
+(aritmética de calendário com `relativedelta`, respeitando `end_date`). Os
+geradores são intercalados em ordem de data por `heapq.merge`, e os saldos
+de cada conta avançam ocorrência a ocorrência a partir de `Account.balance`,
+fechando um ponto por intervalo. Nenhuma lista de ocorrências é montada: a
+memória cresce com o número de templates e de intervalos do horizonte, não
+com templates x dias.
+"""
+import heapq
+import math
+from datetime import timedelta
+from decimal import Decimal
+
+from dateutil.relativedelta import relativedelta
+
+from . import timeseries
+
+ZERO = Decimal('0')
+
+FREQUENCIES = {
+    'daily': relativedelta(days=1),
+    'weekly': relativedelta(weeks=1),
+    'monthly': relativedelta(months=1),
+    'quarterly': relativedelta(months=3),
+    'yearly': relativedelta(years=1),
+}
+
+GRANULARITIES = ('day', 'week', 'month')
+
+# Horizonte da projeção, em meses
+DEFAULT_MONTHS = 3
+MAX_MONTHS = 12
+
+# Efeito de cada tipo no saldo da conta do template (recorrentes não têm conta de destino)
+SIGNS = {'income': 1, 'expense': -1, 'transfer': -1}
+
+
+def _step(recurring, count):
+    """Deslocamento de `count` períodos a partir de `next_execution`."""
+    delta = FREQUENCIES[recurring.frequency] * count
+    if count and (delta.months or delta.years):
+        # Mantém o dia de `start_date` (31 vira o último dia dos meses mais curtos)
+        delta += relativedelta(day=recurring.start_date.day)
+    return delta
+
+
+def next_occurrence(recurring):
+    """Data da execução seguinte a `next_execution`."""
+    return recurring.next_execution + _step(recurring, 1)
+
+
+def _first_index(recurring, since):
+    """Menor índice cuja ocorrência não é anterior a `since`."""
+    first = recurring.next_execution
+    if since <= first:
+        return 0
+    delta = FREQUENCIES[recurring.frequency]
+    if delta.days:
+        return math.ceil((since - first).days / delta.days)
+    months = (since.year - first.year) * 12 + since.month - first.month
+    index = max(0, months // (delta.months + delta.years * 12))
+    while first + _step(recurring, index) < since:
+        index += 1
+    return index
+
+
+def occurrences(recurring, start, end):
+    """Gera, em ordem, as datas de ocorrência do template entre `start` e `end`."""
+    if recurring.end_date and recurring.end_date < end:
+        end = recurring.end_date
+    index = _first_index(recurring, start)
+    while True:
+        day = recurring.next_execution + _step(recurring, index)
+        if day > end:
+            return
+        yield day
+        index += 1
+
+
+def _stream(order, recurring, start, end):
+    delta = recurring.amount * SIGNS.get(recurring.transaction_type, -1)
+    for day in occurrences(recurring, start, end):
+        # `order` desempata datas iguais sem comparar os demais campos
+        yield day, order, recurring.account_id, delta
+
+
+def project(templates, balances, start, end, granularity='month'):
+    """
+    Saldos projetados de `start` a `end`. `balances` mapeia id da conta para
+    o saldo atual; contas dos templates sem saldo informado começam em zero.
+
+    Retorna {id da conta: {'lowest': {...}, 'series': [...]}}, com o menor
+    saldo do período e um ponto por intervalo (entradas, saídas, quantidade
+    e saldo ao fim do intervalo).
+    """
+    templates = list(templates)
+    balances = dict(balances)
+    # Toda conta tem um ponto por intervalo desde o início, mesmo sem ocorrências nos primeiros
+    for recurring in templates:
+        balances.setdefault(recurring.account_id, ZERO)
+    merged = heapq.merge(*(
+        _stream(order, recurring, start, end) for order, recurring in enumerate(templates)
+    ))
+    lowest = {account_id: {'balance': balance, 'date': start} for account_id, balance in balances.items()}
+    result = {}
+    pending = next(merged, None)
+    for bucket in timeseries.buckets(start, end, granularity):
+        bucket_end = min(timeseries.next_bucket(bucket, granularity) - timedelta(days=1), end)
+        totals = {}
+        while pending is not None and pending[0] <= bucket_end:
+            day, _, account_id, delta = pending
+            balance = balances[account_id] = balances[account_id] + delta
+            entry = totals.setdefault(account_id, {'income': ZERO, 'expense': ZERO, 'count': 0})
+            entry['income' if delta > 0 else 'expense'] += abs(delta)
+            entry['count'] += 1
+            if balance < lowest[account_id]['balance']:
+                lowest[account_id] = {'balance': balance, 'date': day}
+            pending = next(merged, None)
+
+        for account_id, balance in balances.items():
+            entry = totals.get(account_id) or {'income': ZERO, 'expense': ZERO, 'count': 0}
+            result.setdefault(account_id, {'series': []})['series'].append({
+                'start': max(bucket, start),
+                'end': bucket_end,
+                **entry,
+                'net': entry['income'] - entry['expense'],
+                'balance': balance,
+            })
+
+    for account_id, projection in result.items():
+        projection['lowest'] = lowest[account_id]
+    return result
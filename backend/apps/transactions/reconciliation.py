@@ -0,0 +1,232 @@
+"""
+Reconciliação de saldos das contas com o histórico de transações.
+
+`Account.balance` é um valor em cache atualizado pelas views; este módulo
+recalcula o saldo de cada conta a partir do razão (saldo inicial e ajustes
+manuais em `BalanceAdjustment` mais as transações concluídas) e reporta (ou
+corrige) as divergências.
+
+Contas criadas antes do registro de ajustes não têm saldo inicial no razão:
+são reportadas mas nunca corrigidas, até que `adopt_untracked` registre o
+saldo atual como ponto de partida.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.db import connections
+from django.db.models import Case, DecimalField, Exists, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.core.db_routers import atomic, current_shard, use_shard
+
+from .models import Account, BalanceAdjustment, Transaction, TransactionArchive
+
+ZERO = Decimal('0.00')
+
+
+@dataclass
+class BalanceDrift:
+    """Divergência entre o saldo em cache e o saldo do razão."""
+
+    account_id: int
+    user_id: int
+    cached_balance: Decimal
+    ledger_balance: Decimal
+    # Falso para contas sem saldo inicial no razão, que não são corrigidas
+    tracked: bool = True
+
+    @property
+    def difference(self):
+        return self.cached_balance - self.ledger_balance
+
+
+def signed_amount():
+    """Valor da transação com sinal do ponto de vista da conta de origem."""
+    return Case(
+        When(transaction_type='income', then=F('amount')),
+        default=-F('amount'),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+
+
+def _sum_subquery(queryset, group_field, expression):
+    """Subquery escalar que soma `expression` agrupando por `group_field`."""
+    return Subquery(
+        queryset.values(group_field).annotate(total=Sum(expression)).values('total')[:1],
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+
+
+def ledger_balances(user_ids):
+    """
+    Retorna as contas dos usuários anotadas com o saldo calculado do razão.
+
+    Entradas e saídas (incluindo transferências recebidas) são calculadas
+    por subqueries correlacionadas, de modo que cada lote de usuários é
+    resolvido em uma única query.
+    """
+    completed = Transaction.objects.filter(status='completed')
+    outflows = _sum_subquery(
+        completed.filter(account=OuterRef('pk')), 'account', signed_amount()
+    )
+    inflows = _sum_subquery(
+        completed.filter(destination_account=OuterRef('pk'), transaction_type='transfer'),
+        'destination_account',
+        F('amount'),
+    )
+    adjustments = _sum_subquery(
+        BalanceAdjustment.objects.filter(account=OuterRef('pk')), 'account', F('amount')
+    )
+    zero = Value(ZERO, output_field=DecimalField(max_digits=14, decimal_places=2))
+
+    return Account.objects.filter(user_id__in=user_ids).annotate(
+        ledger_balance=Coalesce(outflows, zero) + Coalesce(inflows, zero) + Coalesce(adjustments, zero),
+        tracked=opening_exists(),
+    ).values_list('id', 'user_id', 'balance', 'ledger_balance', 'tracked')
+
+
+def opening_exists():
+    """Indica se a conta tem saldo inicial registrado no razão."""
+    return Exists(BalanceAdjustment.objects.filter(account=OuterRef('pk'), kind='opening'))
+
+
+def archived_totals(user_ids):
+    """Soma, por conta, o efeito das transações já movidas para o arquivo frio."""
+    totals = {}
+    for account_totals in TransactionArchive.objects.filter(
+        user_id__in=user_ids
+    ).values_list('account_totals', flat=True):
+        for account_id, total in account_totals.items():
+            totals[int(account_id)] = totals.get(int(account_id), ZERO) + Decimal(total)
+    return totals
+
+
+def find_drift(user_ids):
+    """Retorna (contas verificadas, contas cujo saldo em cache difere do razão)."""
+    checked = 0
+    drifts = []
+    archived = archived_totals(user_ids)
+    for account_id, user_id, balance, ledger_balance, tracked in ledger_balances(user_ids):
+        checked += 1
+        ledger_balance = Decimal(ledger_balance or ZERO) + archived.get(account_id, ZERO)
+        ledger_balance = ledger_balance.quantize(ZERO)
+        if balance != ledger_balance:
+            drifts.append(BalanceDrift(account_id, user_id, balance, ledger_balance, bool(tracked)))
+    return checked, drifts
+
+
+def adopt_untracked(user_ids):
+    """
+    Registra como saldo inicial, nas contas que ainda não têm um, a diferença
+    entre o saldo atual e as transações, e recria os snapshots dessas contas.
+    Retorna o número de contas adotadas.
+    """
+    from . import snapshots
+
+    archived = archived_totals(user_ids)
+    openings = [
+        BalanceAdjustment(
+            account_id=account_id,
+            kind='opening',
+            date=timezone.localdate(created_at),
+            amount=balance - (Decimal(ledger_balance or ZERO) + archived.get(account_id, ZERO)).quantize(ZERO),
+        )
+        for account_id, balance, ledger_balance, created_at in ledger_balances(user_ids).filter(
+            tracked=False
+        ).values_list('id', 'balance', 'ledger_balance', 'created_at')
+    ]
+    BalanceAdjustment.objects.bulk_create(openings, ignore_conflicts=True)
+    snapshots.rebuild_snapshots([opening.account_id for opening in openings])
+    return len(openings)
+
+
+def set_balance(account, balance, date):
+    """Define o saldo da conta, registrando a diferença como ajuste manual no razão."""
+    from . import snapshots
+
+    with atomic():
+        current = Account.objects.select_for_update().values_list('balance', flat=True).get(pk=account.pk)
+        delta = balance - current
+        if delta:
+            BalanceAdjustment.objects.create(account_id=account.pk, kind='adjustment', date=date, amount=delta)
+            snapshots.apply_delta(account.pk, date, delta)
+        account.balance = balance
+        account.save(update_fields=['balance', 'updated_at'])
+    return account
+
+
+def fix_drift(drifts):
+    """
+    Corrige os saldos divergentes.
+
+    A atualização só é aplicada se o saldo ainda for o observado na
+    leitura; contas alteradas nesse meio tempo são ignoradas e voltam a
+    ser avaliadas na próxima execução. Contas sem saldo inicial no razão
+    nunca são alteradas. Retorna o número de contas corrigidas.
+    """
+    fixed = 0
+    for drift in drifts:
+        if not drift.tracked:
+            continue
+        fixed += Account.objects.filter(
+            pk=drift.account_id, balance=drift.cached_balance
+        ).update(balance=drift.ledger_balance)
+    return fixed
+
+
+def reconcile_chunk(user_ids, fix=False, adopt=False):
+    """
+    Reconcilia um lote de usuários. Retorna (contas verificadas, divergências,
+    corrigidas, adotadas).
+    """
+    adopted = adopt_untracked(user_ids) if adopt else 0
+    checked, drifts = find_drift(user_ids)
+    fixed = fix_drift(drifts) if fix and drifts else 0
+    return checked, drifts, fixed, adopted
+
+
+def _reconcile_in_worker(user_ids, fix, adopt, shard):
+    with use_shard(shard):
+        result = reconcile_chunk(user_ids, fix=fix, adopt=adopt)
+    connections.close_all()
+    return result
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def reconcile(user_ids, chunk_size=500, workers=1, fix=False, adopt=False):
+    """
+    Reconcilia os saldos de todos os usuários informados.
+
+    Os usuários são divididos em lotes de `chunk_size`; com `workers > 1`
+    os lotes são distribuídos em um pool de processos. Gera uma tupla
+    (contas verificadas, divergências, corrigidas, adotadas) por lote.
+    """
+    chunks = chunked(user_ids, chunk_size)
+    if workers <= 1:
+        for chunk in chunks:
+            yield reconcile_chunk(chunk, fix=fix, adopt=adopt)
+        return
+
+    # Conexões herdadas não podem ser compartilhadas entre processos
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        futures = [executor.submit(_reconcile_in_worker, chunk, fix, adopt, current_shard()) for chunk in chunks]
+        for future in futures:
+            yield future.result()
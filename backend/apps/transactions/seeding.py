@@ -0,0 +1,82 @@
+"""
+Geração de dados sintéticos para verificações de desempenho.
+"""
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+
+from apps.analytics.invalidation import invalidate_results
+from apps.core.sharding import use_user_shard
+
+from .models import Transaction
+
+User = get_user_model()
+
+TITLES = [
+    'Supermercado', 'Restaurante', 'Uber', 'Farmácia', 'Aluguel', 'Conta de luz',
+    'Internet', 'Cinema', 'Padaria', 'Posto de gasolina', 'Salário', 'Freelance',
+]
+LOCATIONS = ['São Paulo', 'Rio de Janeiro', 'Belo Horizonte', 'Curitiba', '']
+
+
+def create_seed_user(index, prefix='seed', password=None):
+    """Cria um usuário sintético (com categorias e contas padrão)."""
+    return User.objects.create_user(
+        username=f'{prefix}{index}',
+        email=f'{prefix}{index}@example.com',
+        password=password,
+        first_name='Seed',
+        last_name=str(index),
+    )
+
+
+def build_transactions(user, count, years=3, rng=None):
+    """Gera transações aleatórias (não salvas) distribuídas pelos últimos `years` anos."""
+    rng = rng or random.Random(user.pk)
+    categories = {
+        kind: list(user.categories.filter(category_type__in=[kind, 'both']))
+        for kind in ('income', 'expense')
+    }
+    transfer_category = user.categories.filter(category_type='both').first()
+    accounts = list(user.accounts.all())
+    today = date.today()
+    span = 365 * years
+
+    for _ in range(count):
+        roll = rng.random()
+        transaction_type = 'expense' if roll < 0.75 else 'income' if roll < 0.95 else 'transfer'
+        account = rng.choice(accounts)
+        destination = None
+        if transaction_type == 'transfer' and len(accounts) > 1:
+            destination = rng.choice([a for a in accounts if a != account])
+        elif transaction_type == 'transfer':
+            transaction_type = 'expense'
+
+        if transaction_type == 'transfer':
+            category = transfer_category
+        else:
+            category = rng.choice(categories[transaction_type])
+
+        transaction = Transaction(
+            user=user,
+            title=rng.choice(TITLES),
+            amount=Decimal(rng.randint(100, 500000)) / 100,
+            transaction_type=transaction_type,
+            category=category,
+            account=account,
+            destination_account=destination,
+            date=today - timedelta(days=rng.randrange(span)),
+            status='completed' if rng.random() < 0.95 else 'pending',
+            location=rng.choice(LOCATIONS),
+        )
+        transaction.fingerprint = transaction.compute_fingerprint()
+        yield transaction
+
+
+def seed_transactions(user, count, years=3, rng=None, batch_size=2000):
+    """Insere `count` transações sintéticas para o usuário (no shard dele)."""
+    with use_user_shard(user.pk):
+        Transaction.objects.bulk_create(build_transactions(user, count, years, rng), batch_size=batch_size)
+    invalidate_results(user.pk)
@@ -1,10 +1,35 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import Category, Account, Transaction, RecurringTransaction
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from apps.core import identity
+from apps.core.db_routers import atomic
+from .models import Category, Account, Transaction, RecurringTransaction, CategoryBudget, TransactionSplit
+from .splits import save_splits, validate_splits
+from .tags import MAX_TAGS, unique_tags
 
 User = get_user_model()
 
 
+class OwnedRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Chave estrangeira para um objeto do usuário da requisição, resolvida pelo
+    mapa de identidade: a mesma conta ou categoria é consultada uma vez só.
+    """
+    
+    def get_queryset(self):
+        return super().get_queryset().filter(user=self.context['request'].user)
+    
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return identity.get(self.get_queryset(), data)
+        except ObjectDoesNotExist:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError, ValidationError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
 class CategorySerializer(serializers.ModelSerializer):
     """Serializer para categorias."""
     
@@ -14,11 +39,17 @@ class CategorySerializer(serializers.ModelSerializer):
         model = Category
         fields = [
             'id', 'name', 'description', 'color', 'icon', 
-            'category_type', 'is_active', 'transaction_count',
+            'category_type', 'parent', 'is_active', 'transaction_count',
             'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at', 'transaction_count']
     
+    def validate_parent(self, value):
+        """A categoria pai deve ser do próprio usuário."""
+        if value is not None and value.user_id != self.context['request'].user.id:
+            raise serializers.ValidationError('Categoria pai inválida.')
+        return value
+    
     def get_transaction_count(self, obj):
         """Retorna o número de transações da categoria."""
         return obj.transactions.filter(user=self.context['request'].user).count()
@@ -54,12 +85,25 @@ class AccountSerializer(serializers.ModelSerializer):
         return obj.transactions.filter(user=self.context['request'].user).count()
 
 
+class TransactionSplitSerializer(serializers.ModelSerializer):
+    """Serializer para os itens de uma transação dividida."""
+    
+    category = OwnedRelatedField(queryset=Category.objects.all())
+    category_name = serializers.CharField(source='category.name', read_only=True)
+    
+    class Meta:
+        model = TransactionSplit
+        fields = ['id', 'category', 'category_name', 'amount', 'note']
+        read_only_fields = ['id']
+
+
 class TransactionReadSerializer(serializers.ModelSerializer):
     """Serializer para leitura de transações."""
     
     category = CategorySerializer(read_only=True)
     account = AccountSerializer(read_only=True)
     destination_account = AccountSerializer(read_only=True)
+    splits = TransactionSplitSerializer(many=True, read_only=True)
     amount_formatted = serializers.SerializerMethodField()
     transaction_type_display = serializers.CharField(source='get_transaction_type_display', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
@@ -70,7 +114,7 @@ class TransactionReadSerializer(serializers.ModelSerializer):
             'id', 'title', 'description', 'amount', 'amount_formatted',
             'transaction_type', 'transaction_type_display', 'category', 
             'account', 'destination_account', 'date', 'status', 'status_display',
-            'is_recurring', 'tags', 'location', 'notes',
+            'is_recurring', 'tags', 'location', 'notes', 'splits',
             'created_at', 'updated_at'
         ]
     
@@ -82,14 +126,28 @@ class TransactionReadSerializer(serializers.ModelSerializer):
 class TransactionWriteSerializer(serializers.ModelSerializer):
     """Serializer para criação/edição de transações."""
     
+    category = OwnedRelatedField(queryset=Category.objects.all())
+    account = OwnedRelatedField(queryset=Account.objects.all())
+    destination_account = OwnedRelatedField(queryset=Account.objects.all(), allow_null=True, required=False)
+    # Itens por categoria; na edição, enviar substitui os anteriores ([] desfaz a divisão)
+    splits = TransactionSplitSerializer(many=True, required=False)
+    
     class Meta:
         model = Transaction
         fields = [
             'title', 'description', 'amount', 'transaction_type',
             'category', 'account', 'destination_account', 'date',
-            'status', 'is_recurring', 'tags', 'location', 'notes'
+            'status', 'is_recurring', 'tags', 'location', 'notes', 'splits'
         ]
     
+    def validate_tags(self, value):
+        """Aceita apenas uma lista de textos, sem repetições."""
+        if not isinstance(value, list) or not all(isinstance(tag, str) for tag in value):
+            raise serializers.ValidationError('Informe as tags como uma lista de textos.')
+        if len(value) > MAX_TAGS:
+            raise serializers.ValidationError(f'Máximo de {MAX_TAGS} tags por transação.')
+        return list(unique_tags(value).values())
+    
     def validate(self, data):
         """Validações customizadas."""
         # Validar transferência
@@ -114,12 +172,43 @@ class TransactionWriteSerializer(serializers.ModelSerializer):
                 'category': 'Categoria incompatível com o tipo de transação.'
             })
         
+        # Validar itens da divisão: a soma deve ser o valor da transação
+        instance = self.instance
+        amount = data.get('amount', instance.amount if instance else None)
+        if 'splits' in data:
+            error = validate_splits(
+                data['splits'], amount,
+                data.get('transaction_type', instance.transaction_type if instance else None),
+                self.context['request'].user,
+            )
+            if error:
+                raise serializers.ValidationError({'splits': error})
+        elif instance and (
+            amount != instance.amount
+            or data.get('transaction_type', instance.transaction_type) != instance.transaction_type
+        ) and instance.splits.exists():
+            raise serializers.ValidationError({
+                'splits': 'Ao alterar o valor ou o tipo de uma transação dividida, envie também os itens.'
+            })
+        
         return data
     
     def create(self, validated_data):
         """Cria uma nova transação."""
+        items = validated_data.pop('splits', [])
         validated_data['user'] = self.context['request'].user
-        return super().create(validated_data)
+        with atomic():
+            transaction = super().create(validated_data)
+            save_splits(transaction, items, replace=False)
+        return transaction
+    
+    def update(self, instance, validated_data):
+        items = validated_data.pop('splits', None)
+        with atomic():
+            transaction = super().update(instance, validated_data)
+            if items is not None:
+                save_splits(transaction, items)
+        return transaction
 
 
 class RecurringTransactionSerializer(serializers.ModelSerializer):
@@ -150,6 +239,28 @@ class RecurringTransactionSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class CategoryBudgetSerializer(serializers.ModelSerializer):
+    """Serializer para orçamentos por categoria."""
+    
+    category_name = serializers.CharField(source='category.name', read_only=True)
+    
+    class Meta:
+        model = CategoryBudget
+        fields = [
+            'id', 'category', 'category_name', 'monthly_limit', 'is_active',
+            'created_at', 'updated_at'
+        ]
+        read_only_fields = ['id', 'created_at', 'updated_at']
+    
+    def validate_category(self, value):
+        """Valida que a categoria pertence ao usuário e aceita despesas."""
+        if value.user_id != self.context['request'].user.id:
+            raise serializers.ValidationError('Categoria não encontrada.')
+        if value.category_type not in ['expense', 'both']:
+            raise serializers.ValidationError('Orçamentos só podem ser definidos para categorias de despesa.')
+        return value
+
+
 class TransactionSummarySerializer(serializers.Serializer):
     """Serializer para resumo de transações."""
     
@@ -158,8 +269,11 @@ class TransactionSummarySerializer(serializers.Serializer):
     total_transfer = serializers.DecimalField(max_digits=12, decimal_places=2)
     balance = serializers.DecimalField(max_digits=12, decimal_places=2)
     transaction_count = serializers.IntegerField()
+    # Transações sem cotação para a moeda do usuário, fora dos totais
+    unconverted_count = serializers.IntegerField()
     period_start = serializers.DateField()
     period_end = serializers.DateField()
+    currency = serializers.CharField()
 
 
 class CategorySummarySerializer(serializers.Serializer):
@@ -1,7 +1,11 @@
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
-from .models import Category, Transaction
+from django.utils import timezone
+from apps.core.sharding import use_user_shard
+
+from .models import Account, BalanceAdjustment, Category, Transaction
+from . import hierarchy, snapshots
 
 User = get_user_model()
 
@@ -31,24 +35,42 @@ def create_default_categories(sender, instance, created, **kwargs):
             {'name': 'Transferência', 'category_type': 'both', 'color': '#6B7280', 'icon': 'arrow-right'},
         ]
         
-        for cat_data in default_categories:
-            Category.objects.create(user=instance, **cat_data)
+        with use_user_shard(instance.pk):
+            for cat_data in default_categories:
+                Category.objects.create(user=instance, **cat_data)
+
+
+@receiver(post_save, sender=Category)
+def add_category_to_hierarchy(sender, instance, created, **kwargs):
+    """Registra a categoria nova na tabela de hierarquia."""
+    if created:
+        hierarchy.add_category(instance)
 
 
 @receiver(post_save, sender=User)
 def create_default_accounts(sender, instance, created, **kwargs):
     """Cria contas padrão para novos usuários."""
     if created:
-        from .models import Account
-        
         default_accounts = [
             {'name': 'Conta Corrente', 'account_type': 'checking'},
             {'name': 'Poupança', 'account_type': 'savings'},
             {'name': 'Carteira', 'account_type': 'cash'},
         ]
         
-        for acc_data in default_accounts:
-            Account.objects.create(user=instance, **acc_data)
+        with use_user_shard(instance.pk):
+            for acc_data in default_accounts:
+                Account.objects.create(user=instance, **acc_data)
+
+
+@receiver(post_save, sender=Account)
+def record_opening_balance(sender, instance, created, **kwargs):
+    """Registra o saldo inicial da conta nova no razão usado na reconciliação."""
+    if created:
+        opening = BalanceAdjustment.objects.create(
+            account=instance, kind='opening',
+            date=timezone.localdate(instance.created_at), amount=instance.balance
+        )
+        snapshots.apply_delta(instance.pk, opening.date, opening.amount)
 
 
 @receiver(post_save, sender=Transaction)
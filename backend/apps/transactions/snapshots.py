@@ -0,0 +1,224 @@
+"""
+Movimentação diária e mensal de saldo por conta.
+
+`BalanceSnapshot` guarda a movimentação de cada dia com atividade e
+`BalanceCheckpoint` a de cada mês. Uma escrita soma a variação em uma linha
+de cada (custo constante, qualquer que seja a data); os saldos são
+derivados na leitura: o saldo em uma data é a soma dos meses anteriores
+mais a dos dias do próprio mês até ela. Uma série lê um mês por ponto e
+dias só onde os pontos caem dentro de um mês, então o custo acompanha o
+número de pontos e não o tamanho do histórico.
+
+O saldo inicial e os ajustes manuais (`BalanceAdjustment`) entram como
+movimentação da sua data. Anos já arquivados entram, na reconstrução, como
+movimentação de dezembro do ano arquivado. Contas sem saldo inicial no
+razão não têm snapshots: suas séries começariam de zero, e só passam a
+tê-los depois de `reconcile_balances --adopt`.
+"""
+from calendar import monthrange
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError
+from django.db.models import F, Q, Sum
+
+from apps.core.db_routers import atomic
+
+from .models import Account, BalanceAdjustment, BalanceCheckpoint, BalanceSnapshot, Transaction, TransactionArchive
+from .reconciliation import opening_exists, signed_amount
+from .timeseries import month_start
+
+ZERO = Decimal('0.00')
+GRANULARITIES = ('day', 'week', 'month')
+
+
+def account_deltas(transaction):
+    """Retorna os pares (conta, variação) que a transação aplica aos saldos."""
+    if transaction.status != 'completed':
+        return []
+
+    if transaction.transaction_type == 'income':
+        return [(transaction.account_id, transaction.amount)]
+    if transaction.transaction_type == 'expense':
+        return [(transaction.account_id, -transaction.amount)]
+
+    deltas = [(transaction.account_id, -transaction.amount)]
+    if transaction.destination_account_id:
+        deltas.append((transaction.destination_account_id, transaction.amount))
+    return deltas
+
+
+def has_history(account_id):
+    """Indica se a conta tem snapshots confiáveis (saldo inicial registrado)."""
+    return Account.objects.filter(pk=account_id).filter(opening_exists()).exists()
+
+
+def _add(queryset, delta, **lookup):
+    """Soma `delta` em `net_change` da linha de `lookup`, criando-a se preciso."""
+    if queryset.filter(**lookup).update(net_change=F('net_change') + delta):
+        return
+    try:
+        with atomic():
+            queryset.create(net_change=delta, **lookup)
+    except IntegrityError:
+        queryset.filter(**lookup).update(net_change=F('net_change') + delta)
+
+
+def apply_delta(account_id, date, delta):
+    """
+    Soma uma variação de saldo ao dia e ao mês da data. Contas sem saldo
+    inicial no razão são ignoradas.
+    """
+    if not delta:
+        return
+
+    with atomic():
+        # Serializa escritas concorrentes de snapshots da mesma conta
+        tracked = Account.objects.select_for_update().filter(pk=account_id).values_list(
+            opening_exists(), flat=True
+        ).first()
+        if not tracked:
+            return
+
+        _add(BalanceSnapshot.objects.filter(account_id=account_id), delta, account_id=account_id, date=date)
+        _add(
+            BalanceCheckpoint.objects.filter(account_id=account_id), delta,
+            account_id=account_id, month=month_start(date),
+        )
+
+
+def record_transaction(transaction, sign=1):
+    """Atualiza os snapshots com o efeito da transação (`sign=-1` reverte)."""
+    for account_id, delta in account_deltas(transaction):
+        apply_delta(account_id, transaction.date, delta * sign)
+
+
+def rebuild_snapshots(account_ids):
+    """
+    Recria do zero os snapshots das contas a partir do histórico e do saldo
+    inicial e ajustes. Contas sem saldo inicial no razão ficam sem snapshots.
+
+    Cada ano arquivado entra como movimentação de dezembro do ano.
+    """
+    tracked = list(Account.objects.filter(pk__in=account_ids).filter(opening_exists()).values_list('pk', flat=True))
+    completed = Transaction.objects.filter(status='completed')
+    daily = {}
+
+    outflows = completed.filter(account_id__in=tracked).values('account_id', 'date').annotate(
+        total=Sum(signed_amount())
+    ).order_by()
+    inflows = completed.filter(
+        destination_account_id__in=tracked, transaction_type='transfer'
+    ).values('destination_account_id', 'date').annotate(total=Sum('amount')).order_by()
+    adjustments = BalanceAdjustment.objects.filter(account_id__in=tracked).values(
+        'account_id', 'date'
+    ).annotate(total=Sum('amount')).order_by()
+
+    for row in [*outflows, *adjustments]:
+        key = (row['account_id'], row['date'])
+        daily[key] = daily.get(key, ZERO) + row['total']
+    for row in inflows:
+        key = (row['destination_account_id'], row['date'])
+        daily[key] = daily.get(key, ZERO) + row['total']
+
+    monthly = {}
+    for (account_id, day), net_change in daily.items():
+        key = (account_id, month_start(day))
+        monthly[key] = monthly.get(key, ZERO) + net_change
+    user_ids = Account.objects.filter(pk__in=tracked).values_list('user_id', flat=True)
+    tracked_ids = set(tracked)
+    for year, account_totals in TransactionArchive.objects.filter(user_id__in=user_ids).values_list(
+        'year', 'account_totals'
+    ):
+        for account_id, total in account_totals.items():
+            if int(account_id) in tracked_ids:
+                key = (int(account_id), date(year, 12, 1))
+                monthly[key] = monthly.get(key, ZERO) + Decimal(total)
+
+    with atomic():
+        BalanceSnapshot.objects.filter(account_id__in=account_ids).delete()
+        BalanceCheckpoint.objects.filter(account_id__in=account_ids).delete()
+        BalanceSnapshot.objects.bulk_create([
+            BalanceSnapshot(account_id=account_id, date=day, net_change=net_change)
+            for (account_id, day), net_change in sorted(daily.items())
+        ], batch_size=1000)
+        BalanceCheckpoint.objects.bulk_create([
+            BalanceCheckpoint(account_id=account_id, month=month, net_change=net_change)
+            for (account_id, month), net_change in sorted(monthly.items())
+        ], batch_size=1000)
+    return len(daily)
+
+
+def point_dates(start_date, end_date, granularity='day'):
+    """Gera as datas dos pontos da série (fim de cada período, limitado a `end_date`)."""
+    current = start_date
+    while current <= end_date:
+        if granularity == 'day':
+            point = current
+        elif granularity == 'week':
+            point = current + timedelta(days=6 - current.weekday())
+        else:
+            point = current.replace(day=monthrange(current.year, current.month)[1])
+        point = min(point, end_date)
+        yield point
+        current = point + timedelta(days=1)
+
+
+def balance_at(account_id, date):
+    """Saldo da conta ao fim da data informada."""
+    month = month_start(date)
+    months = BalanceCheckpoint.objects.filter(account_id=account_id, month__lt=month).aggregate(
+        total=Sum('net_change')
+    )['total']
+    days = BalanceSnapshot.objects.filter(account_id=account_id, date__gte=month, date__lte=date).aggregate(
+        total=Sum('net_change')
+    )['total']
+    return (months or ZERO) + (days or ZERO)
+
+
+def _month_end(month):
+    return month.replace(day=monthrange(month.year, month.month)[1])
+
+
+def balance_series(account_id, start_date, end_date, granularity='day'):
+    """
+    Série de saldos da conta entre duas datas.
+
+    Parte do saldo da véspera do intervalo e soma as movimentações até cada
+    ponto: meses inteiros do intervalo pelos checkpoints quando os pontos
+    são mensais, e dias apenas no restante (dias e semanas, ou as pontas
+    parciais de uma série mensal).
+    """
+    balance = balance_at(account_id, start_date - timedelta(days=1))
+
+    whole_months = []
+    if granularity == 'month':
+        month = month_start(start_date, 0 if start_date.day == 1 else 1)
+        while _month_end(month) <= end_date:
+            whole_months.append(month)
+            month = month_start(month, 1)
+
+    changes = []
+    if whole_months:
+        first, last = whole_months[0], _month_end(whole_months[-1])
+        changes.extend(
+            (_month_end(month), net_change)
+            for month, net_change in BalanceCheckpoint.objects.filter(
+                account_id=account_id, month__gte=first, month__lte=whole_months[-1]
+            ).values_list('month', 'net_change')
+        )
+        days = Q(date__gte=start_date, date__lt=first) | Q(date__gt=last, date__lte=end_date)
+    else:
+        days = Q(date__gte=start_date, date__lte=end_date)
+    changes.extend(BalanceSnapshot.objects.filter(days, account_id=account_id).values_list('date', 'net_change'))
+    changes.sort()
+
+    pending = iter(changes)
+    change = next(pending, None)
+    series = []
+    for point in point_dates(start_date, end_date, granularity):
+        while change is not None and change[0] <= point:
+            balance += change[1]
+            change = next(pending, None)
+        series.append({'date': point, 'balance': balance})
+    return series
@@ -0,0 +1,116 @@
+"""
+Transações divididas entre categorias.
+
+Uma compra que cobre várias categorias continua sendo uma única transação,
+com itens (`TransactionSplit`) cuja soma é o valor da transação. Só as
+transações divididas têm itens, então as demais não ocupam nada a mais.
+
+Os relatórios por categoria agregam sobre uma visão unificada de itens: um
+LEFT JOIN com os itens e `Coalesce(item, transação)` produz uma linha por
+item nas transações divididas e a própria transação nas demais, na mesma
+query que já agrupava por categoria.
+"""
+from decimal import Decimal
+
+from django.db.models.functions import Coalesce
+
+from . import fx
+from .models import TransactionSplit
+
+ZERO = Decimal('0.00')
+
+# Limite de itens por transação
+MAX_SPLITS = 50
+
+
+def line_items(queryset, *category_fields):
+    """
+    Anota `line_category_id` e `line_amount` em cada item e, para cada campo
+    pedido da categoria (ex.: 'name'), `line_category_<campo>`.
+
+    Transações divididas aparecem uma vez por item: contagens de transações
+    devem usar `Count('id', distinct=True)`.
+    """
+    return queryset.annotate(
+        line_category_id=Coalesce('splits__category_id', 'category_id'),
+        line_amount=Coalesce('splits__amount', 'amount'),
+        **{
+            f'line_category_{field}': Coalesce(f'splits__category__{field}', f'category__{field}')
+            for field in category_fields
+        },
+    )
+
+
+def line_amount(currency):
+    """Valor do item convertido para `currency` (requer `line_items`)."""
+    return fx.converted_amount('line_amount', 'account__currency', 'date', currency)
+
+
+def validate_splits(items, amount, transaction_type, user):
+    """
+    Valida os itens (dicts com category e amount) de uma transação. Retorna
+    a mensagem de erro ou None.
+    """
+    if not items:
+        return None
+    if transaction_type == 'transfer':
+        return 'Transferências não podem ser divididas.'
+    if len(items) < 2:
+        return 'Uma transação dividida deve ter ao menos dois itens.'
+    if len(items) > MAX_SPLITS:
+        return f'Máximo de {MAX_SPLITS} itens por transação.'
+    for item in items:
+        category = item['category']
+        if category.user_id != user.id:
+            return 'Categoria inválida.'
+        if transaction_type and category.category_type not in ['both', transaction_type]:
+            return f'Categoria {category.name} incompatível com o tipo de transação.'
+    total = sum((item['amount'] for item in items), ZERO)
+    if total != amount:
+        return f'A soma dos itens ({total}) deve ser igual ao valor da transação ({amount}).'
+    return None
+
+
+def save_splits(transaction, items, replace=True):
+    """Grava os itens da transação; com `replace`, remove antes os anteriores."""
+    if replace:
+        TransactionSplit.objects.filter(transaction=transaction).delete()
+    if items:
+        TransactionSplit.objects.bulk_create([
+            TransactionSplit(
+                transaction=transaction,
+                category=item['category'],
+                amount=item['amount'],
+                note=item.get('note', ''),
+            )
+            for item in items
+        ])
+    transaction._split_lines = [(item['category'].pk, item['amount']) for item in items]
+
+
+def split_lines(transaction):
+    """(categoria, valor) de cada item da transação, ou da própria transação se não for dividida."""
+    if not hasattr(transaction, '_split_lines'):
+        transaction._split_lines = [
+            (split.category_id, split.amount) for split in transaction.splits.all()
+        ] if transaction.pk else []
+    return transaction._split_lines or [(transaction.category_id, transaction.amount)]
+
+
+def archived_splits(transaction_ids):
+    """{id da transação: [[categoria, valor, observação], ...]} para o arquivamento."""
+    rows = {}
+    for transaction_id, category_id, amount, note in TransactionSplit.objects.filter(
+        transaction_id__in=transaction_ids
+    ).order_by('pk').values_list('transaction_id', 'category_id', 'amount', 'note'):
+        rows.setdefault(transaction_id, []).append([category_id, str(amount), note])
+    return rows
+
+
+def restore_splits(pairs):
+    """Recria os itens arquivados de (id da transação, [[categoria, valor, observação], ...])."""
+    TransactionSplit.objects.bulk_create([
+        TransactionSplit(transaction_id=transaction_id, category_id=category_id, amount=Decimal(amount), note=note)
+        for transaction_id, items in pairs
+        for category_id, amount, note in items
+    ], batch_size=1000)
@@ -0,0 +1,133 @@
+"""
+Tags normalizadas das transações.
+
+`Transaction.tags` continua sendo a lista enviada pela API; cada escrita
+sincroniza a lista com as tabelas `tags` e `transaction_tags`, usadas pelos
+filtros e pelas agregações por tag.
+"""
+from django.db.models import Count, Exists, OuterRef, Sum
+
+from .models import Tag, Transaction, TransactionTag
+from .text import words
+
+MAX_TAG_LENGTH = 50
+# Limite de tags por transação
+MAX_TAGS = 20
+
+
+def normalize_tag(name):
+    return '-'.join(words(name))[:MAX_TAG_LENGTH]
+
+
+def unique_tags(names):
+    """{slug: nome} das tags válidas, na ordem em que aparecem."""
+    result = {}
+    for name in names or []:
+        if not isinstance(name, str):
+            continue
+        slug = normalize_tag(name)
+        if slug and slug not in result:
+            result[slug] = name.strip()[:MAX_TAG_LENGTH]
+    return result
+
+
+def resolve_tags(user_id, names_by_slug):
+    """Retorna {slug: Tag} do usuário, criando as que não existirem."""
+    tags = {tag.slug: tag for tag in Tag.objects.filter(user_id=user_id, slug__in=list(names_by_slug))}
+    missing = [
+        Tag(user_id=user_id, slug=slug, name=name)
+        for slug, name in names_by_slug.items() if slug not in tags
+    ]
+    if missing:
+        Tag.objects.bulk_create(missing, ignore_conflicts=True)
+        tags.update({
+            tag.slug: tag
+            for tag in Tag.objects.filter(user_id=user_id, slug__in=[tag.slug for tag in missing])
+        })
+    return tags
+
+
+def sync_transaction_tags(transaction):
+    """Ajusta as associações da transação à sua lista de tags."""
+    wanted = unique_tags(transaction.tags)
+    current = dict(
+        TransactionTag.objects.filter(transaction=transaction).values_list('tag__slug', 'pk')
+    )
+    removed = [pk for slug, pk in current.items() if slug not in wanted]
+    if removed:
+        TransactionTag.objects.filter(pk__in=removed).delete()
+
+    added = {slug: name for slug, name in wanted.items() if slug not in current}
+    if added:
+        tags = resolve_tags(transaction.user_id, added)
+        TransactionTag.objects.bulk_create(
+            [TransactionTag(transaction=transaction, tag=tags[slug]) for slug in added],
+            ignore_conflicts=True,
+        )
+
+
+def link_rows(rows):
+    """
+    Cria as associações de transações já gravadas a partir de linhas
+    (id, user_id, tags). Retorna o número de associações enviadas ao banco.
+    """
+    rows = [(pk, user_id, unique_tags(names)) for pk, user_id, names in rows]
+    names_by_user = {}
+    for _, user_id, names in rows:
+        names_by_user.setdefault(user_id, {}).update(names)
+    tags_by_user = {
+        user_id: resolve_tags(user_id, names) for user_id, names in names_by_user.items() if names
+    }
+
+    links = [
+        TransactionTag(transaction_id=pk, tag=tags_by_user[user_id][slug])
+        for pk, user_id, names in rows
+        for slug in names
+    ]
+    TransactionTag.objects.bulk_create(links, batch_size=1000, ignore_conflicts=True)
+    return len(links)
+
+
+def migrate_tags(batch_size=2000, user_ids=None):
+    """
+    Cria as associações a partir de `Transaction.tags` para todas as
+    transações com tags, em lotes por id. Pode ser executada novamente:
+    associações existentes são ignoradas.
+    """
+    queryset = Transaction.objects.exclude(tags=[]).order_by('pk')
+    if user_ids:
+        queryset = queryset.filter(user_id__in=user_ids)
+
+    created, last_pk = 0, 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk).values_list('pk', 'user_id', 'tags')[:batch_size])
+        if not batch:
+            break
+        last_pk = batch[-1][0]
+        created += link_rows(batch)
+    return created
+
+
+def filter_any(queryset, slugs):
+    """Transações com ao menos uma das tags."""
+    return queryset.filter(Exists(
+        TransactionTag.objects.filter(transaction=OuterRef('pk'), tag__slug__in=slugs)
+    ))
+
+
+def filter_all(queryset, slugs):
+    """Transações com todas as tags."""
+    for slug in slugs:
+        queryset = queryset.filter(Exists(
+            TransactionTag.objects.filter(transaction=OuterRef('pk'), tag__slug=slug)
+        ))
+    return queryset
+
+
+def tag_breakdown(queryset, amount):
+    """Total e quantidade de transações por tag, em uma única consulta agrupada."""
+    return queryset.filter(tag_links__isnull=False).values(
+        'tag_links__tag__name', 'tag_links__tag__slug'
+    ).annotate(
+        total=Sum(amount), count=Count('id')
+    ).order_by('-total', 'tag_links__tag__slug')
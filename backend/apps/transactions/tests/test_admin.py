@@ -0,0 +1,24 @@
+from unittest import skipUnless
+
+from django.contrib.admin.sites import site
+from django.db import connection
+from django.test import RequestFactory
+
+from apps.accounts.models import User
+from apps.core.testing import UserDataTestCase
+from apps.transactions.models import Transaction
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Plano de execução do PostgreSQL')
+class AdminTitleSearchTests(UserDataTestCase):
+    def test_title_prefix_search_uses_index(self):
+        admin = site._registry[Transaction]
+        request = RequestFactory().get('/')
+        request.user = User.objects.create_superuser(username='adm', email='adm@example.com', password='pw12345!')
+        queryset, _ = admin.get_search_results(request, Transaction.objects.all(), 'merc')
+
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = queryset.explain()
+
+        self.assertIn('transactions_title_prefix_idx', plan)
@@ -0,0 +1,78 @@
+from datetime import date
+from decimal import Decimal
+
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.analytics.models import AnomalyDetection
+from apps.core.testing import FreshThrottleMixin, UserDataTestCase
+from apps.transactions import budgets
+from apps.transactions.models import Account, BudgetUsage, CategoryBudget, ExchangeRate, Transaction
+
+MARCH = date(2026, 3, 1)
+
+
+class BudgetCounterTests(FreshThrottleMixin, UserDataTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='bud', email='bud@example.com', password='pw12345!')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.account = self.user.accounts.get(name='Conta Corrente')
+        self.food = self.user.categories.get(name='Alimentação')
+        self.home = self.user.categories.get(name='Moradia')
+
+    def expense(self, amount, account=None, **extra):
+        response = self.client.post('/api/transactions/transactions/', {
+            'title': 'Compra', 'amount': amount, 'transaction_type': 'expense',
+            'category': self.food.pk, 'account': (account or self.account).pk,
+            'date': '2026-03-10', 'allow_duplicate': True, **extra,
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return Transaction.objects.filter(user=self.user).latest('pk').pk
+
+    def counters(self):
+        return dict(BudgetUsage.objects.filter(user=self.user, month=MARCH).values_list('category_id', 'spent'))
+
+    def assert_matches_rebuild(self):
+        incremental = self.counters()
+        budgets.rebuild_usage(self.user)
+        self.assertEqual(self.counters(), incremental)
+
+    def test_writes_keep_counters_in_step_with_rebuild(self):
+        first = self.expense('100.00')
+        self.expense('60.00', splits=[
+            {'category': self.food.pk, 'amount': '20.00'},
+            {'category': self.home.pk, 'amount': '40.00'},
+        ])
+        self.client.patch(f'/api/transactions/transactions/{first}/', {'amount': '80.00'}, format='json')
+
+        self.assertEqual(self.counters(), {
+            None: Decimal('140.00'), self.food.pk: Decimal('100.00'), self.home.pk: Decimal('40.00'),
+        })
+        self.assert_matches_rebuild()
+
+        self.client.delete(f'/api/transactions/transactions/{first}/')
+        self.assertEqual(self.counters()[self.food.pk], Decimal('20.00'))
+        self.assert_matches_rebuild()
+
+    def test_expense_without_rate_is_left_out_of_both_paths(self):
+        dollars = Account.objects.create(user=self.user, name='USD', account_type='checking', currency='USD')
+        self.expense('30.00')
+        self.expense('10.00', account=dollars)
+
+        self.assertEqual(self.counters()[None], Decimal('30.00'))
+        self.assert_matches_rebuild()
+
+        ExchangeRate.objects.create(currency='USD', date=MARCH, rate=Decimal('5.00000000'))
+        budgets.rebuild_usage(self.user)
+        self.assertEqual(self.counters()[None], Decimal('80.00'))
+
+    def test_crossing_the_limit_alerts_once(self):
+        CategoryBudget.objects.create(user=self.user, category=self.food, monthly_limit=Decimal('100.00'))
+
+        self.expense('60.00')
+        self.expense('50.00')
+        self.expense('10.00')
+
+        self.assertEqual(AnomalyDetection.objects.filter(user=self.user, anomaly_type='budget_exceeded').count(), 1)
+        self.assertTrue(BudgetUsage.objects.get(user=self.user, category=self.food, month=MARCH).alerted)
@@ -0,0 +1,119 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.core.testing import FreshThrottleMixin, UserDataTestCase
+from apps.transactions import categorizer
+from apps.transactions.models import Category, CategoryTokenCount
+
+URL = '/api/transactions/transactions/'
+
+
+class TokenizeTests(SimpleTestCase):
+    def test_tokens_from_title_location_and_amount(self):
+        tokens = categorizer.tokenize('Padaria do João 2026', 'São Paulo', Decimal('12.50'))
+
+        self.assertEqual(tokens, {'w:padaria', 'w:joao', 'l:sao paulo', 'v:3'})
+        self.assertEqual(categorizer.tokenize('a de 10'), set())
+
+    def test_predict_ranks_categories_by_history(self):
+        food = Category(pk=1, name='Alimentação', category_type='expense')
+        home = Category(pk=2, name='Moradia', category_type='expense')
+        salary = Category(pk=3, name='Salário', category_type='income')
+        counts = [
+            (1, '#docs', 3), (1, '#tokens', 6), (1, 'w:padaria', 2), (1, 'w:mercado', 1), (1, 'v:3', 3),
+            (2, '#docs', 1), (2, '#tokens', 2), (2, 'w:aluguel', 1), (2, 'v:10', 1),
+            (3, '#docs', 1), (3, '#tokens', 1), (3, 'w:salario', 1),
+        ]
+        index = categorizer.CompiledIndex('v1', counts, {1: food, 2: home, 3: salary})
+
+        predictions = index.predict({'w:aluguel', 'v:10'}, 'expense')
+        self.assertEqual([category for category, _ in predictions], [home, food])
+        self.assertAlmostEqual(sum(probability for _, probability in predictions), 1)
+        self.assertEqual(index.predict({'w:padaria'}, 'expense', limit=1)[0][0], food)
+        self.assertEqual([category for category, _ in index.predict({'w:padaria'}, 'income')], [salary])
+
+
+class CategorizerTests(FreshThrottleMixin, UserDataTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='cat', email='cat@example.com', password='pw12345!')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.account = self.user.accounts.get(name='Conta Corrente')
+        self.food = self.user.categories.get(name='Alimentação')
+        self.home = self.user.categories.get(name='Moradia')
+
+    def row(self, title, category, amount='20.00', **extra):
+        return {
+            'title': title, 'amount': amount, 'transaction_type': 'expense', 'category': category.pk,
+            'account': self.account.pk, 'date': '2026-03-10', 'allow_duplicate': True, **extra,
+        }
+
+    def counts(self):
+        return set(CategoryTokenCount.objects.filter(user=self.user).values_list('category_id', 'token', 'count'))
+
+    def test_learn_then_unlearn_reverts_counts(self):
+        self.client.post(URL, self.row('Padaria Central', self.food), format='json')
+        before = self.counts()
+        self.assertIn((self.food.pk, '#docs', 1), before)
+
+        self.client.post(URL, self.row('Padaria Nova', self.home, location='Centro'), format='json')
+        transaction = self.user.transactions.latest('pk')
+        self.assertIn((self.home.pk, 'l:centro', 1), self.counts())
+
+        self.client.delete(f'{URL}{transaction.pk}/')
+        self.assertEqual(self.counts(), before)
+
+    def test_update_moves_tokens_between_categories(self):
+        self.client.post(URL, self.row('Aluguel março', self.food), format='json')
+        transaction = self.user.transactions.latest('pk')
+
+        self.client.patch(f'{URL}{transaction.pk}/', {'category': self.home.pk}, format='json')
+
+        self.assertFalse(CategoryTokenCount.objects.filter(category=self.food).exists())
+        incremental = self.counts()
+        categorizer.rebuild_index(self.user.pk)
+        self.assertEqual(self.counts(), incremental)
+
+    def test_bulk_import_learns_once_per_batch(self):
+        rows = [self.row(f'Mercado {name}', self.food) for name in ('Extra', 'Dia', 'Pão')]
+
+        with mock.patch.object(categorizer, 'learn_many', wraps=categorizer.learn_many) as learn_many:
+            response = self.client.post(f'{URL}bulk_import/', {'transactions': rows}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        learn_many.assert_called_once()
+        self.assertIn((self.food.pk, 'w:mercado', 3), self.counts())
+
+    def test_suggest_and_categorize_endpoints(self):
+        for title in ('Aluguel apartamento', 'Aluguel março', 'Condomínio'):
+            self.client.post(URL, self.row(title, self.home, amount='1500.00'), format='json')
+        self.client.post(URL, self.row('Padaria', self.food), format='json')
+
+        response = self.client.get(f'{URL}suggest_category/', {'title': 'aluguel', 'amount': '1500'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['suggestions'][0]['category'], self.home.pk)
+        self.assertEqual(self.client.get(f'{URL}suggest_category/').status_code, 400)
+        self.assertEqual(self.client.get(f'{URL}suggest_category/', {'title': 'x', 'amount': 'abc'}).status_code, 400)
+
+        response = self.client.post(f'{URL}categorize/', {'transactions': [
+            {'title': 'Padaria Central', 'amount': '20.00'}, {'title': 'Aluguel', 'amount': '1500.00'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['category'] for result in response.data['results']], [self.food.pk, self.home.pk])
+        self.assertEqual(self.client.post(f'{URL}categorize/', {'transactions': 'x'}, format='json').status_code, 400)
+
+    def test_compiled_index_follows_committed_writes(self):
+        self.client.post(URL, self.row('Padaria', self.food), format='json')
+        self.assertEqual(categorizer.suggest(self.user, 'farmácia', 'expense')[0]['category'], self.food.pk)
+
+        health = self.user.categories.get(name='Saúde')
+        with self.captureOnCommitCallbacks(using=self.user_db, execute=True):
+            self.client.post(URL, self.row('Farmácia', health), format='json')
+
+        self.assertEqual(categorizer.suggest(self.user, 'farmácia', 'expense')[0]['category'], health.pk)
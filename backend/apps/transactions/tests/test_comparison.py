@@ -0,0 +1,105 @@
+from datetime import date
+from decimal import Decimal
+
+from django.test import SimpleTestCase
+from django.utils.dateparse import parse_date
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.core.testing import FreshThrottleMixin, UserDataTestCase
+from apps.transactions import comparison
+from apps.transactions.models import Transaction, TransactionSplit
+
+URL = '/api/transactions/transactions/compare/'
+
+
+class PeriodTests(SimpleTestCase):
+    def test_default_periods_are_whole_months(self):
+        self.assertEqual(comparison.default_periods(date(2026, 3, 31)), [
+            (date(2026, 3, 1), date(2026, 3, 31)),
+            (date(2026, 2, 1), date(2026, 2, 28)),
+            (date(2025, 3, 1), date(2025, 3, 31)),
+        ])
+        self.assertEqual(comparison.default_periods(date(2026, 1, 15))[1:], [
+            (date(2025, 12, 1), date(2025, 12, 31)),
+            (date(2025, 1, 1), date(2025, 1, 31)),
+        ])
+
+    def test_parse_periods(self):
+        self.assertEqual(
+            comparison.parse_periods('2026-03-01:2026-03-31, 2026-02-01:2026-02-28', parse_date),
+            [(date(2026, 3, 1), date(2026, 3, 31)), (date(2026, 2, 1), date(2026, 2, 28))],
+        )
+        for value in ('2026-03-31:2026-03-01', '2026-03-01', 'x:2026-03-01', ','.join(['2026-01-01:2026-01-31'] * 13)):
+            with self.assertRaises(ValueError):
+                comparison.parse_periods(value, parse_date)
+
+
+class CompareTests(FreshThrottleMixin, UserDataTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='cmp', email='cmp@example.com', password='pw12345!')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.account = self.user.accounts.get(name='Conta Corrente')
+        self.food = self.user.categories.get(name='Alimentação')
+        self.home = self.user.categories.get(name='Moradia')
+        self.salary = self.user.categories.filter(category_type='income').first()
+
+    def create(self, day, amount, category=None, transaction_type='expense', **extra):
+        return Transaction.objects.create(
+            user=self.user, title='Lançamento', amount=Decimal(amount), transaction_type=transaction_type,
+            category=category or self.food, account=self.account, date=day, **extra,
+        )
+
+    def compare(self, **params):
+        response = self.client.get(URL, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_period_edges_and_changes(self):
+        self.create(date(2026, 3, 1), '30.00')
+        self.create(date(2026, 3, 31), '70.00', self.home)
+        self.create(date(2026, 3, 15), '900.00', status='pending')
+        self.create(date(2026, 2, 28), '50.00')
+        self.create(date(2026, 3, 10), '2000.00', self.salary, 'income')
+        self.create(date(2025, 3, 31), '80.00', self.home)
+        self.create(date(2025, 4, 1), '500.00')  # fora dos períodos
+
+        data = self.compare(periods='2026-03-01:2026-03-31,2026-02-01:2026-02-28,2025-03-01:2025-03-31')
+
+        expense = data['totals']['expense']
+        self.assertEqual(expense['values'], [Decimal('100.00'), Decimal('50.00'), Decimal('80.00')])
+        self.assertEqual(expense['changes'], [
+            {'delta': Decimal('50.00'), 'percentage': Decimal('100.00')},
+            {'delta': Decimal('20.00'), 'percentage': Decimal('25.00')},
+        ])
+        self.assertEqual(data['totals']['net']['values'], [Decimal('1900.00'), Decimal('-50.00'), Decimal('-80.00')])
+        self.assertEqual(data['totals']['income']['changes'][0]['percentage'], None)
+        self.assertEqual(
+            [(item['category_id'], item['values']) for item in data['categories'] if item['transaction_type'] == 'expense'],
+            [
+                (self.home.pk, [Decimal('70.00'), Decimal('0'), Decimal('80.00')]),
+                (self.food.pk, [Decimal('30.00'), Decimal('50.00'), Decimal('0')]),
+            ],
+        )
+
+    def test_split_items_count_in_their_categories(self):
+        transaction = self.create(date(2026, 3, 5), '100.00')
+        TransactionSplit.objects.bulk_create([
+            TransactionSplit(transaction=transaction, category=self.food, amount=Decimal('40.00')),
+            TransactionSplit(transaction=transaction, category=self.home, amount=Decimal('60.00')),
+        ])
+
+        data = self.compare(periods='2026-03-01:2026-03-31,2026-02-01:2026-02-28', type='expense')
+
+        self.assertEqual(data['totals']['expense']['values'], [Decimal('100.00'), Decimal('0')])
+        self.assertEqual({item['category_id']: item['values'][0] for item in data['categories']},
+                         {self.food.pk: Decimal('40.00'), self.home.pk: Decimal('60.00')})
+
+    def test_default_periods_and_validation(self):
+        data = self.compare()
+        self.assertEqual(len(data['periods']), 3)
+        self.assertEqual(data['periods'][0]['start'].day, 1)
+
+        for params in ({'periods': '2026-03-31:2026-03-01'}, {'type': 'transfer'}):
+            self.assertEqual(self.client.get(URL, params).status_code, 400, params)
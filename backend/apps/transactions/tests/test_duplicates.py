@@ -0,0 +1,69 @@
+from decimal import Decimal
+
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.core.testing import FreshThrottleMixin, UserDataTestCase
+from apps.transactions.models import Transaction
+
+URL = '/api/transactions/transactions/'
+
+
+class DuplicateDetectionTests(FreshThrottleMixin, UserDataTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='dup', email='dup@example.com', password='pw12345!')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.account = self.user.accounts.get(name='Conta Corrente')
+        self.food = self.user.categories.get(name='Alimentação')
+
+    def row(self, title='Mercado Extra', amount='42.90', **extra):
+        return {
+            'title': title, 'amount': amount, 'transaction_type': 'expense',
+            'category': self.food.pk, 'account': self.account.pk, 'date': '2026-03-10', **extra,
+        }
+
+    def test_resubmission_is_refused_until_allowed(self):
+        self.assertEqual(self.client.post(URL, self.row(), format='json').status_code, 201)
+        original = Transaction.objects.get(user=self.user)
+
+        # Mesmo título com outra caixa, acentos e pontuação
+        response = self.client.post(URL, self.row(title='MERCADO  extra!'), format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['duplicate_of'], original.pk)
+
+        self.assertEqual(self.client.post(URL, self.row(amount='42.91'), format='json').status_code, 201)
+        self.assertEqual(self.client.post(URL, self.row(allow_duplicate=True), format='json').status_code, 201)
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 3)
+
+    def test_bulk_import_skips_existing_and_repeated_rows(self):
+        self.client.post(URL, self.row(), format='json')
+        existing = Transaction.objects.get(user=self.user).pk
+
+        response = self.client.post(f'{URL}bulk_import/', {'transactions': [
+            self.row(), self.row(title='Padaria', amount='8.00'), self.row(title='padaria', amount='8.00'),
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['created']), 1)
+        self.assertEqual(response.data['duplicates'], [
+            {'index': 0, 'duplicate_of': existing, 'duplicate_of_index': None},
+            {'index': 2, 'duplicate_of': None, 'duplicate_of_index': 1},
+        ])
+
+    def test_merge_keeps_oldest_and_reverts_balances(self):
+        balance = self.account.balance
+        for _ in range(3):
+            self.client.post(URL, self.row(allow_duplicate=True), format='json')
+
+        groups = self.client.get(f'{URL}duplicates/').data
+        self.assertEqual([group['count'] for group in groups], [3])
+
+        response = self.client.post(f'{URL}merge_duplicates/', {'fingerprint': groups[0]['fingerprint']}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['removed']), 2)
+        self.assertEqual(list(Transaction.objects.filter(user=self.user).values_list('pk', flat=True)),
+                         [response.data['kept']['id']])
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, balance - Decimal('42.90'))
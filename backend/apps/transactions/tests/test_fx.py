@@ -0,0 +1,48 @@
+from datetime import date
+from decimal import Decimal
+
+from django.core.cache import cache
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.core.testing import FreshThrottleMixin, UserDataTestCase
+from apps.transactions import fx
+from apps.transactions.models import Account, ExchangeRate, Transaction
+
+
+class RateCacheTests(UserDataTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_rates_are_cached_until_the_loader_bumps_the_version(self):
+        self.assertIsNone(fx.get_rate('USD', date(2026, 3, 1)))
+        ExchangeRate.objects.create(currency='USD', date=date(2026, 1, 1), rate=Decimal('5.00000000'))
+
+        # A ausência de cotação também fica em cache
+        self.assertIsNone(fx.get_rate('USD', date(2026, 3, 1)))
+        fx.clear_cache()
+        self.assertEqual(fx.get_rate('USD', date(2026, 3, 1)), Decimal('5.00000000'))
+
+
+class UnconvertedRowsTests(FreshThrottleMixin, UserDataTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='fx', email='fx@example.com', password='pw12345!')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.dollars = Account.objects.create(user=self.user, name='USD', account_type='checking', currency='USD')
+        category = self.user.categories.get(name='Alimentação')
+        for account, amount in ((self.dollars, '10.00'), (self.user.accounts.get(name='Conta Corrente'), '30.00')):
+            Transaction.objects.create(
+                user=self.user, title='Compra', amount=Decimal(amount), transaction_type='expense',
+                category=category, account=account, date=date(2026, 3, 10),
+            )
+
+    def test_summary_reports_rows_without_rate(self):
+        url = '/api/transactions/transactions/summary/?start_date=2026-03-01&end_date=2026-03-31'
+
+        response = self.client.get(url)
+        self.assertEqual((response.data['total_expense'], response.data['unconverted_count']), ('30.00', 1))
+
+        ExchangeRate.objects.create(currency='USD', date=date(2026, 3, 1), rate=Decimal('5.00000000'))
+        response = self.client.get(url)
+        self.assertEqual((response.data['total_expense'], response.data['unconverted_count']), ('80.00', 0))
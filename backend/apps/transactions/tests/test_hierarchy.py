@@ -0,0 +1,103 @@
+from datetime import date
+from decimal import Decimal
+
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.core.testing import FreshThrottleMixin, UserDataTestCase
+from apps.transactions import hierarchy
+from apps.transactions.models import Category, CategoryClosure, Transaction
+
+URL = '/api/transactions/categories/'
+
+
+class CategoryHierarchyTests(FreshThrottleMixin, UserDataTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='tree', email='tree@example.com', password='pw12345!')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.house = self.category('Lar')
+        self.bills = self.category('Contas fixas', parent=self.house)
+        self.power = self.category('Energia', parent=self.bills)
+        self.work = self.category('Escritório')
+
+    def category(self, name, parent=None):
+        return Category.objects.create(user=self.user, name=name, category_type='expense', parent=parent)
+
+    def closure(self):
+        return set(
+            CategoryClosure.objects.filter(descendant__user=self.user).values_list('ancestor_id', 'descendant_id', 'depth')
+        )
+
+    def assert_matches_rebuild(self):
+        incremental = self.closure()
+        hierarchy.rebuild_closure([self.user.pk])
+        self.assertEqual(self.closure(), incremental)
+
+    def ancestors(self, category):
+        return dict(CategoryClosure.objects.filter(descendant=category).values_list('ancestor_id', 'depth'))
+
+    def test_move_carries_the_subtree(self):
+        response = self.client.post(f'{URL}{self.bills.pk}/move/', {'parent': self.work.pk}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.ancestors(self.power), {self.power.pk: 0, self.bills.pk: 1, self.work.pk: 2})
+        self.assert_matches_rebuild()
+
+        self.client.post(f'{URL}{self.bills.pk}/move/', {'parent': None}, format='json')
+        self.assertEqual(self.ancestors(self.power), {self.power.pk: 0, self.bills.pk: 1})
+        self.assert_matches_rebuild()
+
+    def test_move_into_own_subtree_is_refused(self):
+        before = self.closure()
+
+        response = self.client.patch(f'{URL}{self.house.pk}/', {'parent': self.power.pk}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.closure(), before)
+
+    def test_delete_lifts_children_one_level(self):
+        self.client.delete(f'{URL}{self.bills.pk}/')
+
+        self.power.refresh_from_db()
+        self.assertEqual(self.power.parent_id, self.house.pk)
+        self.assertEqual(self.ancestors(self.power), {self.power.pk: 0, self.house.pk: 1})
+        self.assert_matches_rebuild()
+
+    def test_category_filter_follows_moves(self):
+        Transaction.objects.create(
+            user=self.user, title='Conta de luz', amount=Decimal('120.00'), transaction_type='expense',
+            category=self.power, account=self.user.accounts.get(name='Conta Corrente'), date=date(2026, 3, 1),
+        )
+
+        def count(category):
+            return self.client.get(f'/api/transactions/transactions/?category={category.pk}').data['count']
+
+        self.assertEqual((count(self.house), count(self.work)), (1, 0))
+        self.client.post(f'{URL}{self.bills.pk}/move/', {'parent': self.work.pk}, format='json')
+        self.assertEqual((count(self.house), count(self.work)), (0, 1))
+
+    def test_rollup_sums_each_subtree_under_parent(self):
+        account = self.user.accounts.get(name='Conta Corrente')
+        for category, amount in ((self.power, '120.00'), (self.bills, '30.00'), (self.house, '10.00')):
+            Transaction.objects.create(
+                user=self.user, title='Conta', amount=Decimal(amount), transaction_type='expense',
+                category=category, account=account, date=date(2026, 3, 1),
+            )
+        url = '/api/transactions/transactions/by_category/?start_date=2026-03-01&end_date=2026-03-31&rollup=1'
+
+        def totals(response):
+            return {item['category']['id']: Decimal(item['total_amount']) for item in response.data}
+
+        self.assertEqual(totals(self.client.get(url)), {self.house.pk: Decimal('160.00')})
+        self.assertEqual(totals(self.client.get(f'{url}&parent={self.house.pk}')), {self.bills.pk: Decimal('150.00')})
+
+    def test_rollup_parent_must_be_an_own_category(self):
+        url = '/api/transactions/transactions/by_category/?rollup=1&parent='
+        other = User.objects.create_user(username='tree2', email='tree2@example.com', password='pw12345!')
+
+        for parent in ('abc', '-1', other.categories.first().pk):
+            response = self.client.get(f'{url}{parent}')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data['error'], 'Categoria pai não encontrada')
+        self.assertEqual(self.client.post(f'{URL}{self.bills.pk}/move/', {'parent': 'abc'}, format='json').status_code, 400)
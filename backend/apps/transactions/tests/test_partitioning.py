@@ -0,0 +1,132 @@
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.core.management import call_command
+from django.db import IntegrityError, connection, connections
+from django.db.transaction import atomic
+
+from apps.accounts.models import User
+from apps.core.testing import UserDataTestCase
+from apps.transactions import archive, partitioning
+from apps.transactions.models import Transaction, TransactionArchive, TransactionSplit
+
+
+class TransactionDataMixin:
+    def setUp(self):
+        self.user = User.objects.create_user(username='part', email='part@example.com', password='pw12345!')
+        self.account = self.user.accounts.get(name='Conta Corrente')
+        self.food = self.user.categories.get(name='Alimentação')
+        self.home = self.user.categories.get(name='Moradia')
+
+    def expense(self, day, amount='10.00'):
+        return Transaction.objects.create(
+            user=self.user, title=f'Compra {day}', amount=Decimal(amount), transaction_type='expense',
+            category=self.food, account=self.account, date=day,
+        )
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Particionamento exige PostgreSQL')
+class PartitionPruningTests(TransactionDataMixin, UserDataTestCase):
+    def setUp(self):
+        super().setUp()
+        for year in (2024, 2025, 2026):
+            self.expense(date(year, 6, 1))
+
+    def period(self, start, end):
+        return Transaction.objects.filter(user=self.user, date__gte=start, date__lte=end, status='completed')
+
+    def test_period_queries_read_only_their_partitions(self):
+        partitioning.convert_to_partitioned(extra_years=0, using=self.user_db)
+
+        self.assertEqual(
+            partitioning.scanned_partitions(self.period(date(2025, 3, 1), date(2025, 3, 31))),
+            ['transactions_2025'],
+        )
+        self.assertEqual(
+            partitioning.scanned_partitions(self.period(date(2025, 12, 1), date(2026, 1, 31))),
+            ['transactions_2025', 'transactions_2026'],
+        )
+        self.assertEqual(self.period(date(2024, 1, 1), date(2026, 12, 31)).count(), 3)
+
+    def test_convert_reports_replaced_foreign_keys(self):
+        output = StringIO()
+
+        call_command(
+            'transaction_partitions', '--database', self.user_db, 'convert', '--extra-years', '0', stdout=output
+        )
+
+        self.assertIn(TransactionSplit._meta.db_table, output.getvalue())
+        self.assertIn('constraint triggers', output.getvalue())
+
+    def test_migration_step_converts_once(self):
+        for _ in range(2):
+            with connections[self.user_db].schema_editor() as schema_editor:
+                partitioning.partition_transactions(None, schema_editor)
+
+        self.assertTrue(partitioning.is_partitioned(self.user_db))
+        self.assertEqual(self.period(date(2024, 1, 1), date(2026, 12, 31)).count(), 3)
+
+    def test_model_indexes_are_rebuilt(self):
+        partitioning.convert_to_partitioned(extra_years=0, using=self.user_db)
+
+        connection = connections[self.user_db]
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, Transaction._meta.db_table)
+        for index in Transaction._meta.indexes:
+            self.assertIn(index.name, constraints)
+        self.assertIn('transactions_category_id_idx', constraints)
+
+    def test_references_to_transactions_stay_enforced(self):
+        transaction = Transaction.objects.get(user=self.user, date=date(2025, 6, 1))
+        TransactionSplit.objects.create(transaction=transaction, category=self.food, amount=Decimal('10.00'))
+        partitioning.convert_to_partitioned(extra_years=0, using=self.user_db)
+
+        with connections[self.user_db].cursor() as cursor:
+            # As triggers são adiadas até o commit, que não acontece dentro do teste
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+            with self.assertRaises(IntegrityError), atomic(using=self.user_db):
+                TransactionSplit.objects.create(transaction_id=10 ** 9, category=self.food, amount=Decimal('1.00'))
+            with self.assertRaises(IntegrityError), atomic(using=self.user_db):
+                cursor.execute('DELETE FROM transactions WHERE id = %s', [transaction.pk])
+
+            # Mudança de data move a linha de partição sem perder as referências
+            Transaction.objects.filter(pk=transaction.pk).update(date=date(2026, 2, 1))
+            transaction.delete()
+        self.assertFalse(TransactionSplit.objects.filter(transaction_id=transaction.pk).exists())
+
+    def test_only_empty_partitions_are_dropped(self):
+        partitioning.convert_to_partitioned(extra_years=0, using=self.user_db)
+
+        with self.assertRaises(partitioning.PartitioningError):
+            partitioning.detach_partition(2024, drop=True, using=self.user_db)
+        Transaction.objects.filter(user=self.user, date__year=2024).delete()
+        partitioning.detach_partition(2024, drop=True, using=self.user_db)
+        self.assertNotIn('transactions_2024', dict(partitioning.list_partitions(self.user_db)))
+
+
+class ArchiveStreamingTests(TransactionDataMixin, UserDataTestCase):
+    def test_archive_in_chunks_round_trips(self):
+        split = self.expense(date(2024, 2, 1), '30.00')
+        TransactionSplit.objects.create(transaction=split, category=self.food, amount=Decimal('10.00'))
+        TransactionSplit.objects.create(transaction=split, category=self.home, amount=Decimal('20.00'))
+        for month in range(3, 8):
+            self.expense(date(2024, month, 1))
+
+        with mock.patch.object(archive, 'CHUNK_SIZE', 2):
+            self.assertEqual(archive.archive_user_year(self.user.pk, 2024), 6)
+
+        stored = TransactionArchive.objects.get(user=self.user, year=2024)
+        self.assertEqual(stored.transaction_count, 6)
+        self.assertEqual(
+            {account: Decimal(total) for account, total in stored.account_totals.items()},
+            {str(self.account.pk): Decimal('-80.00')},
+        )
+        self.assertFalse(Transaction.objects.filter(user=self.user).exists())
+
+        self.assertEqual(archive.restore_user_year(self.user.pk, 2024), 6)
+        self.assertEqual(
+            sorted(TransactionSplit.objects.filter(transaction_id=split.pk).values_list('amount', flat=True)),
+            [Decimal('10.00'), Decimal('20.00')],
+        )
@@ -0,0 +1,48 @@
+from datetime import date
+from decimal import Decimal
+
+from django.test import SimpleTestCase
+
+from apps.transactions import projection
+from apps.transactions.models import RecurringTransaction
+
+
+def template(account_id, amount, first, transaction_type='expense', frequency='monthly'):
+    return RecurringTransaction(
+        account_id=account_id, amount=Decimal(amount), transaction_type=transaction_type,
+        frequency=frequency, start_date=first, next_execution=first,
+    )
+
+
+class ProjectionTests(SimpleTestCase):
+    def test_every_account_has_a_point_per_bucket(self):
+        templates = [
+            template(1, '100.00', date(2026, 1, 10)),
+            # Primeira ocorrência só no terceiro mês do horizonte
+            template(2, '500.00', date(2026, 3, 5), transaction_type='income'),
+        ]
+
+        result = projection.project(templates, {1: Decimal('1000.00')}, date(2026, 1, 1), date(2026, 3, 31))
+
+        for account_id in (1, 2):
+            self.assertEqual(
+                [point['start'] for point in result[account_id]['series']],
+                [date(2026, 1, 1), date(2026, 2, 1), date(2026, 3, 1)],
+            )
+        self.assertEqual(
+            [point['balance'] for point in result[2]['series']],
+            [Decimal('0'), Decimal('0'), Decimal('500.00')],
+        )
+        self.assertEqual(result[2]['lowest'], {'balance': Decimal('0'), 'date': date(2026, 1, 1)})
+
+    def test_lowest_balance_follows_occurrences(self):
+        templates = [
+            template(1, '300.00', date(2026, 1, 15)),
+            template(1, '250.00', date(2026, 2, 1), transaction_type='income'),
+        ]
+
+        result = projection.project(templates, {1: Decimal('400.00')}, date(2026, 1, 1), date(2026, 2, 28))
+
+        self.assertEqual(result[1]['lowest'], {'balance': Decimal('50.00'), 'date': date(2026, 2, 15)})
+        self.assertEqual(result[1]['series'][-1]['balance'], Decimal('50.00'))
+        self.assertEqual(result[1]['series'][-1]['count'], 2)
@@ -0,0 +1,90 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.core.testing import FreshThrottleMixin, UserDataTestCase
+from apps.transactions.models import Account, BalanceAdjustment, Transaction
+from apps.transactions.reconciliation import find_drift, reconcile_chunk
+
+
+class ReconciliationTests(FreshThrottleMixin, UserDataTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='rec', email='rec@example.com', password='pw12345!')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.category = self.user.categories.get(name='Salário')
+        response = self.client.post('/api/transactions/accounts/', {
+            'name': 'Banco', 'account_type': 'checking', 'balance': '500.00',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.account = Account.objects.get(pk=response.data['id'])
+
+    def income(self, amount, date='2026-01-10'):
+        return Transaction.objects.create(
+            user=self.user, title='Entrada', amount=amount, transaction_type='income',
+            category=self.category, account=self.account, date=date,
+        )
+
+    def test_opening_balance_is_part_of_the_ledger(self):
+        checked, drifts = find_drift([self.user.pk])
+
+        self.assertEqual(checked, 4)
+        self.assertEqual(drifts, [])
+        opening = self.account.adjustments.get()
+        self.assertEqual((opening.kind, opening.amount), ('opening', Decimal('500.00')))
+
+    def test_manual_adjustments_survive_fix(self):
+        response = self.client.post(f'/api/transactions/accounts/{self.account.pk}/adjust_balance/', {'balance': '650.00'})
+        self.assertEqual(response.status_code, 200)
+        response = self.client.patch(f'/api/transactions/accounts/{self.account.pk}/', {'balance': '600.00'})
+        self.assertEqual(response.status_code, 200)
+
+        reconcile_chunk([self.user.pk], fix=True)
+
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('600.00'))
+        self.assertEqual(
+            list(self.account.adjustments.filter(kind='adjustment').values_list('amount', flat=True)),
+            [Decimal('150.00'), Decimal('-50.00')],
+        )
+
+    def test_invalid_adjustment_is_rejected(self):
+        response = self.client.post(f'/api/transactions/accounts/{self.account.pk}/adjust_balance/', {'balance': 'abc'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(self.account.adjustments.filter(kind='adjustment').exists())
+
+    def test_fix_restores_opening_plus_transactions(self):
+        # Criada direto no banco: o saldo em cache não acompanha
+        self.income(Decimal('120.00'))
+
+        checked, drifts, fixed, adopted = reconcile_chunk([self.user.pk], fix=True)
+
+        self.assertEqual((len(drifts), fixed, adopted), (1, 1, 0))
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('620.00'))
+
+    def test_untracked_accounts_are_reported_but_never_fixed(self):
+        BalanceAdjustment.objects.filter(account=self.account).delete()
+        self.income(Decimal('120.00'))
+
+        _, drifts, fixed, _ = reconcile_chunk([self.user.pk], fix=True)
+
+        self.assertEqual([(drift.account_id, drift.tracked) for drift in drifts], [(self.account.pk, False)])
+        self.assertEqual(fixed, 0)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('500.00'))
+
+    def test_adopt_records_current_balance_as_baseline(self):
+        BalanceAdjustment.objects.filter(account__user=self.user).delete()
+        self.income(Decimal('120.00'))
+
+        call_command('reconcile_balances', '--adopt', '--user', str(self.user.pk), stdout=StringIO())
+
+        _, drifts = find_drift([self.user.pk])
+        self.assertEqual(drifts, [])
+        self.assertEqual(self.account.adjustments.get(kind='opening').amount, Decimal('380.00'))
+        self.assertEqual(BalanceAdjustment.objects.filter(account__user=self.user, kind='opening').count(), 4)
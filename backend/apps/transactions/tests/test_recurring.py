@@ -0,0 +1,34 @@
+from datetime import date
+from decimal import Decimal
+
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.core.testing import FreshThrottleMixin, UserDataTestCase
+from apps.transactions import snapshots
+from apps.transactions.models import RecurringTransaction
+from apps.transactions.reconciliation import find_drift
+
+
+class RecurringExecuteTests(FreshThrottleMixin, UserDataTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='rec', email='rec@example.com', password='pw12345!')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.account = self.user.accounts.get(name='Conta Corrente')
+        self.recurring = RecurringTransaction.objects.create(
+            user=self.user, title='Aluguel', amount=Decimal('800.00'), transaction_type='expense',
+            category=self.user.categories.get(name='Moradia'), account=self.account,
+            frequency='monthly', start_date=date(2026, 1, 5), next_execution=date(2026, 1, 5),
+        )
+
+    def test_execute_applies_the_same_effects_as_a_created_transaction(self):
+        response = self.client.post(f'/api/transactions/recurring/{self.recurring.pk}/execute/')
+
+        self.assertEqual(response.status_code, 200)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('-800.00'))
+        self.assertEqual(snapshots.balance_at(self.account.pk, date.today()), Decimal('-800.00'))
+        self.assertEqual(find_drift([self.user.pk])[1], [])
+        self.recurring.refresh_from_db()
+        self.assertEqual(self.recurring.next_execution, date(2026, 2, 5))
@@ -0,0 +1,107 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.core.testing import FreshThrottleMixin, UserDataTestCase
+from apps.transactions import snapshots
+from apps.transactions.models import Account, BalanceAdjustment, BalanceCheckpoint, BalanceSnapshot
+from apps.transactions.reconciliation import reconcile_chunk
+
+
+class BalanceSnapshotTests(FreshThrottleMixin, UserDataTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='snap', email='snap@example.com', password='pw12345!')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.today = date.today()
+        response = self.client.post('/api/transactions/accounts/', {
+            'name': 'Banco', 'account_type': 'checking', 'balance': '500.00',
+        }, format='json')
+        self.account = Account.objects.get(pk=response.data['id'])
+
+    def create_expense(self, amount, when):
+        response = self.client.post('/api/transactions/transactions/', {
+            'title': 'Mercado', 'amount': amount, 'transaction_type': 'expense',
+            'category': self.user.categories.get(name='Alimentação').pk,
+            'account': self.account.pk, 'date': when.isoformat(),
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+
+    def series(self, start, end):
+        return [point['balance'] for point in snapshots.balance_series(self.account.pk, start, end)]
+
+    def test_series_starts_from_opening_balance(self):
+        self.create_expense('40.00', self.today)
+        self.client.post(f'/api/transactions/accounts/{self.account.pk}/adjust_balance/', {'balance': '400.00'})
+
+        before_opening = self.today - timedelta(days=2)
+        tomorrow = self.today + timedelta(days=1)
+        self.assertEqual(self.series(before_opening, before_opening), [Decimal('0.00')])
+        self.assertEqual(self.series(tomorrow, tomorrow), [Decimal('400.00')])
+
+    def stored(self):
+        return (
+            list(BalanceSnapshot.objects.filter(account=self.account).values_list('date', 'net_change')),
+            list(BalanceCheckpoint.objects.filter(account=self.account).values_list('month', 'net_change')),
+        )
+
+    def test_rebuild_matches_incremental_snapshots(self):
+        self.create_expense('40.00', self.today)
+        self.create_expense('10.00', self.today - timedelta(days=3))
+        self.create_expense('25.00', self.today - timedelta(days=70))
+        before = self.stored()
+
+        snapshots.rebuild_snapshots([self.account.pk])
+
+        self.assertEqual(self.stored(), before)
+        self.assertEqual(snapshots.balance_at(self.account.pk, self.today), Decimal('425.00'))
+
+    def test_back_dated_write_cost_does_not_grow_with_history(self):
+        for days in range(0, 400, 5):
+            snapshots.apply_delta(self.account.pk, self.today - timedelta(days=days), Decimal('-1.00'))
+
+        with CaptureQueriesContext(connections[self.user_db]) as recent:
+            snapshots.apply_delta(self.account.pk, self.today, Decimal('-1.00'))
+        with CaptureQueriesContext(connections[self.user_db]) as old:
+            snapshots.apply_delta(self.account.pk, self.today - timedelta(days=395), Decimal('-1.00'))
+
+        self.assertEqual(len(old), len(recent))
+        updated = [query['sql'] for query in old.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updated), 2)
+        self.assertTrue(all('"date" = ' in sql or '"month" = ' in sql for sql in updated))
+        self.assertEqual(snapshots.balance_at(self.account.pk, self.today), Decimal('418.00'))
+
+    def test_monthly_series_reads_one_row_per_month(self):
+        start = date(2025, 1, 1)
+        for days in range(0, 365, 3):
+            snapshots.apply_delta(self.account.pk, start + timedelta(days=days), Decimal('-1.00'))
+        daily = {
+            point['date']: point['balance']
+            for point in snapshots.balance_series(self.account.pk, date(2025, 1, 10), date(2025, 12, 20))
+        }
+
+        # Véspera (meses + dias), checkpoints dos meses inteiros e dias das pontas parciais
+        with self.assertNumQueries(4, using=self.user_db):
+            monthly = snapshots.balance_series(self.account.pk, date(2025, 1, 10), date(2025, 12, 20), 'month')
+
+        self.assertEqual(len(monthly), 12)
+        self.assertEqual([point['balance'] for point in monthly], [daily[point['date']] for point in monthly])
+
+    def test_untracked_accounts_have_no_history_until_adopted(self):
+        BalanceAdjustment.objects.filter(account=self.account).delete()
+        snapshots.rebuild_snapshots([self.account.pk])
+        url = f'/api/transactions/accounts/{self.account.pk}/balance_history/'
+
+        self.assertEqual(self.client.get(url).status_code, 409)
+        self.create_expense('40.00', self.today)
+        self.assertFalse(BalanceSnapshot.objects.filter(account=self.account).exists())
+
+        reconcile_chunk([self.user.pk], adopt=True)
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['points'][-1]['balance'], Decimal('460.00'))
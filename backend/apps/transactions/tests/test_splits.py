@@ -0,0 +1,80 @@
+from decimal import Decimal
+
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.core.testing import FreshThrottleMixin, UserDataTestCase
+from apps.transactions.models import Transaction, TransactionSplit
+
+URL = '/api/transactions/transactions/'
+
+
+class SplitTransactionTests(FreshThrottleMixin, UserDataTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='split', email='split@example.com', password='pw12345!')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.account = self.user.accounts.get(name='Conta Corrente')
+        self.food = self.user.categories.get(name='Alimentação')
+        self.home = self.user.categories.get(name='Moradia')
+
+    def post(self, amount='100.00', splits=None, **extra):
+        return self.client.post(URL, {
+            'title': 'Supermercado', 'amount': amount, 'transaction_type': 'expense',
+            'category': self.food.pk, 'account': self.account.pk, 'date': '2026-03-10',
+            'allow_duplicate': True, 'splits': splits or [], **extra,
+        }, format='json')
+
+    def items(self, food, home):
+        return [{'category': self.food.pk, 'amount': food}, {'category': self.home.pk, 'amount': home}]
+
+    def test_items_must_add_up_to_the_amount(self):
+        response = self.post(splits=self.items('30.00', '60.00'))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('splits', response.data)
+
+        self.assertEqual(self.post(splits=self.items('30.00', '70.00')[:1]).status_code, 400)
+        self.assertEqual(self.post(splits=self.items('30.00', '70.00')).status_code, 201)
+
+    def test_invalid_categories_are_refused(self):
+        other = User.objects.create_user(username='other', email='other@example.com', password='pw12345!')
+        salary = self.user.categories.filter(category_type='income').first()
+
+        foreign = [{'category': other.categories.get(name='Moradia').pk, 'amount': '70.00'},
+                   {'category': self.food.pk, 'amount': '30.00'}]
+        self.assertEqual(self.post(splits=foreign).status_code, 400)
+        income_item = [{'category': salary.pk, 'amount': '70.00'}, {'category': self.food.pk, 'amount': '30.00'}]
+        self.assertEqual(self.post(splits=income_item).status_code, 400)
+        self.assertFalse(TransactionSplit.objects.exists())
+
+    def test_amount_change_requires_new_items(self):
+        self.post(splits=self.items('30.00', '70.00'))
+        transaction = Transaction.objects.get(user=self.user)
+
+        response = self.client.patch(f'{URL}{transaction.pk}/', {'amount': '120.00'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.patch(
+            f'{URL}{transaction.pk}/', {'amount': '120.00', 'splits': self.items('50.00', '70.00')}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            sorted(transaction.splits.values_list('amount', flat=True)), [Decimal('50.00'), Decimal('70.00')]
+        )
+
+    def test_reports_count_each_item_in_its_category(self):
+        self.post(splits=self.items('30.00', '70.00'))
+        self.post(amount='50.00')
+
+        response = self.client.get(f'{URL}by_category/?start_date=2026-03-01&end_date=2026-03-31')
+
+        totals = {
+            item['category']['id']: (Decimal(item['total_amount']), item['transaction_count'], item['percentage'])
+            for item in response.data
+        }
+        self.assertEqual(totals, {
+            self.food.pk: (Decimal('80.00'), 2, Decimal('53.33')),
+            self.home.pk: (Decimal('70.00'), 1, Decimal('46.67')),
+        })
+        listed = self.client.get(f'{URL}?category={self.home.pk}').data
+        self.assertEqual(listed['count'], 1)
@@ -0,0 +1,90 @@
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.core.testing import FreshThrottleMixin, UserDataTestCase
+from apps.transactions.models import Tag, Transaction, TransactionTag
+
+URL = '/api/transactions/transactions/'
+
+
+class TagTests(FreshThrottleMixin, UserDataTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='tags', email='tags@example.com', password='pw12345!')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.account = self.user.accounts.get(name='Conta Corrente')
+        self.food = self.user.categories.get(name='Alimentação')
+
+    def post(self, title, tags, amount='10.00'):
+        response = self.client.post(URL, {
+            'title': title, 'amount': amount, 'transaction_type': 'expense', 'category': self.food.pk,
+            'account': self.account.pk, 'date': '2026-03-10', 'tags': tags, 'allow_duplicate': True,
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return self.user.transactions.latest('pk')
+
+    def titles(self, query):
+        return sorted(item['title'] for item in self.client.get(f'{URL}?{query}').data['results'])
+
+    def test_any_and_all_filters(self):
+        self.post('Mercado', ['Viagem', 'Férias'])
+        self.post('Hotel', ['viagem'])
+        self.post('Padaria', ['Casa'])
+        self.post('Farmácia', [])
+
+        self.assertEqual(self.titles('tags=viagem,casa'), ['Hotel', 'Mercado', 'Padaria'])
+        self.assertEqual(self.titles('tags__all=VIAGEM,ferias'), ['Mercado'])
+        self.assertEqual(self.titles('tags__all=viagem,casa'), [])
+        # Lista sem tags válidas não filtra
+        self.assertEqual(len(self.titles('tags=,')), 4)
+
+    def test_update_keeps_links_in_sync(self):
+        transaction = self.post('Mercado', ['Viagem', 'Casa'])
+
+        self.client.patch(f'{URL}{transaction.pk}/', {'tags': ['casa', 'Trabalho']}, format='json')
+
+        slugs = set(TransactionTag.objects.filter(transaction=transaction).values_list('tag__slug', flat=True))
+        self.assertEqual(slugs, {'casa', 'trabalho'})
+        self.assertEqual(self.titles('tags=viagem'), [])
+
+    def test_by_tag_counts_each_tag_of_a_transaction(self):
+        self.post('Mercado', ['Viagem', 'Férias'], amount='30.00')
+        self.post('Hotel', ['viagem'], amount='200.00')
+        self.post('Padaria', [], amount='8.00')
+
+        response = self.client.get(f'{URL}by_tag/?start_date=2026-03-01&end_date=2026-03-31')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row['slug'], Decimal(row['total_amount']), row['transaction_count']) for row in response.data['tags']],
+            [('viagem', Decimal('230.00'), 2), ('ferias', Decimal('30.00'), 1)],
+        )
+        filtered = self.client.get(f'{URL}by_tag/?start_date=2026-03-01&end_date=2026-03-31&tags=ferias')
+        # Só a transação filtrada entra, com todas as suas tags
+        self.assertEqual(
+            [(row['slug'], Decimal(row['total_amount'])) for row in filtered.data['tags']],
+            [('ferias', Decimal('30.00')), ('viagem', Decimal('30.00'))],
+        )
+
+    def test_migrate_tags_links_existing_transactions(self):
+        rows = [('Mercado', ['Viagem', 'viagem!', 'Casa']), ('Hotel', ['Viagem']), ('Padaria', [])]
+        for title, names in rows:
+            Transaction.objects.create(
+                user=self.user, title=title, amount=Decimal('10.00'), transaction_type='expense',
+                category=self.food, account=self.account, date=date(2026, 3, 10), tags=names,
+            )
+
+        call_command('migrate_tags', '--batch-size', '1', '--user', str(self.user.pk), stdout=StringIO())
+
+        self.assertEqual(set(Tag.objects.filter(user=self.user).values_list('slug', flat=True)), {'viagem', 'casa'})
+        self.assertEqual(TransactionTag.objects.filter(tag__user=self.user).count(), 3)
+        self.assertEqual(self.titles('tags=viagem'), ['Hotel', 'Mercado'])
+
+        # Pode ser executado de novo sem duplicar associações
+        call_command('migrate_tags', stdout=StringIO())
+        self.assertEqual(TransactionTag.objects.filter(tag__user=self.user).count(), 3)
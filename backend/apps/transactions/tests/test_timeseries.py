@@ -0,0 +1,107 @@
+from datetime import date
+from decimal import Decimal
+
+from django.test import SimpleTestCase
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.core.testing import FreshThrottleMixin, UserDataTestCase
+from apps.transactions import timeseries
+from apps.transactions.models import Transaction
+
+URL = '/api/transactions/transactions/timeseries/'
+
+
+class BucketTests(SimpleTestCase):
+    def test_month_start_crosses_years(self):
+        self.assertEqual(timeseries.month_start(date(2026, 1, 31), -1), date(2025, 12, 1))
+        self.assertEqual(timeseries.month_start(date(2025, 12, 15), 1), date(2026, 1, 1))
+        self.assertEqual(timeseries.month_start(date(2026, 3, 31), -12), date(2025, 3, 1))
+
+    def test_buckets_cover_the_period(self):
+        start, end = date(2025, 11, 20), date(2026, 2, 3)
+        expected = {
+            'day': 76,
+            'week': 12,
+            'month': 4,
+            'quarter': 2,
+            'year': 2,
+        }
+        for granularity, count in expected.items():
+            starts = list(timeseries.buckets(start, end, granularity))
+            self.assertEqual(len(starts), count, granularity)
+            self.assertEqual(timeseries.count_buckets(start, end, granularity), count, granularity)
+            self.assertLessEqual(starts[0], start)
+            self.assertGreater(timeseries.next_bucket(starts[-1], granularity), end)
+
+        self.assertEqual(timeseries.bucket_start(date(2026, 2, 3), 'week'), date(2026, 2, 2))
+        self.assertEqual(timeseries.bucket_start(date(2025, 11, 20), 'quarter'), date(2025, 10, 1))
+
+
+class TimeseriesTests(FreshThrottleMixin, UserDataTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='series', email='series@example.com', password='pw12345!')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.account = self.user.accounts.get(name='Conta Corrente')
+        self.food = self.user.categories.get(name='Alimentação')
+        self.salary = self.user.categories.filter(category_type='income').first()
+
+    def create(self, day, amount, transaction_type='expense', **extra):
+        Transaction.objects.create(
+            user=self.user, title='Lançamento', amount=Decimal(amount), transaction_type=transaction_type,
+            category=self.salary if transaction_type == 'income' else self.food, account=self.account,
+            date=day, **extra,
+        )
+
+    def series(self, **params):
+        response = self.client.get(URL, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data['buckets']
+
+    def test_month_edges_and_empty_buckets(self):
+        self.create(date(2026, 1, 10), '99.00')  # antes de start_date
+        self.create(date(2026, 1, 31), '10.00')
+        self.create(date(2026, 2, 1), '20.00')
+        self.create(date(2026, 2, 28), '1000.00', 'income')
+        self.create(date(2026, 2, 28), '5.00', status='pending')
+        self.create(date(2026, 4, 11), '40.00')  # depois de end_date
+
+        buckets = self.series(start_date='2026-01-15', end_date='2026-04-10')
+
+        self.assertEqual(
+            [(str(item['start']), str(item['end']), item['expense'], item['income'], item['count']) for item in buckets],
+            [
+                ('2026-01-01', '2026-01-31', Decimal('10.00'), Decimal('0'), 1),
+                ('2026-02-01', '2026-02-28', Decimal('20.00'), Decimal('1000.00'), 2),
+                ('2026-03-01', '2026-03-31', Decimal('0'), Decimal('0'), 0),
+                ('2026-04-01', '2026-04-10', Decimal('0'), Decimal('0'), 0),
+            ],
+        )
+        self.assertEqual(buckets[1]['net'], Decimal('980.00'))
+        self.assertEqual(self.series(start_date='2026-02-01', end_date='2026-02-28', status='pending')[0]['count'], 1)
+
+    def test_week_buckets_start_on_monday(self):
+        self.create(date(2026, 3, 1), '10.00')  # domingo
+        self.create(date(2026, 3, 2), '20.00')  # segunda
+
+        buckets = self.series(start_date='2026-02-26', end_date='2026-03-03', granularity='week')
+
+        self.assertEqual([(str(item['start']), str(item['end'])) for item in buckets],
+                         [('2026-02-23', '2026-03-01'), ('2026-03-02', '2026-03-03')])
+        self.assertEqual([item['expense'] for item in buckets], [Decimal('10.00'), Decimal('20.00')])
+
+    def test_groups_are_listed_in_every_bucket(self):
+        self.create(date(2026, 1, 5), '10.00')
+        self.create(date(2026, 3, 5), '1000.00', 'income')
+
+        buckets = self.series(start_date='2026-01-01', end_date='2026-03-31', group_by='type')
+
+        self.assertEqual([[group['key'] for group in item['groups']] for item in buckets], [['expense', 'income']] * 3)
+        self.assertEqual(buckets[1]['groups'][0]['count'], 0)
+
+    def test_invalid_parameters(self):
+        for params in ({'granularity': 'hour'}, {'group_by': 'tag'},
+                       {'start_date': '2026-03-01', 'end_date': '2026-02-01'},
+                       {'start_date': '2000-01-01', 'end_date': '2026-01-01', 'granularity': 'day'}):
+            self.assertEqual(self.client.get(URL, params).status_code, 400, params)
@@ -0,0 +1,18 @@
+"""
+Normalização de textos livres das transações (títulos e locais).
+"""
+import re
+import unicodedata
+
+WORD_RE = re.compile(r'[a-z0-9]+')
+
+
+def normalize_text(text):
+    """Minúsculas e sem acentos."""
+    text = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in text if not unicodedata.combining(char))
+
+
+def words(text):
+    """Palavras do texto normalizado, sem pontuação."""
+    return WORD_RE.findall(normalize_text(text))
@@ -0,0 +1,148 @@
+"""
+Séries temporais das transações.
+
+Todos os intervalos (dia, semana, mês, trimestre ou ano) saem de um único
+GROUP BY sobre `Trunc*`, com os totais por tipo em agregação condicional.
+Os intervalos sem transações são preenchidos com zero em memória, para que
+o cliente receba a série completa do período.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncQuarter, TruncWeek, TruncYear
+from django.utils import timezone
+
+from . import splits
+from .models import Transaction
+
+ZERO = Decimal('0')
+
+GRANULARITIES = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+    'quarter': TruncQuarter,
+    'year': TruncYear,
+}
+
+# Agrupamento: (campo da chave, campo do nome); por categoria, sobre os itens (apps.transactions.splits)
+GROUPS = {
+    'type': ('transaction_type', None),
+    'category': ('line_category_id', 'line_category_name'),
+    'account': ('account_id', 'account__name'),
+}
+
+# Limite de intervalos por resposta
+MAX_BUCKETS = 1000
+
+
+def user_today(user):
+    """Data atual no fuso do usuário."""
+    try:
+        zone = ZoneInfo(user.timezone)
+    except (ZoneInfoNotFoundError, ValueError, TypeError):
+        zone = timezone.get_current_timezone()
+    return timezone.localdate(timezone=zone)
+
+
+def month_start(day, offset=0):
+    """Primeiro dia do mês de `day` deslocado `offset` meses."""
+    index = day.year * 12 + day.month - 1 + offset
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def bucket_start(day, granularity):
+    """Início do intervalo que contém `day`."""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    if granularity == 'quarter':
+        return date(day.year, (day.month - 1) // 3 * 3 + 1, 1)
+    if granularity == 'year':
+        return date(day.year, 1, 1)
+    return day
+
+
+def next_bucket(start, granularity):
+    if granularity == 'day':
+        return start + timedelta(days=1)
+    if granularity == 'week':
+        return start + timedelta(days=7)
+    return month_start(start, {'month': 1, 'quarter': 3, 'year': 12}[granularity])
+
+
+def buckets(start, end, granularity):
+    """Inícios de todos os intervalos entre `start` e `end`."""
+    current = bucket_start(start, granularity)
+    while current <= end:
+        yield current
+        current = next_bucket(current, granularity)
+
+
+def count_buckets(start, end, granularity):
+    if granularity == 'day':
+        return (end - start).days + 1
+    first, last = bucket_start(start, granularity), bucket_start(end, granularity)
+    if granularity == 'week':
+        return (last - first).days // 7 + 1
+    months = (last.year - first.year) * 12 + last.month - first.month
+    return months // {'month': 1, 'quarter': 3, 'year': 12}[granularity] + 1
+
+
+def _empty():
+    return {'income': ZERO, 'expense': ZERO, 'transfer': ZERO, 'net': ZERO, 'count': 0}
+
+
+def build(queryset, amount, start, end, granularity, group_by=None):
+    """
+    Série de `start` a `end` com receitas, despesas, transferências, saldo
+    líquido e quantidade por intervalo (e por grupo, com `group_by`). Com
+    `group_by='category'`, `amount` deve ser `splits.line_amount`.
+    """
+    fields = ['bucket']
+    key_field, name_field = GROUPS[group_by] if group_by else (None, None)
+    if key_field:
+        fields.append(key_field)
+    if name_field:
+        fields.append(name_field)
+
+    queryset = queryset.filter(date__gte=start, date__lte=end)
+    if group_by == 'category':
+        queryset = splits.line_items(queryset, 'name')
+    rows = queryset.annotate(
+        bucket=GRANULARITIES[granularity]('date')
+    ).values(*fields).annotate(
+        income=Sum(amount, filter=Q(transaction_type='income')),
+        expense=Sum(amount, filter=Q(transaction_type='expense')),
+        transfer=Sum(amount, filter=Q(transaction_type='transfer')),
+        count=Count('id', distinct=group_by == 'category'),
+    ).order_by()
+
+    values, names = {}, {}
+    for row in rows:
+        bucket = row['bucket']
+        if hasattr(bucket, 'date'):
+            bucket = bucket.date()
+        key = row[key_field] if key_field else None
+        entry = {kind: row[kind] or ZERO for kind in ('income', 'expense', 'transfer')}
+        entry['net'] = entry['income'] - entry['expense']
+        entry['count'] = row['count']
+        values[bucket, key] = entry
+        if key_field:
+            names[key] = row[name_field] if name_field else dict(Transaction.TRANSACTION_TYPES).get(key, key)
+
+    series = []
+    for bucket in buckets(start, end, granularity):
+        point = {'start': bucket, 'end': min(next_bucket(bucket, granularity) - timedelta(days=1), end)}
+        if key_field:
+            point['groups'] = [
+                {'key': key, 'name': name, **values.get((bucket, key), _empty())}
+                for key, name in sorted(names.items(), key=lambda item: str(item[1]))
+            ]
+        else:
+            point.update(values.get((bucket, None), _empty()))
+        series.append(point)
+    return series
@@ -4,7 +4,8 @@ from .views import (
     CategoryViewSet, 
     AccountViewSet, 
     TransactionViewSet,
-    RecurringTransactionViewSet
+    RecurringTransactionViewSet,
+    BudgetViewSet
 )
 
 router = DefaultRouter()
@@ -12,6 +13,7 @@ router.register(r'categories', CategoryViewSet, basename='category')
 router.register(r'accounts', AccountViewSet, basename='account')
 router.register(r'transactions', TransactionViewSet, basename='transaction')
 router.register(r'recurring', RecurringTransactionViewSet, basename='recurring-transaction')
+router.register(r'budgets', BudgetViewSet, basename='budget')
 
 urlpatterns = [
     path('', include(router.urls)),
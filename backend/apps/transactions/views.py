@@ -1,27 +1,50 @@
-from rest_framework import viewsets, status, filters
+from rest_framework import viewsets, status, filters, serializers
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q, Sum, Count
+from django.db.models import OuterRef, Prefetch, Q, Sum, Count, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.utils.dateparse import parse_date
 from datetime import datetime, timedelta
+from dateutil.relativedelta import relativedelta
 from decimal import Decimal
 
-from .models import Category, Account, Transaction, RecurringTransaction
+from .models import (
+    Category, CategoryClosure, Account, Transaction, RecurringTransaction, CategoryBudget, TransactionSplit,
+)
 from .serializers import (
     CategorySerializer, AccountSerializer, 
     TransactionReadSerializer, TransactionWriteSerializer,
     RecurringTransactionSerializer, TransactionSummarySerializer,
-    CategorySummarySerializer
+    CategorySummarySerializer, CategoryBudgetSerializer
 )
 from .filters import TransactionFilter
+from apps.core import identity
+from apps.core.db_routers import atomic
+from apps.core.mixins import ReplicaReadMixin
+from apps.realtime import events
+from . import (
+    budgets, categorizer, comparison, fx, hierarchy, projection, reconciliation, snapshots, splits, tags, timeseries,
+)
+
+
+def _flag(value):
+    return value in (True, 1, '1', 'true', 'True')
+
+
+def _user_category(user, pk):
+    """Categoria `pk` do usuário; None para chaves inválidas ou de outro usuário."""
+    if not str(pk).isdigit():
+        return None
+    return Category.objects.filter(user=user, pk=pk).first()
 
 
 class CategoryViewSet(viewsets.ModelViewSet):
     """ViewSet para gerenciar categorias."""
     
     permission_classes = [IsAuthenticated]
+    claims_only_reads = True
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['name', 'description']
     ordering_fields = ['name', 'created_at']
@@ -36,6 +59,60 @@ class CategoryViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
     
+    def perform_update(self, serializer):
+        # A troca de pai passa pela hierarquia, que atualiza a tabela de fechamento
+        moved = 'parent' in serializer.validated_data
+        parent = serializer.validated_data.pop('parent', None)
+        category = serializer.save()
+        if moved:
+            self._move(category, parent)
+    
+    def perform_destroy(self, instance):
+        hierarchy.remove_category(instance)
+        instance.delete()
+    
+    def _move(self, category, parent):
+        try:
+            hierarchy.move_category(category, parent)
+        except hierarchy.HierarchyError as exc:
+            raise serializers.ValidationError({'parent': str(exc)})
+    
+    @action(detail=True, methods=['post'])
+    def move(self, request, pk=None):
+        """Move a categoria, com suas subcategorias, para baixo de `parent` (ou para a raiz com null)."""
+        category = self.get_object()
+        parent_id = request.data.get('parent')
+        parent = None
+        if parent_id not in (None, ''):
+            parent = _user_category(request.user, parent_id)
+            if parent is None:
+                return Response({'error': 'Categoria pai não encontrada'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        self._move(category, parent)
+        return Response(self.get_serializer(category).data)
+    
+    @action(detail=False, methods=['get'])
+    def tree(self, request):
+        """Categorias ativas aninhadas pela hierarquia."""
+        categories = self.get_queryset()
+        if request.query_params.get('type'):
+            categories = categories.filter(
+                Q(category_type=request.query_params['type']) | Q(category_type='both')
+            )
+        
+        def serialize(node):
+            category = node['category']
+            return {
+                'id': category.id,
+                'name': category.name,
+                'color': category.color,
+                'icon': category.icon,
+                'category_type': category.category_type,
+                'children': [serialize(child) for child in node['children']],
+            }
+        
+        return Response([serialize(node) for node in hierarchy.tree(categories)])
+    
     @action(detail=False, methods=['get'])
     def by_type(self, request):
         """Retorna categorias filtradas por tipo."""
@@ -51,15 +128,22 @@ class CategoryViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class AccountViewSet(viewsets.ModelViewSet):
+class AccountViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """ViewSet para gerenciar contas."""
     
     permission_classes = [IsAuthenticated]
+    claims_only_reads = True
+    replica_actions = ('summary', 'balance_history')
+    # Custo no throttling (apps.core.throttling); demais actions custam 1
+    throttle_costs = {'summary': 5, 'balance_history': 5}
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['name', 'bank_name']
     ordering_fields = ['name', 'balance', 'created_at']
     ordering = ['name']
     
+    # Limite de pontos diários por série de saldo
+    MAX_HISTORY_DAYS = 366
+    
     def get_queryset(self):
         return Account.objects.filter(user=self.request.user, is_active=True)
     
@@ -69,41 +153,159 @@ class AccountViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
     
+    def perform_update(self, serializer):
+        # Alterações de saldo entram no razão como ajuste manual
+        balance = serializer.validated_data.pop('balance', None)
+        account = serializer.save()
+        if balance is not None and balance != account.balance:
+            reconciliation.set_balance(account, balance, datetime.now().date())
+            events.balances_changed(account.user_id, [account.id])
+    
     @action(detail=True, methods=['post'])
     def adjust_balance(self, request, pk=None):
         """Ajusta o saldo da conta."""
         account = self.get_object()
         try:
             new_balance = Decimal(str(request.data.get('balance', 0)))
-            account.balance = new_balance
-            account.save(update_fields=['balance', 'updated_at'])
-            
-            serializer = self.get_serializer(account)
-            return Response(serializer.data)
-        except (ValueError, TypeError):
+        except (ArithmeticError, ValueError, TypeError):
             return Response({'error': 'Valor inválido para o saldo'}, 
                           status=status.HTTP_400_BAD_REQUEST)
+        
+        reconciliation.set_balance(account, new_balance, datetime.now().date())
+        events.balances_changed(account.user_id, [account.id])
+        
+        serializer = self.get_serializer(account)
+        return Response(serializer.data)
+    
+    @action(detail=True, methods=['get'])
+    def balance_history(self, request, pk=None):
+        """Retorna a evolução do saldo da conta em um período."""
+        account = self.get_object()
+        granularity = request.query_params.get('granularity', 'day')
+        end_date = parse_date(request.query_params.get('end_date', '')) or datetime.now().date()
+        start_date = parse_date(request.query_params.get('start_date', '')) or end_date - timedelta(days=30)
+        
+        if granularity not in snapshots.GRANULARITIES:
+            return Response({'error': 'Parâmetro granularity deve ser day, week ou month'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        if start_date > end_date:
+            return Response({'error': 'start_date deve ser anterior a end_date'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        if granularity == 'day' and (end_date - start_date).days >= self.MAX_HISTORY_DAYS:
+            return Response({'error': f'Use granularity week ou month para períodos acima de {self.MAX_HISTORY_DAYS} dias'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        if not snapshots.has_history(account.id):
+            # Sem saldo inicial a série partiria de zero (ver reconcile_balances --adopt)
+            return Response({'error': 'Histórico de saldo indisponível para esta conta'}, 
+                          status=status.HTTP_409_CONFLICT)
+        
+        return Response({
+            'account': account.id,
+            'granularity': granularity,
+            'period_start': start_date,
+            'period_end': end_date,
+            'points': snapshots.balance_series(account.id, start_date, end_date, granularity)
+        })
     
     @action(detail=False, methods=['get'])
     def summary(self, request):
-        """Retorna resumo das contas."""
+        """Retorna resumo das contas, com saldos convertidos para a moeda do usuário."""
         accounts = self.get_queryset()
-        total_balance = accounts.aggregate(total=Sum('balance'))['total'] or Decimal('0')
+        balance = fx.converted_amount('balance', 'currency', datetime.now().date(), request.user.currency)
+        total_balance = accounts.aggregate(total=Sum(balance))['total'] or Decimal('0')
         
         return Response({
             'total_accounts': accounts.count(),
             'total_balance': total_balance,
+            'currency': request.user.currency,
+            'unconverted_count': fx.count_unconverted(
+                accounts, request.user.currency, 'balance', 'currency', datetime.now().date()
+            ),
             'accounts_by_type': accounts.values('account_type').annotate(
                 count=Count('id'),
-                total_balance=Sum('balance')
-            )
+                total_balance=Sum(balance)
+            ).order_by('account_type')
         })
 
 
-class TransactionViewSet(viewsets.ModelViewSet):
+def _create_transaction(transaction, learn=True):
+    """
+    Aplica os efeitos de uma transação recém-criada.
+    
+    Cargas em massa passam `learn=False` e atualizam o categorizador uma vez
+    para o lote inteiro (`categorizer.learn_many`).
+    """
+    _update_account_balances(transaction)
+    if learn:
+        categorizer.learn(transaction)
+    tags.sync_transaction_tags(transaction)
+
+    events.transaction_changed(transaction, 'added')
+    events.balances_changed(transaction.user_id, _affected_accounts(transaction))
+
+
+def _affected_accounts(transaction):
+    """Contas cujo saldo é afetado pela transação."""
+    if transaction.status != 'completed':
+        return []
+    return [transaction.account_id, transaction.destination_account_id]
+
+
+def _update_account_balances(transaction):
+    """Atualiza os saldos das contas baseado na transação."""
+    if transaction.status != 'completed':
+        return
+
+    snapshots.record_transaction(transaction)
+    budgets.record_transaction(transaction)
+
+    if transaction.transaction_type == 'income':
+        transaction.account.update_balance(transaction.amount)
+    elif transaction.transaction_type == 'expense':
+        transaction.account.update_balance(-transaction.amount)
+    elif transaction.transaction_type == 'transfer':
+        transaction.account.update_balance(-transaction.amount)
+        if transaction.destination_account:
+            transaction.destination_account.update_balance(transaction.amount)
+
+
+def _revert_account_balances(transaction):
+    """Reverte os saldos das contas baseado na transação."""
+    if transaction.status != 'completed':
+        return
+
+    snapshots.record_transaction(transaction, sign=-1)
+    budgets.record_transaction(transaction, sign=-1)
+
+    if transaction.transaction_type == 'income':
+        transaction.account.update_balance(-transaction.amount)
+    elif transaction.transaction_type == 'expense':
+        transaction.account.update_balance(transaction.amount)
+    elif transaction.transaction_type == 'transfer':
+        transaction.account.update_balance(transaction.amount)
+        if transaction.destination_account:
+            transaction.destination_account.update_balance(-transaction.amount)
+
+
+class TransactionViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """ViewSet para gerenciar transações."""
     
     permission_classes = [IsAuthenticated]
+    claims_only_reads = True
+    replica_actions = ('summary', 'timeseries', 'compare', 'by_category', 'by_tag')
+    # Custo no throttling (apps.core.throttling); demais actions custam 1
+    throttle_costs = {
+        'summary': 5, 'timeseries': 5, 'compare': 5, 'by_category': 5, 'by_tag': 5,
+        'suggest_category': 2, 'categorize': 20, 'duplicates': 10,
+        'merge_duplicates': 10, 'bulk_import': 50,
+    }
+    
+    # Limite de linhas por requisição de categorização em lote
+    MAX_CATEGORIZE_ROWS = 5000
+    # Limite de linhas por importação
+    MAX_IMPORT_ROWS = 1000
+    # Limite de grupos no relatório de duplicatas
+    MAX_DUPLICATE_GROUPS = 100
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_class = TransactionFilter
     search_fields = ['title', 'description', 'notes']
@@ -113,57 +315,243 @@ class TransactionViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return Transaction.objects.filter(user=self.request.user).select_related(
             'category', 'account', 'destination_account'
+        ).prefetch_related(Prefetch('splits', queryset=TransactionSplit.objects.select_related('category')))
+    
+    def get_object(self):
+        transaction = super().get_object()
+        # A validação e o ajuste de saldos recebem estas mesmas instâncias
+        identity.remember(
+            transaction.category, transaction.account, transaction.destination_account,
+            *(split.category for split in transaction.splits.all()),
         )
+        return transaction
     
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
             return TransactionWriteSerializer
         return TransactionReadSerializer
     
+    def create(self, request, *args, **kwargs):
+        """Cria a transação, recusando (409) duplicatas de uma já registrada sem allow_duplicate."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        allow_duplicate = _flag(request.data.get('allow_duplicate')) or _flag(
+            request.query_params.get('allow_duplicate')
+        )
+        if not allow_duplicate:
+            fields = {name: value for name, value in serializer.validated_data.items() if name != 'splits'}
+            fingerprint = Transaction(user=request.user, **fields).compute_fingerprint()
+            duplicate = self.get_queryset().filter(fingerprint=fingerprint).values_list('pk', flat=True).first()
+            if duplicate:
+                return Response({
+                    'error': 'Transação já registrada. Envie allow_duplicate para criá-la mesmo assim.',
+                    'duplicate_of': duplicate,
+                }, status=status.HTTP_409_CONFLICT)
+        
+        self.perform_create(serializer)
+        headers = self.get_success_headers(serializer.data)
+        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+    
     def perform_create(self, serializer):
-        transaction = serializer.save(user=self.request.user)
-        self._update_account_balances(transaction)
+        _create_transaction(serializer.save(user=self.request.user))
     
     def perform_update(self, serializer):
-        old_transaction = self.get_object()
+        # Antes do save a instância do serializer ainda tem os valores anteriores
+        old_transaction = serializer.instance
         # Reverter operação anterior
-        self._revert_account_balances(old_transaction)
+        _revert_account_balances(old_transaction)
+        categorizer.learn(old_transaction, sign=-1)
+        affected = _affected_accounts(old_transaction)
         
         # Aplicar nova operação
         transaction = serializer.save()
-        self._update_account_balances(transaction)
+        _update_account_balances(transaction)
+        categorizer.learn(transaction)
+        tags.sync_transaction_tags(transaction)
+        
+        events.transaction_changed(transaction, 'updated')
+        events.balances_changed(transaction.user_id, affected + _affected_accounts(transaction))
     
     def perform_destroy(self, instance):
-        self._revert_account_balances(instance)
+        _revert_account_balances(instance)
+        categorizer.learn(instance, sign=-1)
+        events.transaction_changed(instance, 'deleted')
+        events.balances_changed(instance.user_id, _affected_accounts(instance))
         instance.delete()
     
-    def _update_account_balances(self, transaction):
-        """Atualiza os saldos das contas baseado na transação."""
-        if transaction.status != 'completed':
-            return
-        
-        if transaction.transaction_type == 'income':
-            transaction.account.update_balance(transaction.amount)
-        elif transaction.transaction_type == 'expense':
-            transaction.account.update_balance(-transaction.amount)
-        elif transaction.transaction_type == 'transfer':
-            transaction.account.update_balance(-transaction.amount)
-            if transaction.destination_account:
-                transaction.destination_account.update_balance(transaction.amount)
-    
-    def _revert_account_balances(self, transaction):
-        """Reverte os saldos das contas baseado na transação."""
-        if transaction.status != 'completed':
-            return
-        
-        if transaction.transaction_type == 'income':
-            transaction.account.update_balance(-transaction.amount)
-        elif transaction.transaction_type == 'expense':
-            transaction.account.update_balance(transaction.amount)
-        elif transaction.transaction_type == 'transfer':
-            transaction.account.update_balance(transaction.amount)
-            if transaction.destination_account:
-                transaction.destination_account.update_balance(-transaction.amount)
+    @action(detail=False, methods=['get'])
+    def suggest_category(self, request):
+        """Sugere categorias para uma transação a partir do histórico do usuário."""
+        title = request.query_params.get('title', '').strip()
+        transaction_type = request.query_params.get('transaction_type', 'expense')
+        if not title:
+            return Response({'error': 'Parâmetro title é obrigatório'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        if transaction_type not in ('income', 'expense'):
+            return Response({'error': 'Parâmetro transaction_type deve ser income ou expense'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        try:
+            amount = categorizer.parse_amount(request.query_params.get('amount'))
+        except ValueError:
+            return Response({'error': 'Valor inválido para amount'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'suggestions': categorizer.suggest(
+                request.user, title, transaction_type, amount, request.query_params.get('location', '')
+            )
+        })
+    
+    @action(detail=False, methods=['post'])
+    def categorize(self, request):
+        """Sugere a categoria de cada linha de um lote (ex.: transações importadas)."""
+        rows = request.data.get('transactions')
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            return Response({'error': 'Envie transactions como uma lista de objetos'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > self.MAX_CATEGORIZE_ROWS:
+            return Response({'error': f'Máximo de {self.MAX_CATEGORIZE_ROWS} linhas por lote'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        try:
+            results = categorizer.categorize(request.user, rows)
+        except ValueError:
+            return Response({'error': 'Valor inválido para amount'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({'results': results})
+    
+    @action(detail=False, methods=['post'])
+    def bulk_import(self, request):
+        """
+        Importa um lote de transações (ex.: extrato bancário).
+        
+        Linhas sem categoria recebem a categoria sugerida pelo histórico.
+        Linhas já registradas, ou repetidas no próprio lote, são ignoradas
+        e listadas em `duplicates`, a menos que allow_duplicates seja enviado.
+        """
+        rows = request.data.get('transactions')
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            return Response({'error': 'Envie transactions como uma lista de objetos'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > self.MAX_IMPORT_ROWS:
+            return Response({'error': f'Máximo de {self.MAX_IMPORT_ROWS} linhas por importação'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        
+        uncategorized = [row for row in rows if not row.get('category') and row.get('transaction_type') != 'transfer']
+        try:
+            suggestions = categorizer.categorize(request.user, uncategorized) if uncategorized else []
+        except ValueError:
+            suggestions = [None] * len(uncategorized)
+        rows = [dict(row) for row in rows]
+        suggested = iter(suggestions)
+        for row in rows:
+            if not row.get('category') and row.get('transaction_type') != 'transfer':
+                suggestion = next(suggested)
+                row['category'] = suggestion['category'] if suggestion else None
+        
+        serializer = TransactionWriteSerializer(data=rows, many=True, context=self.get_serializer_context())
+        if not serializer.is_valid():
+            return Response({'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        
+        items = [data.pop('splits', []) for data in serializer.validated_data]
+        candidates = [Transaction(user=request.user, **data) for data in serializer.validated_data]
+        fingerprints = [candidate.compute_fingerprint() for candidate in candidates]
+        existing = dict(
+            self.get_queryset().filter(fingerprint__in=set(fingerprints)).values_list('fingerprint', 'pk')
+        )
+        
+        allow_duplicates = _flag(request.data.get('allow_duplicates'))
+        created, duplicates, seen = [], [], {}
+        with atomic():
+            for position, (candidate, fingerprint, lines) in enumerate(zip(candidates, fingerprints, items)):
+                if not allow_duplicates and (fingerprint in existing or fingerprint in seen):
+                    duplicates.append({
+                        'index': position,
+                        'duplicate_of': existing.get(fingerprint),
+                        'duplicate_of_index': seen.get(fingerprint),
+                    })
+                    continue
+                seen.setdefault(fingerprint, position)
+                candidate.save()
+                splits.save_splits(candidate, lines, replace=False)
+                _create_transaction(candidate, learn=False)
+                created.append(candidate)
+            categorizer.learn_many(created)
+        
+        return Response({'created': [candidate.pk for candidate in created], 'duplicates': duplicates}, status=status.HTTP_201_CREATED)
+    
+    @action(detail=False, methods=['get'])
+    def duplicates(self, request):
+        """Relatório de grupos de transações com a mesma impressão digital."""
+        groups = list(
+            self.get_queryset().exclude(fingerprint='').values('fingerprint').annotate(
+                count=Count('id')
+            ).filter(count__gt=1).order_by('-count', 'fingerprint')[:self.MAX_DUPLICATE_GROUPS]
+        )
+        transactions = {}
+        for transaction in self.get_queryset().filter(
+            fingerprint__in=[group['fingerprint'] for group in groups]
+        ).order_by('created_at', 'pk'):
+            transactions.setdefault(transaction.fingerprint, []).append(transaction)
+        
+        return Response([
+            {
+                'fingerprint': group['fingerprint'],
+                'count': group['count'],
+                'transactions': TransactionReadSerializer(
+                    transactions.get(group['fingerprint'], []), many=True, context={'request': request}
+                ).data,
+            }
+            for group in groups
+        ])
+    
+    @action(detail=False, methods=['post'])
+    def merge_duplicates(self, request):
+        """
+        Mantém uma transação de um grupo de duplicatas (a informada em keep ou
+        a mais antiga) e remove as demais, revertendo seus efeitos nos saldos.
+        """
+        fingerprint = request.data.get('fingerprint')
+        if not fingerprint:
+            return Response({'error': 'Parâmetro fingerprint é obrigatório'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        
+        with atomic():
+            group = list(
+                self.get_queryset().select_for_update(of=('self',)).filter(
+                    fingerprint=fingerprint
+                ).order_by('created_at', 'pk')
+            )
+            if len(group) < 2:
+                return Response({'error': 'Nenhuma duplicata encontrada para esta impressão digital'}, 
+                              status=status.HTTP_404_NOT_FOUND)
+            # Uma instância por conta: cada reversão parte do saldo já ajustado pela anterior
+            accounts = {}
+            for transaction in group:
+                transaction.account = accounts.setdefault(transaction.account_id, transaction.account)
+                if transaction.destination_account_id:
+                    transaction.destination_account = accounts.setdefault(
+                        transaction.destination_account_id, transaction.destination_account
+                    )
+            
+            keep = group[0]
+            if request.data.get('keep') is not None:
+                keep = next((t for t in group if str(t.pk) == str(request.data['keep'])), None)
+                if keep is None:
+                    return Response({'error': 'A transação informada em keep não pertence ao grupo'}, 
+                                  status=status.HTTP_400_BAD_REQUEST)
+            
+            removed = []
+            for transaction in group:
+                if transaction.pk != keep.pk:
+                    removed.append(transaction.pk)
+                    self.perform_destroy(transaction)
+        
+        return Response({
+            'kept': TransactionReadSerializer(keep, context={'request': request}).data,
+            'removed': removed,
+        })
     
     @action(detail=False, methods=['get'])
     def summary(self, request):
@@ -183,23 +571,119 @@ class TransactionViewSet(viewsets.ModelViewSet):
             status='completed'
         )
         
+        amount = fx.converted_amount('amount', 'account__currency', 'date', request.user.currency)
+        zero = Value(Decimal('0'))
         summary = queryset.aggregate(
-            total_income=Sum('amount', filter=Q(transaction_type='income')) or Decimal('0'),
-            total_expense=Sum('amount', filter=Q(transaction_type='expense')) or Decimal('0'),
-            total_transfer=Sum('amount', filter=Q(transaction_type='transfer')) or Decimal('0'),
+            total_income=Coalesce(Sum(amount, filter=Q(transaction_type='income')), zero),
+            total_expense=Coalesce(Sum(amount, filter=Q(transaction_type='expense')), zero),
+            total_transfer=Coalesce(Sum(amount, filter=Q(transaction_type='transfer')), zero),
             transaction_count=Count('id')
         )
         
         summary['balance'] = summary['total_income'] - summary['total_expense']
+        summary['unconverted_count'] = fx.count_unconverted(queryset, request.user.currency)
         summary['period_start'] = start_date
         summary['period_end'] = end_date
+        summary['currency'] = request.user.currency
         
         serializer = TransactionSummarySerializer(summary)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'])
+    def timeseries(self, request):
+        """
+        Totais por intervalo (`granularity`: day, week, month, quarter ou
+        year) entre `start_date` e `end_date`, opcionalmente agrupados por
+        `group_by` (type, category ou account). Padrão: últimos 12 meses no
+        fuso do usuário. Aceita os mesmos filtros da listagem; sem `status`,
+        considera apenas transações concluídas.
+        """
+        granularity = request.query_params.get('granularity', 'month')
+        group_by = request.query_params.get('group_by') or None
+        if granularity not in timeseries.GRANULARITIES:
+            return Response(
+                {'error': f"granularity deve ser um de: {', '.join(timeseries.GRANULARITIES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if group_by is not None and group_by not in timeseries.GROUPS:
+            return Response(
+                {'error': f"group_by deve ser um de: {', '.join(timeseries.GROUPS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        end_date = parse_date(request.query_params.get('end_date', '')) or timeseries.user_today(request.user)
+        start_date = parse_date(request.query_params.get('start_date', ''))
+        if not start_date:
+            start_date = timeseries.month_start(end_date, -11)
+        if start_date > end_date:
+            return Response({'error': 'start_date deve ser anterior a end_date'}, status=status.HTTP_400_BAD_REQUEST)
+        if timeseries.count_buckets(start_date, end_date, granularity) > timeseries.MAX_BUCKETS:
+            return Response(
+                {'error': f'Período longo demais para a granularidade; máximo de {timeseries.MAX_BUCKETS} intervalos.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        queryset = self.filter_queryset(self.get_queryset())
+        if 'status' not in request.query_params:
+            queryset = queryset.filter(status='completed')
+        if group_by == 'category':
+            # Por categoria, transações divididas contam em cada item
+            amount = splits.line_amount(request.user.currency)
+        else:
+            amount = fx.converted_amount('amount', 'account__currency', 'date', request.user.currency)
+        
+        return Response({
+            'period': {'start': start_date, 'end': end_date},
+            'granularity': granularity,
+            'group_by': group_by,
+            'currency': request.user.currency,
+            'buckets': timeseries.build(queryset, amount, start_date, end_date, granularity, group_by),
+            'unconverted_count': fx.count_unconverted(
+                queryset.filter(date__gte=start_date, date__lte=end_date), request.user.currency
+            ),
+        })
+    
+    @action(detail=False, methods=['get'])
+    def compare(self, request):
+        """
+        Compara os totais por tipo e por categoria de vários períodos
+        (`periods=início:fim,início:fim...`; padrão: mês atual, mês anterior e
+        o mesmo mês do ano anterior). As variações são do primeiro período em
+        relação a cada um dos demais.
+        """
+        try:
+            if request.query_params.get('periods'):
+                periods = comparison.parse_periods(request.query_params['periods'], parse_date)
+            else:
+                periods = comparison.default_periods(timeseries.user_today(request.user))
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        transaction_type = request.query_params.get('type')
+        if transaction_type not in (None, 'income', 'expense'):
+            return Response({'error': 'type deve ser income ou expense'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        queryset = self.filter_queryset(self.get_queryset())
+        if transaction_type:
+            queryset = queryset.filter(transaction_type=transaction_type)
+        rows = comparison.transaction_rows(queryset, splits.line_amount(request.user.currency), periods)
+        
+        return Response({
+            'currency': request.user.currency,
+            'unconverted_count': fx.count_unconverted(
+                comparison.within_periods(queryset.filter(status='completed'), periods), request.user.currency
+            ),
+            **comparison.compare(rows, periods),
+        })
+    
     @action(detail=False, methods=['get'])
     def by_category(self, request):
-        """Retorna resumo das transações por categoria."""
+        """
+        Retorna resumo das transações por categoria.
+        
+        Com `rollup=1`, agrupa pelas subcategorias diretas de `parent` (ou
+        pelas categorias raiz), cada uma somando toda a sua subárvore.
+        """
         start_date = parse_date(request.query_params.get('start_date', ''))
         end_date = parse_date(request.query_params.get('end_date', ''))
         transaction_type = request.query_params.get('type', 'expense')
@@ -210,6 +694,14 @@ class TransactionViewSet(viewsets.ModelViewSet):
             next_month = start_date.replace(day=28) + timedelta(days=4)
             end_date = next_month - timedelta(days=next_month.day)
         
+        rollup = _flag(request.query_params.get('rollup'))
+        parent_id = request.query_params.get('parent')
+        parent = None
+        if rollup and parent_id not in (None, ''):
+            parent = _user_category(request.user, parent_id)
+            if parent is None:
+                return Response({'error': 'Categoria pai não encontrada'}, status=status.HTTP_400_BAD_REQUEST)
+        
         queryset = self.get_queryset().filter(
             date__gte=start_date,
             date__lte=end_date,
@@ -217,26 +709,84 @@ class TransactionViewSet(viewsets.ModelViewSet):
             status='completed'
         )
         
-        total_amount = queryset.aggregate(total=Sum('amount'))['total'] or Decimal('0')
+        amount = fx.converted_amount('amount', 'account__currency', 'date', request.user.currency)
+        total_amount = queryset.aggregate(total=Sum(amount))['total'] or Decimal('0')
         
-        category_summary = queryset.values('category').annotate(
-            total_amount=Sum('amount'),
-            transaction_count=Count('id')
-        ).order_by('-total_amount')
+        # Transações divididas contam em cada categoria dos seus itens
+        queryset = splits.line_items(queryset)
+        group = 'line_category_id'
+        if rollup:
+            # Leva cada item ao ancestral do nível pedido pela tabela de fechamento
+            group = 'level_id'
+            levels = Category.objects.filter(user=request.user, parent=parent)
+            queryset = queryset.annotate(level_id=Subquery(
+                CategoryClosure.objects.filter(
+                    descendant_id=OuterRef('line_category_id'), ancestor__in=levels
+                ).values('ancestor_id')[:1]
+            )).filter(level_id__isnull=False)
+        
+        category_summary = list(queryset.values(group).annotate(
+            total_amount=Sum(splits.line_amount(request.user.currency)),
+            transaction_count=Count('id', distinct=True)
+        ).order_by('-total_amount'))
+        categories = Category.objects.filter(user=request.user).in_bulk(
+            [item[group] for item in category_summary]
+        )
         
         results = []
         for item in category_summary:
-            category = Category.objects.get(id=item['category'])
+            category = categories[item[group]]
             percentage = (item['total_amount'] / total_amount * 100) if total_amount > 0 else 0
             
             results.append({
-                'category': CategorySerializer(category).data,
+                'category': CategorySerializer(category, context={'request': request}).data,
                 'total_amount': item['total_amount'],
                 'transaction_count': item['transaction_count'],
                 'percentage': round(percentage, 2)
             })
         
         return Response(results)
+    
+    @action(detail=False, methods=['get'])
+    def by_tag(self, request):
+        """
+        Total e quantidade de transações concluídas por tag no período.
+        
+        Aceita os mesmos filtros da listagem (`tags`, `account`...). Uma
+        transação com várias tags conta em cada uma delas.
+        """
+        start_date = parse_date(request.query_params.get('start_date', ''))
+        end_date = parse_date(request.query_params.get('end_date', ''))
+        transaction_type = request.query_params.get('type', 'expense')
+        
+        if not start_date:
+            start_date = datetime.now().date().replace(day=1)
+        if not end_date:
+            next_month = start_date.replace(day=28) + timedelta(days=4)
+            end_date = next_month - timedelta(days=next_month.day)
+        
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            date__gte=start_date,
+            date__lte=end_date,
+            transaction_type=transaction_type,
+            status='completed'
+        )
+        amount = fx.converted_amount('amount', 'account__currency', 'date', request.user.currency)
+        
+        return Response({
+            'period': {'start': start_date, 'end': end_date},
+            'currency': request.user.currency,
+            'unconverted_count': fx.count_unconverted(queryset, request.user.currency),
+            'tags': [
+                {
+                    'tag': row['tag_links__tag__name'],
+                    'slug': row['tag_links__tag__slug'],
+                    'total_amount': row['total'] or Decimal('0'),
+                    'transaction_count': row['count'],
+                }
+                for row in tags.tag_breakdown(queryset, amount)
+            ],
+        })
 
 
 class RecurringTransactionViewSet(viewsets.ModelViewSet):
@@ -248,6 +798,7 @@ class RecurringTransactionViewSet(viewsets.ModelViewSet):
     search_fields = ['title', 'description']
     ordering_fields = ['next_execution', 'created_at']
     ordering = ['next_execution']
+    throttle_costs = {'projection': 5}
     
     def get_queryset(self):
         return RecurringTransaction.objects.filter(
@@ -256,49 +807,140 @@ class RecurringTransactionViewSet(viewsets.ModelViewSet):
         ).select_related('category', 'account')
     
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        # A primeira execução é a data de início
+        serializer.save(user=self.request.user, next_execution=serializer.validated_data['start_date'])
     
     @action(detail=True, methods=['post'])
     def execute(self, request, pk=None):
         """Executa uma transação recorrente."""
         recurring = self.get_object()
         
-        # Criar a transação
-        transaction = Transaction.objects.create(
-            title=recurring.title,
-            description=recurring.description,
-            amount=recurring.amount,
-            transaction_type=recurring.transaction_type,
-            category=recurring.category,
-            account=recurring.account,
-            date=datetime.now().date(),
-            user=recurring.user
-        )
-        
-        # Atualizar próxima execução
-        self._update_next_execution(recurring)
+        with atomic():
+            # Criar a transação, com os mesmos efeitos de uma criada pela API
+            transaction = Transaction.objects.create(
+                title=recurring.title,
+                description=recurring.description,
+                amount=recurring.amount,
+                transaction_type=recurring.transaction_type,
+                category=recurring.category,
+                account=recurring.account,
+                date=datetime.now().date(),
+                user=recurring.user
+            )
+            _create_transaction(transaction)
+            
+            # Atualizar próxima execução
+            self._update_next_execution(recurring)
         
         return Response({
             'message': 'Transação executada com sucesso',
             'transaction_id': transaction.id
         })
     
+    @action(detail=False, methods=['get'])
+    def projection(self, request):
+        """
+        Saldos projetados por conta nos próximos `months` meses (padrão: 3,
+        máximo: 12), a partir do saldo atual e das recorrências ativas, com um
+        ponto por `granularity` (day, week ou month). `account` restringe a
+        projeção a uma conta.
+        """
+        granularity = request.query_params.get('granularity', 'month')
+        if granularity not in projection.GRANULARITIES:
+            return Response(
+                {'error': f"granularity deve ser um de: {', '.join(projection.GRANULARITIES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            months = int(request.query_params.get('months', projection.DEFAULT_MONTHS))
+        except ValueError:
+            return Response({'error': 'months deve ser um número inteiro'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= months <= projection.MAX_MONTHS:
+            return Response(
+                {'error': f'months deve estar entre 1 e {projection.MAX_MONTHS}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        start_date = timeseries.user_today(request.user)
+        end_date = start_date + relativedelta(months=months) - timedelta(days=1)
+        
+        templates = self.get_queryset().select_related(None).filter(
+            Q(end_date__isnull=True) | Q(end_date__gte=start_date)
+        ).only(
+            'amount', 'transaction_type', 'account_id', 'frequency',
+            'start_date', 'end_date', 'next_execution'
+        ).order_by()
+        accounts = Account.objects.filter(user=request.user).filter(
+            Q(is_active=True) | Q(id__in=templates.values('account_id'))
+        ).only('name', 'currency', 'balance')
+        account_id = request.query_params.get('account')
+        if account_id:
+            if not account_id.isdigit():
+                return Response({'error': 'account deve ser um id de conta'}, status=status.HTTP_400_BAD_REQUEST)
+            templates = templates.filter(account_id=account_id)
+            accounts = accounts.filter(id=account_id)
+        accounts = list(accounts)
+        
+        projected = projection.project(
+            templates.iterator(),
+            {account.id: account.balance for account in accounts},
+            start_date, end_date, granularity
+        )
+        return Response({
+            'period': {'start': start_date, 'end': end_date},
+            'granularity': granularity,
+            'accounts': [
+                {
+                    'id': account.id,
+                    'name': account.name,
+                    'currency': account.currency,
+                    'balance': account.balance,
+                    'projected_balance': projected[account.id]['series'][-1]['balance'],
+                    'lowest': projected[account.id]['lowest'],
+                    'series': projected[account.id]['series'],
+                }
+                for account in accounts
+            ],
+        })
+    
     def _update_next_execution(self, recurring):
         """Atualiza a data da próxima execução."""
-        current_date = recurring.next_execution
-        
-        if recurring.frequency == 'daily':
-            next_date = current_date + timedelta(days=1)
-        elif recurring.frequency == 'weekly':
-            next_date = current_date + timedelta(weeks=1)
-        elif recurring.frequency == 'monthly':
-            next_date = current_date + timedelta(days=30)  # Aproximação
-        elif recurring.frequency == 'quarterly':
-            next_date = current_date + timedelta(days=90)  # Aproximação
-        elif recurring.frequency == 'yearly':
-            next_date = current_date + timedelta(days=365)  # Aproximação
-        else:
-            next_date = current_date + timedelta(days=30)
-        
-        recurring.next_execution = next_date
+        recurring.next_execution = projection.next_occurrence(recurring)
         recurring.save(update_fields=['next_execution', 'updated_at'])
+
+
+class BudgetViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
+    """ViewSet para gerenciar orçamentos por categoria e consultar sua situação."""
+    
+    serializer_class = CategoryBudgetSerializer
+    permission_classes = [IsAuthenticated]
+    claims_only_reads = True
+    replica_actions = ('status',)
+    throttle_costs = {'status': 5}
+    
+    # Limite de meses retornados por consulta de situação
+    MAX_STATUS_MONTHS = 24
+    
+    def get_queryset(self):
+        return CategoryBudget.objects.filter(user=self.request.user).select_related('category')
+    
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+    
+    @action(detail=False, methods=['get'])
+    def status(self, request):
+        """Retorna a situação dos orçamentos no mês informado e nos anteriores."""
+        month = request.query_params.get('month')
+        try:
+            current = datetime.strptime(month, '%Y-%m').date() if month else datetime.now().date().replace(day=1)
+            months = int(request.query_params.get('months', 1))
+        except ValueError:
+            return Response({'error': 'Use month no formato AAAA-MM e months inteiro'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        
+        results = []
+        for _ in range(max(1, min(months, self.MAX_STATUS_MONTHS))):
+            results.append(budgets.budget_status(request.user, current))
+            current = (current - timedelta(days=1)).replace(day=1)
+        
+        return Response(results)
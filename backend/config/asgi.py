@@ -2,6 +2,8 @@
 ASGI config for financial_control project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Requests to the Server-Sent Events endpoint are served by
+``apps.realtime.sse``; everything else goes to Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
@@ -13,4 +15,12 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.development')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from apps.realtime.sse import EVENTS_PATH, events_application  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == EVENTS_PATH:
+        return await events_application(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -0,0 +1,13 @@
+"""
+Celery application for financial_control project.
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.development')
+
+app = Celery('financial_control')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -26,6 +26,7 @@ DJANGO_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 ]
 
 THIRD_PARTY_APPS = [
@@ -39,6 +40,8 @@ LOCAL_APPS = [
     'apps.accounts',
     'apps.transactions',
     'apps.analytics',
+    'apps.realtime',
+    'apps.core',
 ]
 
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
@@ -52,6 +55,9 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'apps.core.middleware.ShardRoutingMiddleware',
+    'apps.core.middleware.ReplicaRoutingMiddleware',
+    'apps.core.middleware.IdentityMapMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -81,6 +87,30 @@ DATABASES = {
     )
 }
 
+# Réplicas de leitura (URLs separadas por vírgula), usadas como replica1, replica2...
+DATABASE_REPLICA_URLS = config('DATABASE_REPLICA_URLS', default='', cast=lambda v: [s.strip() for s in v.split(',') if s.strip()])
+DATABASES.update({
+    f'replica{index}': {**dj_database_url.parse(url), 'TEST': {'MIRROR': 'default'}}
+    for index, url in enumerate(DATABASE_REPLICA_URLS, start=1)
+})
+
+# Shards de dados de usuário (URLs separadas por vírgula), usados como shard1, shard2...
+DATABASE_SHARD_URLS = config('DATABASE_SHARD_URLS', default='', cast=lambda v: [s.strip() for s in v.split(',') if s.strip()])
+DATABASES.update({
+    f'shard{index}': dj_database_url.parse(url)
+    for index, url in enumerate(DATABASE_SHARD_URLS, start=1)
+})
+# Shards que recebem usuários novos (padrão: default e todos os shards)
+DATABASE_SHARDS_FOR_NEW_USERS = config('DATABASE_SHARDS_FOR_NEW_USERS', default='', cast=lambda v: [s.strip() for s in v.split(',') if s.strip()])
+# Tempo em cache do shard de cada usuário
+SHARD_DIRECTORY_CACHE_SECONDS = config('SHARD_DIRECTORY_CACHE_SECONDS', default=300, cast=int)
+# Espera entre bloquear o usuário e copiar seus dados (duração máxima de uma requisição)
+SHARD_MOVE_DRAIN_SECONDS = config('SHARD_MOVE_DRAIN_SECONDS', default=30, cast=int)
+
+DATABASE_ROUTERS = ['apps.core.db_routers.ShardRouter', 'apps.core.db_routers.ReplicaRouter']
+# Janela em que as leituras de um usuário ficam no primário após uma escrita
+DATABASE_READ_YOUR_WRITES_SECONDS = config('DATABASE_READ_YOUR_WRITES_SECONDS', default=10, cast=int)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -123,7 +153,7 @@ AUTH_USER_MODEL = 'accounts.User'
 # Django REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.accounts.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -133,6 +163,9 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
+    'DEFAULT_THROTTLE_CLASSES': [
+        'apps.core.throttling.CostThrottle',
+    ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
 
@@ -148,6 +181,10 @@ SIMPLE_JWT = {
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': config('JWT_SECRET_KEY', default=SECRET_KEY),
 }
+# Tempo (segundos) que o usuário autenticado fica em cache
+AUTH_USER_CACHE_TTL = config('AUTH_USER_CACHE_TTL', default=60, cast=int)
+# Leituras das views com claims_only_reads usam apenas os claims do token
+JWT_CLAIMS_ONLY_READS = config('JWT_CLAIMS_ONLY_READS', default=False, cast=bool)
 
 # CORS Settings
 CORS_ALLOWED_ORIGINS = config('CORS_ALLOWED_ORIGINS', default='http://localhost:3000', cast=lambda v: [s.strip() for s in v.split(',')])
@@ -166,6 +203,28 @@ CACHES = {
     }
 }
 
+# Moeda base das cotações (ExchangeRate.rate = unidades da moeda base por unidade da moeda)
+FX_BASE_CURRENCY = config('FX_BASE_CURRENCY', default='BRL')
+# Validade das cotações em cache (apps.transactions.fx.get_rate)
+FX_RATE_CACHE_SECONDS = config('FX_RATE_CACHE_SECONDS', default=3600, cast=int)
+
+# Eventos em tempo real (SSE)
+REALTIME_BROKER = config('REALTIME_BROKER', default='apps.realtime.brokers.RedisBroker')
+REALTIME_KEEPALIVE_SECONDS = config('REALTIME_KEEPALIVE_SECONDS', default=15, cast=int)
+
+# Throttling por custo (apps.core.throttling): capacidade e recarga (tokens/s) por bucket
+THROTTLE_BACKEND = config('THROTTLE_BACKEND', default='apps.core.throttling.RedisTokenBucket')
+THROTTLE_BUCKETS = {
+    'user': (
+        config('THROTTLE_USER_CAPACITY', default=120, cast=int),
+        config('THROTTLE_USER_RATE', default=2.0, cast=float),
+    ),
+    'ip': (
+        config('THROTTLE_IP_CAPACITY', default=300, cast=int),
+        config('THROTTLE_IP_RATE', default=5.0, cast=float),
+    ),
+}
+
 # API Documentation
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Financial Control API',
@@ -182,3 +241,35 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+# Executa as tarefas no próprio processo (desenvolvimento local e testes)
+CELERY_TASK_ALWAYS_EAGER = config('CELERY_TASK_ALWAYS_EAGER', default=False, cast=bool)
+CELERY_TASK_EAGER_PROPAGATES = True
+# Tarefas periódicas (serviço beat do docker-compose)
+CELERY_BEAT_SCHEDULE = {
+    'purge-expired-analytics': {
+        'task': 'apps.analytics.tasks.purge_expired_results',
+        'schedule': 60 * 60,
+    },
+    'purge-expired-exports': {
+        'task': 'apps.accounts.tasks.purge_expired_exports',
+        'schedule': 24 * 60 * 60,
+    },
+    'purge-deactivated-users': {
+        'task': 'apps.accounts.tasks.purge_deactivated_users',
+        'schedule': 24 * 60 * 60,
+    },
+}
+
+# Analytics
+ANALYTICS_CACHE_TTL = config('ANALYTICS_CACHE_TTL', default=900, cast=int)  # segundos
+ANALYTICS_TASK_LOCK_TTL = config('ANALYTICS_TASK_LOCK_TTL', default=600, cast=int)  # segundos
+
+# Exportação de dados do usuário
+DATA_EXPORT_CHUNK_SIZE = config('DATA_EXPORT_CHUNK_SIZE', default=2000, cast=int)
+DATA_EXPORT_TTL_DAYS = config('DATA_EXPORT_TTL_DAYS', default=7, cast=int)
+
+# Remoção dos dados de contas desativadas (apps.accounts.purge)
+ACCOUNT_PURGE_GRACE_DAYS = config('ACCOUNT_PURGE_GRACE_DAYS', default=30, cast=int)
+ACCOUNT_PURGE_BATCH_SIZE = config('ACCOUNT_PURGE_BATCH_SIZE', default=500, cast=int)
+ACCOUNT_PURGE_PAUSE = config('ACCOUNT_PURGE_PAUSE', default=0.2, cast=float)  # segundos entre lotes
+ACCOUNT_PURGE_TASK_SECONDS = config('ACCOUNT_PURGE_TASK_SECONDS', default=240, cast=int)  # por execução da tarefa